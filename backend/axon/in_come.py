@@ -3,7 +3,9 @@ from typing import Optional, List, Any
 from fastapi import UploadFile
 from pydantic import BaseModel, Field
 from uuid import UUID
-from ..settings.file_utils import get_file_size, compute_sha1_from_file
+from langchain.text_splitter import RecursiveCharacterTextSplitter
+from ..settings.file_utils import compute_sha1_from_content, map_file
+from ..settings.fingerprint import get_fingerprint_cache
 from logger import setup_logger
 
 logger = setup_logger(__name__)
@@ -21,26 +23,72 @@ class File(BaseModel):
     chunk_size: int = 500
     chunk_overlap: int = 50
     documents: Optional[Any] = None
+    pages: Optional[Any] = None
+    minhash: Optional[Any] = None
+    duplicate_of: Optional[UUID] = None
+    embed_indexes: Optional[List[int]] = None
     
     def __init__(self, **kwargs):
         super().__init__(**kwargs)
 
-    def import_path(self, filepath: str, chunk_size: int = 500, chunk_overlap: int = 50):
-        # Existing logic for importing the file path
+    def import_path(self, filepath: str, chunk_size: int = 500, chunk_overlap: int = 50, stream: bool = False):
+        """
+        Import a file from disk, recording its name, size and SHA-1 hash.
+
+        The file is only ever read once. By default its bytes are loaded into
+        ``content`` and hashed from memory. With ``stream=True`` the hash and size
+        are computed incrementally over a fixed-size buffer and ``content`` is left
+        unset until ``get_content`` maps the file, so callers can run duplicate
+        checks before any file content is materialized. Streamed files are looked
+        up in the fingerprint cache first and only hashed if they have changed.
+
+        Args:
+            filepath (str): Path to the file.
+            chunk_size (int): Chunk size used when splitting the document.
+            chunk_overlap (int): Chunk overlap used when splitting the document.
+            stream (bool): Hash the file without loading its content.
+
+        Raises:
+            ValueError: If the path is not a regular file.
+        """
         self.chunk_size = chunk_size
         self.chunk_overlap = chunk_overlap
         if not os.path.isfile(filepath):
             raise ValueError(f"{filepath} is not a valid file.")
+        self.close_content()
         self.file_path = filepath
         self.file_name = os.path.basename(filepath)
         self.file_extension = os.path.splitext(self.file_name)[-1].lower()
-        with open(filepath, 'rb') as f:
-            self.content = f.read()
-        self.file_size = get_file_size(filepath)
-        self.file_sha1 = compute_sha1_from_file(filepath)
+        if stream:
+            self.file_sha1, self.file_size = get_fingerprint_cache().sha1_and_size(filepath)
+        else:
+            with open(filepath, 'rb') as f:
+                self.content = f.read()
+            self.file_size = len(self.content)
+            self.file_sha1 = compute_sha1_from_content(self.content)
+
+    def get_content(self):
+        """
+        Return the file content, memory-mapping the file on first access.
+
+        Returns:
+            bytes | mmap.mmap: The file content as a bytes-like object.
+        """
+        if self.content is None:
+            if not self.file_path:
+                raise ValueError("No file has been imported.")
+            self.content = map_file(self.file_path)
+        return self.content
+
+    def close_content(self):
+        """Release the content buffer, unmapping the file if it was mapped."""
+        close = getattr(self.content, 'close', None)
+        if close is not None:
+            close()
+        self.content = None
 
     def process_file(self, loader_class, store):
-        self.import_path(self.file_path)
+        self.import_path(self.file_path, self.chunk_size, self.chunk_overlap, stream=True)
         if self.check_duplicate_in_db(store):
             logger.info(f"Duplicate file detected with SHA1 {self.file_sha1}. Skipping upload and embedding.")
             return
@@ -50,8 +98,10 @@ class File(BaseModel):
     def compute_documents(self, loader_class):
         try:
             # Assuming loader_class can take a bytes-like object directly
-            loader = loader_class(self.content)
+            loader = loader_class(self.get_content())
             documents = loader.load()
+            # Keep the unsplit pages so the full text can be stored without loading the file again
+            self.pages = documents
 
             # Optimize the splitting process
             # Assuming RecursiveCharacterTextSplitter can take a stream or iterator
@@ -64,5 +114,14 @@ class File(BaseModel):
             logger.error(f"Error in computing documents: {e}")
             # Handle or raise the exception as per your application's needs
 
+    def page_text(self) -> str:
+        """
+        Join the text of the loaded pages into the document's full text.
+
+        Returns:
+            str: The full text, or an empty string if no pages were loaded.
+        """
+        return ''.join(page.page_content for page in self.pages or [])
+
     
 
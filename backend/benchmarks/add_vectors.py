@@ -0,0 +1,74 @@
+"""
+Benchmark the ways of writing a document's vectors to Postgres.
+
+Run against a scratch database set up with ``database/tablesetup.sh``:
+
+    python -m backend.benchmarks.add_vectors --rows 2000
+
+Each method writes ``rows`` random vectors for a throwaway document, which is
+deleted afterwards, and the best of ``repeat`` runs is reported in rows/s:
+
+- row: one INSERT and COMMIT per vector, as ``Memory.add_vectors`` used to do.
+- values: multi-row INSERTs through ``execute_values`` in one transaction.
+- copy: binary ``COPY`` in one transaction, the default of ``PGDocStore.write_vectors``.
+"""
+import time
+import uuid
+import argparse
+import numpy as np
+from backend.settings.settings import Setting
+from backend.settings.storage import store
+from logger import setup_logger
+
+logger = setup_logger(__name__)
+
+def write_row_by_row(cur, doc_id, vector_ids, embeddings):
+    for index, (vector_id, embedding) in enumerate(zip(vector_ids, embeddings)):
+        cur.execute("""
+            INSERT INTO vectors (vector_id, doc_id, vector_index, embeddings, created_at)
+            VALUES (%s, %s, %s, %s::vector, CURRENT_TIMESTAMP)
+        """, (vector_id, doc_id, index, str(list(map(float, embedding)))))
+        store.commit()
+
+def run(method: str, embeddings) -> float:
+    """Write the vectors for a scratch document with one method, returning rows/s."""
+    doc_id = uuid.uuid4()
+    vector_ids = [uuid.uuid4() for _ in embeddings]
+    cur = store.get_cursor()
+    try:
+        cur.execute("INSERT INTO documents (doc_id, file_name) VALUES (%s, %s)", (doc_id, 'benchmark'))
+        store.commit()
+        started = time.perf_counter()
+        if method == 'row':
+            write_row_by_row(cur, doc_id, vector_ids, embeddings)
+        else:
+            store.write_vectors(cur, doc_id, vector_ids, embeddings, method=method)
+            store.commit()
+        elapsed = time.perf_counter() - started
+    finally:
+        store.rollback()
+        cur.execute("DELETE FROM vectors WHERE doc_id = %s", (doc_id,))
+        cur.execute("DELETE FROM documents WHERE doc_id = %s", (doc_id,))
+        store.commit()
+        cur.close()
+    return len(embeddings) / elapsed
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark vector writes to Postgres.')
+    parser.add_argument('--rows', type=int, default=2000, help='Vectors written per run')
+    parser.add_argument('--dim', type=int, default=None, help='Vector dimension; defaults to EMBEDDING_DIM')
+    parser.add_argument('--repeat', type=int, default=3, help='Runs per method; the best is reported')
+    parser.add_argument('--methods', nargs='+', default=['row', 'values', 'copy'], help='Methods to compare')
+    args = parser.parse_args()
+
+    dim = args.dim or Setting().embedding_dim
+    embeddings = np.random.default_rng(0).standard_normal((args.rows, dim), dtype=np.float32)
+    results = {method: max(run(method, embeddings) for _ in range(args.repeat)) for method in args.methods}
+    baseline = results.get('row')
+    print(f"{args.rows} vectors of dimension {dim}, best of {args.repeat}")
+    for method, rate in results.items():
+        speedup = f"  {rate / baseline:6.1f}x" if baseline else ''
+        print(f"  {method:<8}{rate:12.0f} rows/s{speedup}")
+
+if __name__ == "__main__":
+    main()
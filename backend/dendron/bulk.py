@@ -0,0 +1,303 @@
+import os
+import json
+import time
+import argparse
+import inspect
+import importlib
+import threading
+import multiprocessing
+from functools import partial
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
+from typing import Dict, Optional
+from logger import setup_logger
+
+logger = setup_logger(__name__)
+
+# Ingest entry point for each supported file extension, by module and function
+# name so worker processes import only what they need.
+INGESTERS = {
+    '.pdf': ('backend.dendron.pdf', 'process_pdf'),
+    '.txt': ('backend.dendron.text', 'process_text'),
+    '.md': ('backend.dendron.text', 'process_text'),
+}
+
+# Log progress every this many files
+PROGRESS_INTERVAL = 50
+
+class Manifest:
+    """
+    Append-only JSON lines record of files processed by a bulk ingest.
+
+    Each line records one attempt. On restart, files whose last attempt succeeded
+    and whose size and modification time are unchanged are skipped, so a crash
+    only loses the files that were in flight.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.entries: Dict[str, dict] = {}
+        self._lock = threading.Lock()
+        if os.path.isfile(path):
+            with open(path, 'r', encoding='utf-8') as infile:
+                for line in infile:
+                    try:
+                        entry = json.loads(line)
+                    except json.JSONDecodeError:
+                        # A torn final line from a crash mid-write
+                        continue
+                    self.entries[entry['path']] = entry
+
+    def is_done(self, path: str, stat: os.stat_result) -> bool:
+        entry = self.entries.get(path)
+        return (entry is not None and entry['status'] == 'done'
+                and entry['size'] == stat.st_size and entry['mtime'] == stat.st_mtime)
+
+    def record(self, path: str, stat: os.stat_result, status: str, doc_id=None, error=None) -> None:
+        entry = {
+            'path': path,
+            'size': stat.st_size,
+            'mtime': stat.st_mtime,
+            'status': status,
+            'doc_id': str(doc_id) if doc_id else None,
+            'error': error,
+            'time': time.time(),
+        }
+        with self._lock:
+            self.entries[path] = entry
+            with open(self.path, 'a', encoding='utf-8') as outfile:
+                outfile.write(json.dumps(entry) + '\n')
+                outfile.flush()
+                os.fsync(outfile.fileno())
+
+def scan_directory(root: str, extensions=None):
+    """
+    Walk a directory tree and yield the files that have a registered ingester.
+
+    Args:
+        root (str): Directory to walk.
+        extensions (Iterable[str]): Extensions to include. Defaults to all of ``INGESTERS``.
+
+    Yields:
+        str: Paths of matching files, in a stable order.
+    """
+    extensions = set(extensions or INGESTERS)
+    for dirpath, dirnames, filenames in os.walk(root):
+        dirnames[:] = sorted(name for name in dirnames if not name.startswith('.'))
+        for filename in sorted(filenames):
+            if not filename.startswith('.') and os.path.splitext(filename)[-1].lower() in extensions:
+                yield os.path.join(dirpath, filename)
+
+def ingest_path(path: str, **kwargs):
+    """
+    Ingest one file with the ingester registered for its extension.
+
+    Args:
+        path (str): Path to the file.
+        **kwargs: Options passed to the ingester. Options it does not accept, and
+            None values, are dropped so the ingester's own defaults apply.
+
+    Returns:
+        UUID: The doc_id of the ingested document, or None on failure.
+    """
+    module_name, function_name = INGESTERS[os.path.splitext(path)[-1].lower()]
+    ingester = getattr(importlib.import_module(module_name), function_name)
+    accepted = inspect.signature(ingester).parameters
+    return ingester(path, **{key: value for key, value in kwargs.items() if value is not None and key in accepted})
+
+def _ingest_in_thread(path: str, **kwargs):
+    """Ingest one file on an executor thread, then return the thread's pooled connection."""
+    from backend.settings.storage import store
+
+    try:
+        return ingest_path(path, **kwargs)
+    finally:
+        # Executor threads live for the whole run; holding a connection between
+        # files would starve workers beyond the pool size
+        store.close_connection()
+
+def _thread_workers(workers: int) -> int:
+    """Cap thread workers so a Postgres pool always has a connection left for checkouts."""
+    from backend.settings.settings import Setting
+
+    setting = Setting()
+    if setting.database_type != 'pg' or workers < setting.pg_pool_size:
+        return workers
+    capped = max(1, setting.pg_pool_size - 1)
+    logger.warning(f"Limiting thread workers to {capped}; raise PG_POOL_SIZE above {workers} to run {workers}")
+    return capped
+
+def bulk_ingest(root: str,
+                manifest_path: Optional[str] = None,
+                workers: Optional[int] = None,
+                executor: str = 'process',
+                chunk_size: Optional[int] = None,
+                chunk_overlap: Optional[int] = None,
+                extract_workers: int = 1):
+    """
+    Ingest every supported file under a directory across a worker pool.
+
+    Files not yet in the manifest are first screened against the database in
+    bulk, hashing only files whose fingerprint has changed since the last scan.
+
+    With the process executor every worker opens its own database connection and
+    embeds independently. Thread workers each borrow a connection from this
+    process's pool while ingesting a file, so they need ``PG_POOL_SIZE`` above
+    ``workers``. PDF extraction inside each worker is limited to
+    ``extract_workers`` processes so the pool does not oversubscribe the CPUs.
+
+    Args:
+        root (str): Directory to ingest.
+        manifest_path (str): Progress manifest. Defaults to ``.cognimesh_manifest.jsonl`` in ``root``.
+        workers (int): Number of files ingested concurrently. Defaults to the CPU count.
+            Thread workers are capped one below ``PG_POOL_SIZE``.
+        executor (str): ``process``, ``thread``, ``pipeline`` to overlap the
+            extract, embed and store steps of consecutive files in one process,
+            or ``queue`` to only add the files to the durable job queue for
+            ``backend.dendron.worker`` processes to ingest.
+        chunk_size (int): Chunk size; the ingester's default when omitted.
+        chunk_overlap (int): Chunk overlap; the ingester's default when omitted.
+        extract_workers (int): PDF extraction processes per file.
+
+    Returns:
+        dict: Number of files done, failed and skipped as already ingested, and
+        with the ``queue`` executor the number of jobs added.
+    """
+    manifest = Manifest(manifest_path or os.path.join(root, '.cognimesh_manifest.jsonl'))
+    pending = []
+    summary = {'done': 0, 'failed': 0, 'skipped': 0}
+    for path in scan_directory(root):
+        stat = os.stat(path)
+        if manifest.is_done(path, stat):
+            summary['skipped'] += 1
+        else:
+            pending.append((path, stat))
+    pending = _screen_duplicates(pending, manifest, summary)
+    logger.info(f"Bulk ingest of {root}: {len(pending)} files to ingest, {summary['skipped']} already done")
+
+    workers = workers or os.cpu_count() or 1
+    if executor == 'queue':
+        return _enqueue(pending, summary)
+    if executor == 'pipeline':
+        return _pipeline_ingest(pending, manifest, summary, workers, chunk_size, chunk_overlap, extract_workers)
+    if executor == 'process':
+        # Spawned workers each open their own database connection on import
+        pool = ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context('spawn'))
+        ingest = ingest_path
+    elif executor == 'thread':
+        pool = ThreadPoolExecutor(max_workers=_thread_workers(workers))
+        ingest = _ingest_in_thread
+    else:
+        raise ValueError(f"Unsupported executor: {executor}")
+
+    task = partial(ingest, chunk_size=chunk_size, chunk_overlap=chunk_overlap, workers=extract_workers)
+    started = time.monotonic()
+    with pool:
+        futures = {pool.submit(task, path): (path, stat) for path, stat in pending}
+        for count, future in enumerate(as_completed(futures), start=1):
+            path, stat = futures[future]
+            try:
+                doc_id = future.result()
+                if doc_id:
+                    manifest.record(path, stat, 'done', doc_id=doc_id)
+                    summary['done'] += 1
+                else:
+                    manifest.record(path, stat, 'failed', error='No doc_id returned')
+                    summary['failed'] += 1
+            except Exception as e:
+                logger.error(f"Failed to ingest {path}: {e}")
+                manifest.record(path, stat, 'failed', error=str(e))
+                summary['failed'] += 1
+            _log_progress(count, len(futures), started)
+    return summary
+
+def _screen_duplicates(pending, manifest, summary):
+    """Skip files already stored, hashing only changed files and checking all hashes in bulk."""
+    from backend.settings.fingerprint import get_fingerprint_cache
+    from backend.neuron.memory import Memory
+
+    if not pending:
+        return pending
+    cache = get_fingerprint_cache()
+    hashes = {}
+    for path, stat in pending:
+        try:
+            hashes[path] = cache.sha1(path)
+        except OSError as e:
+            # Left for the ingester to report
+            logger.warning(f"Could not hash {path}: {e}")
+    stored = Memory().find_duplicates(hashes.values())
+    remaining = []
+    for path, stat in pending:
+        doc_id = stored.get(hashes.get(path))
+        if doc_id:
+            manifest.record(path, stat, 'done', doc_id=doc_id)
+            summary['skipped'] += 1
+        else:
+            remaining.append((path, stat))
+    logger.info(f"Duplicate screening: {len(pending) - len(remaining)} of {len(pending)} files already stored "
+                f"(fingerprint cache {cache.stats()})")
+    return remaining
+
+def _pipeline_ingest(pending, manifest, summary, workers, chunk_size, chunk_overlap, extract_workers):
+    # Imported here so the other executors do not load the pipeline and its loaders
+    from backend.dendron.pipeline import IngestPipeline
+
+    pipeline = IngestPipeline(chunk_size=chunk_size or 500,
+                              chunk_overlap=chunk_overlap or 50,
+                              extract_workers=workers,
+                              extract_processes=extract_workers)
+    stats = dict(pending)
+    started = time.monotonic()
+    for count, item in enumerate(pipeline.run(path for path, _ in pending), start=1):
+        if item.status in ('done', 'duplicate'):
+            manifest.record(item.path, stats[item.path], 'done', doc_id=item.doc_id)
+            summary['done'] += 1
+        else:
+            manifest.record(item.path, stats[item.path], 'failed', error=item.error)
+            summary['failed'] += 1
+        _log_progress(count, len(pending), started)
+    return summary
+
+def _enqueue(pending, summary):
+    from backend.settings.jobs import get_job_queue
+    from backend.dendron.worker import enqueue_path
+
+    job_queue = get_job_queue()
+    summary['queued'] = 0
+    for path, stat in pending:
+        try:
+            if enqueue_path(job_queue, path):
+                summary['queued'] += 1
+            else:
+                summary['skipped'] += 1
+        except Exception as e:
+            logger.error(f"Failed to enqueue {path}: {e}")
+            summary['failed'] += 1
+    logger.info(f"Queued {summary['queued']} ingest jobs")
+    return summary
+
+def _log_progress(count: int, total: int, started: float):
+    if count % PROGRESS_INTERVAL == 0 or count == total:
+        elapsed = time.monotonic() - started
+        logger.info(f"Ingested {count}/{total} files ({count / elapsed:.2f} files/s)")
+
+def main():
+    parser = argparse.ArgumentParser(description='Ingest every supported file under a directory.')
+    parser.add_argument('directory', help='The directory to ingest.')
+    parser.add_argument('--manifest', help='Path of the resumable progress manifest.')
+    parser.add_argument('--workers', type=int, default=None, help='Number of files ingested concurrently')
+    parser.add_argument('--executor', choices=['process', 'thread', 'pipeline', 'queue'], default='process', help='Worker pool type')
+    parser.add_argument('--chunk_size', type=int, default=None, help='Chunk size used when splitting documents')
+    parser.add_argument('--chunk_overlap', type=int, default=None, help='Chunk overlap used when splitting documents')
+    parser.add_argument('--extract_workers', type=int, default=1, help='PDF extraction processes per file')
+    args = parser.parse_args()
+
+    if not os.path.isdir(args.directory):
+        logger.error(f"{args.directory} is not a valid directory.")
+        return
+    summary = bulk_ingest(args.directory, args.manifest, args.workers, args.executor,
+                          args.chunk_size, args.chunk_overlap, args.extract_workers)
+    logger.info(f"Bulk ingest finished: {summary}")
+
+if __name__ == "__main__":
+    main()
@@ -1,6 +1,7 @@
 from backend.axon.in_come import File
 from backend.neuron.memory import Memory #, Cognition
 from backend.neuron.cognition import Cognition
+from backend.neuron.resemblance import screen_near_duplicate, record_signature
 from logger import setup_logger
 
 logger = setup_logger(__name__)
@@ -10,25 +11,95 @@ def process_file(path: str,
                  chunk_size: int,
                  chunk_overlap: int):
     file = File()
-    file.import_path(filepath=path, chunk_size=chunk_size, chunk_overlap=chunk_overlap)
-    memory = Memory()
-    
+    # Hash without loading the file so duplicates are skipped before any content is read
+    file.import_path(filepath=path, chunk_size=chunk_size, chunk_overlap=chunk_overlap, stream=True)
+    return ingest_file(file, loader_class)
+
+def ingest_file(file: File, loader_class, memory: Memory = None):
+    """
+    Embed and store an imported file, unless a file with the same SHA1 is already stored.
+
+    The file is loaded once; the loaded pages feed both the chunk splitter and the
+    document's stored content. A stored document that never got its content, left
+    by an ingest that died part way, is deleted and the file ingested again.
+    Files similar to a stored document are handled per the ``NEAR_DUPLICATE`` setting.
+
+    The file's content, mapped on first access, is released before returning.
+
+    Args:
+        file (File): A file that has been through ``import_path``.
+        loader_class: Loader called with the file content, returning LangChain documents.
+        memory (Memory): Memory instance to use; a new one is created if omitted.
+
+    Returns:
+        UUID: The doc_id of the new or already stored document, or None on failure.
+    """
+    try:
+        return _ingest_file(file, loader_class, memory or Memory())
+    finally:
+        file.close_content()
+
+def _ingest_file(file: File, loader_class, memory: Memory):
     if memory.check_duplicate_in_db(file):
         # If the file is already processed, retrieve the corresponding doc_id
         doc_id = memory.retrieve_doc_id(file.file_sha1)
-        if doc_id:
-            logger.info(f"File with SHA1 {file.file_sha1} has already been processed with doc_id {doc_id}.")
-            return doc_id
-        else:
+        if not doc_id:
             logger.error(f"No doc_id found for file with SHA1 {file.file_sha1}.")
             return None
-    else:
-        # Process the file if it's not a duplicate
-        cognition = Cognition()
-        embed = cognition.embed_file(file=file, loader_class=loader_class)
-
-        # Add document metadata and vector embeddings to the database
-        doc_id = memory.add_document(file=file)
-        vector_ids = memory.add_vectors(file=file, embed=embed)
-        memory.update_document_vectors(doc_id, vector_ids)
-        return doc_id
+        if memory.is_document_complete(doc_id):
+            logger.info(f"File with SHA1 {file.file_sha1} has already been processed with doc_id {doc_id}.")
+            return doc_id
+        # Left behind by an ingest that died part way; start over
+        logger.warning(f"Removing incomplete document {doc_id} for SHA1 {file.file_sha1}.")
+        memory.delete_document(doc_id)
+
+    try:
+        load_documents(file, loader_class)
+    except ValueError as e:
+        logger.error(f"Not storing {file.file_name}: {e}")
+        return None
+    # Near duplicates are screened on the extracted text, before paying for embeddings
+    original_doc_id = screen_near_duplicate(file, memory)
+    if original_doc_id:
+        return original_doc_id
+    embed = Cognition().embed_chunks(file)
+    return store_file(file, embed, memory)
+
+def load_documents(file: File, loader_class) -> None:
+    """
+    Load and split an imported file, then release its mapped content.
+
+    Shared by every ingest path, so a file without text fails the same way
+    whichever executor ingests it.
+
+    Raises:
+        ValueError: If no text could be loaded; nothing should be stored.
+    """
+    try:
+        file.compute_documents(loader_class)
+    finally:
+        # Chunks and pages are computed; the mapped file is no longer needed
+        file.close_content()
+    if not file.documents:
+        raise ValueError("No text could be loaded")
+
+def store_file(file: File, embed, memory: Memory = None):
+    """
+    Write an embedded file's document row, vectors and content to the database.
+
+    Args:
+        file (File): A file whose documents have been computed.
+        embed (List): The embedding vector of each of the file's chunks, or of the
+            chunks in ``file.embed_indexes`` when it is set.
+        memory (Memory): Memory instance to use; a new one is created if omitted.
+
+    Returns:
+        UUID: The doc_id of the stored document, or None if it could not be stored.
+    """
+    memory = memory or Memory()
+    # Document, content and vectors are written in one transaction
+    doc_id = memory.store_document(file, embed, file.page_text())
+    file.doc_id = doc_id
+    if doc_id:
+        record_signature(file, memory)
+    return doc_id
@@ -1,12 +1,10 @@
 from backend.axon.in_come import File
 from backend.neuron.memory import Memory #, Cognition
 from backend.neuron.cognition import Cognition
-from backend.dendron.out_go import process_file
-import io
-from langchain.document_loaders import PDFPlumberLoader
-import pdfplumber
-from pdf2image import convert_from_bytes
-import pytesseract
+from backend.dendron.out_go import ingest_file
+from backend.dendron.pdf_extract import extract_pdf_text, OCR_MIN_CHARS
+from functools import partial
+from langchain.schema import Document
 from logger import setup_logger
 
 logger = setup_logger(__name__)
@@ -35,44 +33,57 @@ def retrieve_and_verify_pdf(doc_id):
     else:
         print(f"No file data found for doc_id {doc_id}")
         
-def convert_pdf_to_txt(file_content, ocr_threshold=0.8):
+def convert_pdf_to_txt(file_content, ocr_min_chars=OCR_MIN_CHARS, workers=None, file_sha1=None):
     text = ''
-    text_pages = 0
     try:
-        # Using BytesIO to handle the file content as a stream
-        with pdfplumber.open(io.BytesIO(file_content)) as pdf:
-            for page in pdf.pages:
-                page_text = page.extract_text()
-                if page_text:
-                    text += page_text
-                    text_pages += 1
-
-            # Use OCR if the text extraction is insufficient
-            if text_pages < len(pdf.pages) * ocr_threshold:
-                text = ''
-                images = convert_from_bytes(file_content, dpi=300)
-                for img in images:
-                    text += pytesseract.image_to_string(img)
+        # Only pages without a usable text layer are rasterized and OCR'd;
+        # OCR output is cached per page under the file's SHA-1
+        page_texts = extract_pdf_text(file_content, workers=workers, ocr_min_chars=ocr_min_chars,
+                                      file_sha1=file_sha1)
+        text = ''.join(page_texts)
     except Exception as e:
         print(f"Error occurred while converting PDF to text: {e}")
     return text
 
+class PDFTextLoader:
+    """
+    Loads a PDF from its content into one LangChain document per page.
+
+    Text comes from ``extract_pdf_text``, so pages are extracted in parallel and
+    scanned pages are OCR'd (and cached) individually. Given the file's path, the
+    worker processes and poppler read the file itself; content without a path is
+    spooled to a temporary file first.
+    """
+
+    def __init__(self, file_content, file_sha1=None, workers=None, ocr_min_chars=OCR_MIN_CHARS, file_path=None):
+        self.file_content = file_content
+        self.file_sha1 = file_sha1
+        self.workers = workers
+        self.ocr_min_chars = ocr_min_chars
+        self.file_path = file_path
+
+    def load(self):
+        page_texts = extract_pdf_text(self.file_path or self.file_content,
+                                      workers=self.workers,
+                                      ocr_min_chars=self.ocr_min_chars,
+                                      file_sha1=self.file_sha1)
+        return [Document(page_content=page_text, metadata={'page': index})
+                for index, page_text in enumerate(page_texts)]
+
 def process_pdf(file_path: str,
                 chunk_size=1000,
                 chunk_overlap=50,
-                loader_class=PDFPlumberLoader):
-    # Process the file and get doc_id
-    doc_id = process_file(file_path, loader_class, chunk_size, chunk_overlap)
+                workers=None):
+    # Hash the file first so duplicates are skipped before the PDF is parsed
+    file = File()
+    file.import_path(filepath=file_path, chunk_size=chunk_size, chunk_overlap=chunk_overlap, stream=True)
 
-    if doc_id:
-        # Convert PDF to text
-        file = retrieve_and_verify_pdf(doc_id)
-        pdf_text = convert_pdf_to_txt(file.content)
-        # Update the content in the database
-        memory = Memory()
-        memory.update_file_content(doc_id, pdf_text)
+    # The PDF is parsed once: the page texts feed both the chunks and the stored content
+    loader_class = partial(PDFTextLoader, file_sha1=file.file_sha1, workers=workers, file_path=file.file_path)
+    doc_id = ingest_file(file, loader_class)
 
+    if doc_id:
         print("PDF processing completed and content updated in database.")
         return doc_id
     else:
-        print("Error in processing PDF file.")
\ No newline at end of file
+        print("Error in processing PDF file.")
@@ -0,0 +1,345 @@
+import io
+import os
+import math
+import tempfile
+import multiprocessing
+from contextlib import contextmanager
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, List, Optional, Tuple
+import pdfplumber
+from pdf2image import convert_from_path
+import pytesseract
+from backend.settings.file_utils import compute_sha1_from_file, compute_sha1_from_content
+from backend.settings.ocr_cache import get_ocr_cache
+from logger import setup_logger
+
+logger = setup_logger(__name__)
+
+# Documents with fewer pages than this per worker are extracted in-process;
+# starting worker processes costs more than it saves on short PDFs.
+MIN_SHARD_PAGES = 8
+
+# Number of shards handed to each worker, so one slow range does not idle the pool
+SHARDS_PER_WORKER = 4
+
+# Pages whose native text has fewer non-whitespace characters than this are
+# treated as scanned and sent to OCR; catches blank text layers and stray headers.
+OCR_MIN_CHARS = 32
+
+# Longest run of consecutive pages rasterized by one OCR task
+OCR_RUN_PAGES = 4
+
+OCR_DPI = 300
+
+# Upper bound on the pixels rendered for a single page. A4 and Letter fit at
+# 300 dpi; larger pages are rendered at a proportionally lower resolution.
+OCR_MAX_PIXELS = 9_000_000
+
+# Pages rendered per poppler call inside an OCR task
+OCR_RENDER_WINDOW = 1
+
+# Extra command line options passed to tesseract
+TESSERACT_CONFIG = ''
+
+def _is_path(source) -> bool:
+    return isinstance(source, (str, os.PathLike))
+
+def open_pdf(source):
+    """
+    Open a PDF with pdfplumber from a path, a binary stream or a bytes-like object.
+
+    Args:
+        source (str | bytes | mmap.mmap | IO[bytes]): The PDF to open.
+
+    Returns:
+        pdfplumber.PDF: The opened document.
+    """
+    if _is_path(source):
+        return pdfplumber.open(source)
+    if hasattr(source, 'read') and hasattr(source, 'seek'):
+        # Memory-mapped files and open binary streams are read in place
+        source.seek(0)
+        return pdfplumber.open(source)
+    return pdfplumber.open(io.BytesIO(source))
+
+@contextmanager
+def pdf_source_path(source):
+    """
+    Yield a filesystem path for the PDF, spooling in-memory content to a temporary file.
+
+    Worker processes and poppler both need a path; spooling once is cheaper than
+    pickling the whole document for every shard.
+
+    Args:
+        source (str | bytes | mmap.mmap): The PDF to expose as a path.
+
+    Yields:
+        str: Path to a file holding the PDF.
+    """
+    if _is_path(source):
+        yield os.fspath(source)
+        return
+    with tempfile.NamedTemporaryFile(suffix='.pdf', delete=False) as tmp:
+        tmp.write(source)
+    try:
+        yield tmp.name
+    finally:
+        os.remove(tmp.name)
+
+def page_shards(page_count: int, workers: int, shard_pages: Optional[int] = None):
+    """
+    Split a page count into contiguous, ordered ``(start, stop)`` ranges.
+
+    Args:
+        page_count (int): Number of pages in the document.
+        workers (int): Number of worker processes the shards are spread across.
+        shard_pages (int): Pages per shard; derived from ``workers`` when omitted.
+
+    Returns:
+        list: ``(start, stop)`` page index ranges covering the whole document.
+    """
+    if not shard_pages:
+        shard_pages = max(MIN_SHARD_PAGES, math.ceil(page_count / (workers * SHARDS_PER_WORKER)))
+    return [(start, min(start + shard_pages, page_count)) for start in range(0, page_count, shard_pages)]
+
+def _extract_page_range(path: str, start: int, stop: int) -> List[str]:
+    # Runs in a worker process; each worker parses its own handle on the file
+    with pdfplumber.open(path) as pdf:
+        return [pdf.pages[index].extract_text() or '' for index in range(start, stop)]
+
+def extract_page_texts(source, workers: Optional[int] = None, shard_pages: Optional[int] = None) -> List[str]:
+    """
+    Extract the text of every page of a PDF, in page order.
+
+    Pages are split into contiguous shards and extracted across a pool of worker
+    processes. Short documents, or ``workers=1``, are extracted in-process.
+    Pages without a text layer yield an empty string.
+
+    Args:
+        source (str | bytes | mmap.mmap): Path to the PDF or its content.
+        workers (int): Number of worker processes. Defaults to the CPU count.
+        shard_pages (int): Pages per shard. Defaults to an even split across workers.
+
+    Returns:
+        list: The extracted text of each page.
+    """
+    workers = workers or os.cpu_count() or 1
+    with open_pdf(source) as pdf:
+        page_count = len(pdf.pages)
+        if workers == 1 or page_count < 2 * MIN_SHARD_PAGES:
+            return [page.extract_text() or '' for page in pdf.pages]
+
+    shards = page_shards(page_count, workers, shard_pages)
+    logger.info(f"Extracting {page_count} pages in {len(shards)} shards across {workers} workers")
+    page_texts = []
+    with pdf_source_path(source) as path:
+        # Spawned workers do not inherit open database connections or thread locks
+        with ProcessPoolExecutor(max_workers=min(workers, len(shards)),
+                                 mp_context=multiprocessing.get_context('spawn')) as executor:
+            futures = [executor.submit(_extract_page_range, path, start, stop) for start, stop in shards]
+            for future in futures:
+                page_texts.extend(future.result())
+    return page_texts
+
+def text_density(text: str) -> int:
+    """Count the non-whitespace characters in a page's text."""
+    return sum(1 for char in text if not char.isspace())
+
+def needs_ocr(page_text: str, min_chars: int = OCR_MIN_CHARS) -> bool:
+    """
+    Decide whether a page's native text is too sparse to keep.
+
+    Args:
+        page_text (str): Text extracted from the page's text layer.
+        min_chars (int): Minimum number of non-whitespace characters.
+
+    Returns:
+        bool: True if the page should be OCR'd.
+    """
+    return text_density(page_text) < min_chars
+
+def page_runs(page_indexes: List[int], max_run: int = OCR_RUN_PAGES):
+    """
+    Group sorted page indexes into runs of consecutive pages.
+
+    Args:
+        page_indexes (list): Zero-based page indexes.
+        max_run (int): Maximum number of pages in a run.
+
+    Returns:
+        list: Lists of consecutive page indexes, each at most ``max_run`` long.
+    """
+    runs = []
+    for index in sorted(page_indexes):
+        if runs and index == runs[-1][-1] + 1 and len(runs[-1]) < max_run:
+            runs[-1].append(index)
+        else:
+            runs.append([index])
+    return runs
+
+def adaptive_dpi(width: float, height: float, dpi: int = OCR_DPI, max_pixels: Optional[int] = OCR_MAX_PIXELS) -> int:
+    """
+    Lower the rendering resolution of oversized pages to stay within a pixel budget.
+
+    Args:
+        width (float): Page width in PDF points.
+        height (float): Page height in PDF points.
+        dpi (int): Preferred resolution.
+        max_pixels (int): Maximum pixels per rendered page, or None for no limit.
+
+    Returns:
+        int: The resolution to render the page at.
+    """
+    if not max_pixels or (width / 72 * dpi) * (height / 72 * dpi) <= max_pixels:
+        return dpi
+    return max(1, int(72 * math.sqrt(max_pixels / (width * height))))
+
+def iter_page_images(path: str, pages: List[Tuple[int, int]], window: int = OCR_RENDER_WINDOW):
+    """
+    Rasterize pages lazily, at most ``window`` pages at a time.
+
+    Pages are rendered in grayscale, which is all tesseract needs and a third of
+    the memory of RGB. Callers should close each image once they are done with it.
+
+    Args:
+        path (str): Path to the PDF.
+        pages (list): Consecutive ``(page_index, dpi)`` pairs to render.
+        window (int): Number of pages rendered per poppler call.
+
+    Yields:
+        tuple: The page index and its rendered PIL image.
+    """
+    for start in range(0, len(pages), window):
+        batch = pages[start:start + window]
+        dpi = min(page_dpi for _, page_dpi in batch)
+        # pdf2image page numbers are one-based
+        images = convert_from_path(path, dpi=dpi, grayscale=True,
+                                   first_page=batch[0][0] + 1, last_page=batch[-1][0] + 1)
+        yield from zip((index for index, _ in batch), images)
+        del images
+
+def _ocr_page_run(path: str, run: List[Tuple[int, int]], window: int, config: str) -> List[str]:
+    # Runs in a worker process; each image is released as soon as tesseract is done with it
+    texts = []
+    for _, image in iter_page_images(path, run, window):
+        try:
+            texts.append(pytesseract.image_to_string(image, config=config))
+        finally:
+            image.close()
+    return texts
+
+def ocr_pages(source,
+              page_indexes: List[int],
+              dpi: int = OCR_DPI,
+              workers: Optional[int] = None,
+              max_pixels: Optional[int] = OCR_MAX_PIXELS,
+              window: int = OCR_RENDER_WINDOW,
+              config: str = TESSERACT_CONFIG) -> Dict[int, str]:
+    """
+    Rasterize and OCR selected pages of a PDF on a bounded process pool.
+
+    Pages are rendered one window at a time rather than all up front. Each OCR
+    worker holds at most ``window`` grayscale images of at most ``max_pixels``
+    bytes, plus poppler's output buffer for them, so peak rasterization memory is
+    about ``2 * window * max_pixels * workers`` bytes. With the defaults that is
+    roughly 18 MB per worker, however many pages the document has.
+
+    Args:
+        source (str | bytes | mmap.mmap): Path to the PDF or its content.
+        page_indexes (list): Zero-based indexes of the pages to OCR.
+        dpi (int): Preferred rasterization resolution.
+        workers (int): Maximum number of OCR processes. Defaults to the CPU count.
+        max_pixels (int): Pixel budget per page; larger pages get a lower dpi.
+            None renders every page at ``dpi``.
+        window (int): Number of pages rendered per poppler call.
+        config (str): Extra tesseract options.
+
+    Returns:
+        dict: OCR text keyed by page index.
+    """
+    if not page_indexes:
+        return {}
+    with open_pdf(source) as pdf:
+        page_dpis = {index: adaptive_dpi(pdf.pages[index].width, pdf.pages[index].height, dpi, max_pixels)
+                     for index in page_indexes}
+    runs = [[(index, page_dpis[index]) for index in run] for run in page_runs(page_indexes)]
+    workers = min(workers or os.cpu_count() or 1, len(runs))
+    logger.info(f"Running OCR on {len(page_indexes)} pages in {len(runs)} runs across {workers} workers")
+    texts = {}
+    with pdf_source_path(source) as path:
+        if workers == 1:
+            for run in runs:
+                texts.update(zip((index for index, _ in run), _ocr_page_run(path, run, window, config)))
+            return texts
+        with ProcessPoolExecutor(max_workers=workers,
+                                 mp_context=multiprocessing.get_context('spawn')) as executor:
+            futures = {executor.submit(_ocr_page_run, path, run, window, config): run for run in runs}
+            for future, run in futures.items():
+                texts.update(zip((index for index, _ in run), future.result()))
+    return texts
+
+def extract_pdf_text(source,
+                     workers: Optional[int] = None,
+                     ocr_min_chars: int = OCR_MIN_CHARS,
+                     dpi: int = OCR_DPI,
+                     ocr_workers: Optional[int] = None,
+                     max_pixels: Optional[int] = OCR_MAX_PIXELS,
+                     file_sha1: Optional[str] = None,
+                     use_cache: bool = True) -> List[str]:
+    """
+    Extract page texts, falling back to OCR only for pages without usable text.
+
+    Born-digital pages keep their native text; pages whose text layer is empty or
+    sparser than ``ocr_min_chars`` are rasterized and passed to tesseract. OCR output
+    replaces the native text only when it recovers more characters. OCR results are
+    kept in the on-disk OCR cache, so re-ingesting an unchanged file skips tesseract.
+
+    Args:
+        source (str | bytes | mmap.mmap): Path to the PDF or its content.
+        workers (int): Number of processes for native text extraction.
+        ocr_min_chars (int): Pages with fewer non-whitespace characters are OCR'd.
+            Set to 0 to disable OCR.
+        dpi (int): Preferred rasterization resolution for OCR.
+        ocr_workers (int): Maximum number of OCR processes.
+        max_pixels (int): Pixel budget per rasterized page, see ``ocr_pages``.
+        file_sha1 (str): SHA-1 of the file, used as the cache key. Computed from
+            ``source`` when needed and not given.
+        use_cache (bool): Consult and fill the OCR cache.
+
+    Returns:
+        list: The text of each page, in page order.
+    """
+    page_texts = extract_page_texts(source, workers=workers)
+    scanned = [index for index, page_text in enumerate(page_texts) if needs_ocr(page_text, ocr_min_chars)]
+    if not scanned:
+        return page_texts
+
+    cache = None
+    ocr_texts = {}
+    if use_cache:
+        try:
+            cache = get_ocr_cache()
+            if cache is not None:
+                if not file_sha1:
+                    file_sha1 = compute_sha1_from_file(source) if _is_path(source) else compute_sha1_from_content(source)
+                ocr_texts = cache.get_pages(file_sha1, scanned, dpi, max_pixels, TESSERACT_CONFIG)
+                logger.info(f"OCR cache hits for {len(ocr_texts)} of {len(scanned)} pages of {file_sha1}")
+        except Exception as e:
+            # The cache only saves work; a locked or unwritable cache must not fail the extraction
+            logger.warning(f"OCR cache unavailable, running OCR without it: {e}")
+            cache, ocr_texts = None, {}
+
+    missing = [index for index in scanned if index not in ocr_texts]
+    fresh_texts = ocr_pages(source, missing, dpi=dpi, workers=ocr_workers, max_pixels=max_pixels)
+    if cache is not None and fresh_texts:
+        try:
+            cache.put_pages(file_sha1, fresh_texts, dpi, max_pixels, TESSERACT_CONFIG)
+        except Exception as e:
+            # The OCR is done; losing it from the cache only costs a rerun next time
+            logger.warning(f"Failed to cache OCR text of {len(fresh_texts)} pages of {file_sha1}: {e}")
+    ocr_texts.update(fresh_texts)
+
+    for index, ocr_text in ocr_texts.items():
+        if text_density(ocr_text) > text_density(page_texts[index]):
+            page_texts[index] = ocr_text
+    return page_texts
@@ -0,0 +1,271 @@
+import os
+import time
+import queue
+import threading
+from functools import partial
+from concurrent.futures import ThreadPoolExecutor
+from typing import Iterable, Optional
+from backend.axon.in_come import File
+from backend.neuron.memory import Memory
+from backend.neuron.cognition import Cognition
+from backend.dendron.out_go import load_documents, store_file
+from backend.neuron.resemblance import screen_near_duplicate
+from backend.dendron.pdf import PDFTextLoader
+from backend.dendron.text import TextContentLoader
+from logger import setup_logger
+
+logger = setup_logger(__name__)
+
+# Loader for each supported extension, built from the imported file
+LOADERS = {
+    '.pdf': lambda file, workers: partial(PDFTextLoader, file_sha1=file.file_sha1, workers=workers,
+                                          file_path=file.file_path),
+    '.txt': lambda file, workers: TextContentLoader,
+    '.md': lambda file, workers: TextContentLoader,
+}
+
+# Marks the end of a stage's input
+_STOP = object()
+
+class IngestItem:
+    """
+    A file moving through the ingest pipeline.
+
+    Attributes:
+        path (str): Path of the file.
+        file (File): The imported file, once hashed.
+        embed (list): Chunk embeddings, once embedded.
+        doc_id (UUID): The stored (or duplicate) document's id.
+        status (str): ``pending``, ``done``, ``duplicate`` or ``failed``.
+        error (str): The error that failed the item.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.file = None
+        self.embed = None
+        self.doc_id = None
+        self.status = 'pending'
+        self.error = None
+
+class Stage:
+    """
+    One pipeline stage: a pool of worker threads between two bounded queues.
+
+    Workers block on ``put`` when the next stage's queue is full, which throttles
+    this stage to the pace of the slowest stage downstream.
+    """
+
+    def __init__(self, name: str, func, workers: int, inbox: queue.Queue,
+                 outbox: Optional[queue.Queue], results: queue.Queue):
+        self.name = name
+        self.func = func
+        self.workers = workers
+        self.inbox = inbox
+        self.outbox = outbox
+        self.results = results
+        self.processed = 0
+        self.failed = 0
+        self.busy_seconds = 0.0
+        self.blocked_seconds = 0.0
+        self._lock = threading.Lock()
+        self._executor = None
+
+    def start(self):
+        self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix=f"ingest-{self.name}")
+        for _ in range(self.workers):
+            self._executor.submit(self._work)
+
+    def stop(self):
+        """Signal end of input and wait for the workers to drain the queue."""
+        for _ in range(self.workers):
+            self.inbox.put(_STOP)
+        self._executor.shutdown(wait=True)
+
+    def _work(self):
+        while True:
+            item = self.inbox.get()
+            if item is _STOP:
+                return
+            started = time.monotonic()
+            try:
+                self.func(item)
+            except Exception as e:
+                logger.error(f"Stage {self.name} failed for {item.path}: {e}")
+                item.status = 'failed'
+                item.error = str(e)
+            busy = time.monotonic() - started
+            with self._lock:
+                self.busy_seconds += busy
+                if item.status == 'failed':
+                    self.failed += 1
+                else:
+                    self.processed += 1
+            if self.outbox is None or item.status != 'pending':
+                self.results.put(item)
+            else:
+                started = time.monotonic()
+                self.outbox.put(item)
+                with self._lock:
+                    self.blocked_seconds += time.monotonic() - started
+
+    def stats(self, elapsed: float) -> dict:
+        with self._lock:
+            return {
+                'processed': self.processed,
+                'failed': self.failed,
+                'queued': self.inbox.qsize(),
+                'busy_seconds': round(self.busy_seconds, 3),
+                'blocked_seconds': round(self.blocked_seconds, 3),
+                'throughput': round(self.processed / elapsed, 3) if elapsed else 0.0,
+                'utilization': round(self.busy_seconds / (elapsed * self.workers), 3) if elapsed else 0.0,
+            }
+
+class IngestPipeline:
+    """
+    Ingests files through extract, embed and store stages running concurrently.
+
+    Each stage has its own thread pool, connected to the next by a bounded queue,
+    so one document can be parsed while the previous one is being embedded and
+    the one before that is written to the database.
+
+    - extract: hash the file, skip duplicates, load and split it, and screen
+      it for near duplicates. PDF pages are extracted on a process pool of
+      ``extract_processes`` per document.
+    - embed: call the embedding model, which is network-bound.
+    - store: write the document, vectors and content to the database.
+    """
+
+    def __init__(self,
+                 chunk_size: int = 500,
+                 chunk_overlap: int = 50,
+                 extract_workers: int = 2,
+                 embed_workers: int = 4,
+                 store_workers: int = 1,
+                 queue_size: int = 8,
+                 extract_processes: Optional[int] = None):
+        """
+        Args:
+            chunk_size (int): Chunk size used when splitting documents.
+            chunk_overlap (int): Chunk overlap used when splitting documents.
+            extract_workers (int): Documents extracted concurrently.
+            embed_workers (int): Documents embedded concurrently.
+            store_workers (int): Documents written concurrently.
+            queue_size (int): Capacity of each queue between stages.
+            extract_processes (int): PDF extraction processes per document.
+        """
+        self.chunk_size = chunk_size
+        self.chunk_overlap = chunk_overlap
+        self.extract_processes = extract_processes
+        self.memory = Memory()
+        self.cognition = Cognition()
+
+        self.results = queue.Queue()
+        extract_queue = queue.Queue(maxsize=queue_size)
+        embed_queue = queue.Queue(maxsize=queue_size)
+        store_queue = queue.Queue(maxsize=queue_size)
+        self.stages = [
+            Stage('extract', self._extract, extract_workers, extract_queue, embed_queue, self.results),
+            Stage('embed', self._embed, embed_workers, embed_queue, store_queue, self.results),
+            Stage('store', self._store, store_workers, store_queue, None, self.results),
+        ]
+        self._started = None
+
+    def _extract(self, item: IngestItem):
+        try:
+            self._extract_file(item)
+        finally:
+            # Stage threads live for the whole run; return the pooled connection between files
+            self.memory.store.close_connection()
+
+    def _extract_file(self, item: IngestItem):
+        extension = os.path.splitext(item.path)[-1].lower()
+        if extension not in LOADERS:
+            raise ValueError(f"No loader for {extension} files")
+        file = File()
+        file.import_path(filepath=item.path, chunk_size=self.chunk_size,
+                         chunk_overlap=self.chunk_overlap, stream=True)
+        item.file = file
+        if self.memory.check_duplicate_in_db(file):
+            doc_id = self.memory.retrieve_doc_id(file.file_sha1)
+            if doc_id and self.memory.is_document_complete(doc_id):
+                item.doc_id = doc_id
+                item.status = 'duplicate'
+                return
+            if doc_id:
+                # Left behind by an ingest that died part way; start over
+                self.memory.delete_document(doc_id)
+        load_documents(file, LOADERS[extension](file, self.extract_processes))
+        original_doc_id = screen_near_duplicate(file, self.memory)
+        if original_doc_id:
+            item.doc_id = original_doc_id
+            item.status = 'duplicate'
+
+    def _embed(self, item: IngestItem):
+        item.embed = self.cognition.embed_chunks(item.file)
+
+    def _store(self, item: IngestItem):
+        try:
+            item.doc_id = store_file(item.file, item.embed, self.memory)
+        finally:
+            self.memory.store.close_connection()
+        if not item.doc_id:
+            raise ValueError("Document was not stored")
+        item.embed = None
+        item.status = 'done'
+
+    def run(self, paths: Iterable[str]):
+        """
+        Ingest files, yielding each one as soon as it leaves the pipeline.
+
+        Args:
+            paths (Iterable[str]): Files to ingest; consumed lazily as the
+                extract queue has room.
+
+        Yields:
+            IngestItem: Finished items, in completion order.
+        """
+        self._started = time.monotonic()
+        for stage in self.stages:
+            stage.start()
+        total = []
+        errors = []
+
+        def feed():
+            try:
+                for path in paths:
+                    # Blocks while the extract queue is full
+                    self.stages[0].inbox.put(IngestItem(path))
+                    total.append(path)
+            except Exception as e:
+                errors.append(e)
+            finally:
+                # Drain what was fed even if listing the paths failed, so run() returns
+                for stage in self.stages:
+                    stage.stop()
+                self.results.put(_STOP)
+
+        feeder = threading.Thread(target=feed, name='ingest-feed', daemon=True)
+        feeder.start()
+        while True:
+            item = self.results.get()
+            if item is _STOP:
+                break
+            yield item
+        feeder.join()
+        if errors:
+            logger.error(f"Pipeline stopped after {len(total)} files: {errors[0]}")
+            raise errors[0]
+        logger.info(f"Pipeline ingested {len(total)} files: {self.stats()}")
+
+    def stats(self) -> dict:
+        """
+        Report per-stage throughput and backpressure.
+
+        Returns:
+            dict: For each stage, items processed and failed, current queue depth,
+            time spent working and blocked on a full downstream queue, items per
+            second and worker utilization.
+        """
+        elapsed = time.monotonic() - self._started if self._started else 0.0
+        return {stage.name: stage.stats(elapsed) for stage in self.stages}
@@ -0,0 +1,25 @@
+import codecs
+from backend.dendron.out_go import process_file
+from langchain.schema import Document
+from logger import setup_logger
+
+logger = setup_logger(__name__)
+
+class TextContentLoader:
+    """
+    Loads plain text from file content into a single LangChain document.
+    """
+
+    def __init__(self, file_content, encoding='utf-8'):
+        self.file_content = file_content
+        self.encoding = encoding
+
+    def load(self):
+        # Decoding straight from the buffer avoids copying a memory-mapped file
+        text = codecs.decode(memoryview(self.file_content), self.encoding, 'replace')
+        return [Document(page_content=text, metadata={})]
+
+def process_text(file_path: str,
+                 chunk_size=500,
+                 chunk_overlap=50):
+    return process_file(file_path, TextContentLoader, chunk_size, chunk_overlap)
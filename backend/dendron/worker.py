@@ -0,0 +1,150 @@
+import os
+import time
+import socket
+import argparse
+import threading
+import multiprocessing
+from typing import Optional
+from backend.settings.jobs import get_job_queue, Job, JobQueue, LEASE_SECONDS
+from backend.settings.fingerprint import get_fingerprint_cache
+from logger import setup_logger
+
+logger = setup_logger(__name__)
+
+# How long an idle worker waits before looking for runnable jobs again
+IDLE_SECONDS = 2.0
+
+def enqueue_path(job_queue: JobQueue, path: str) -> bool:
+    """
+    Add an ingest job for a file, keyed by its SHA-1.
+
+    Args:
+        job_queue (JobQueue): The queue to add to.
+        path (str): Path of the file.
+
+    Returns:
+        bool: True if a new job was added, False if the content is already queued.
+    """
+    return job_queue.enqueue(os.path.abspath(path), get_fingerprint_cache().sha1(path))
+
+class Heartbeat:
+    """Renews a job's lease in the background while it is being ingested."""
+
+    def __init__(self, job_queue: JobQueue, job: Job, owner: str, lease_seconds: int):
+        self.job_queue = job_queue
+        self.job = job
+        self.owner = owner
+        self.lease_seconds = lease_seconds
+        self._stopped = threading.Event()
+        self._thread = threading.Thread(target=self._run, name='ingest-heartbeat', daemon=True)
+
+    def _run(self):
+        while not self._stopped.wait(self.lease_seconds / 3):
+            try:
+                if not self.job_queue.renew(self.job, self.owner, self.lease_seconds):
+                    logger.warning(f"Lost the lease on job {self.job.job_id}")
+                    return
+            except Exception as e:
+                logger.error(f"Failed to renew the lease on job {self.job.job_id}: {e}")
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stopped.set()
+        self._thread.join()
+
+def run_job(job_queue: JobQueue, job: Job, owner: str, lease_seconds: int = LEASE_SECONDS, **kwargs) -> None:
+    """
+    Ingest the file of a claimed job and record the outcome.
+
+    Ingest is idempotent on the file's SHA-1: a document already stored is
+    returned as is, and one left incomplete by a dead worker is replaced.
+
+    Args:
+        job_queue (JobQueue): The queue the job was claimed from.
+        job (Job): The claimed job.
+        owner (str): Name of the worker holding the lease.
+        lease_seconds (int): Lease length, renewed while the file is ingested.
+        **kwargs: Options passed to the ingester.
+    """
+    # Imported here so the parent of a worker pool never opens a database connection
+    from backend.dendron.bulk import ingest_path
+
+    if job.attempts > job.max_attempts:
+        logger.error(f"Job {job.job_id} is out of attempts ({job.attempts}/{job.max_attempts})")
+        job_queue.fail(job, owner, f"Out of attempts ({job.attempts}/{job.max_attempts})")
+        return
+    logger.info(f"Job {job.job_id}: ingesting {job.file_path} (attempt {job.attempts}/{job.max_attempts})")
+    try:
+        with Heartbeat(job_queue, job, owner, lease_seconds):
+            doc_id = ingest_path(job.file_path, **kwargs)
+        if not doc_id:
+            raise ValueError("No doc_id returned")
+    except Exception as e:
+        logger.error(f"Job {job.job_id} failed: {e}")
+        job_queue.fail(job, owner, str(e))
+        return
+    job_queue.complete(job, owner, doc_id)
+    logger.info(f"Job {job.job_id} done as doc_id {doc_id}")
+
+def run_worker(owner: Optional[str] = None,
+               lease_seconds: int = LEASE_SECONDS,
+               drain: bool = False,
+               **kwargs) -> int:
+    """
+    Claim and run ingest jobs until stopped, or until the queue is empty with ``drain``.
+
+    Args:
+        owner (str): Name recorded on leases. Defaults to ``host:pid``.
+        lease_seconds (int): Lease length for claimed jobs.
+        drain (bool): Return once no job is runnable instead of waiting for more.
+        **kwargs: Options passed to the ingester.
+
+    Returns:
+        int: Number of jobs run.
+    """
+    owner = owner or f"{socket.gethostname()}:{os.getpid()}"
+    job_queue = get_job_queue()
+    count = 0
+    while True:
+        job = job_queue.claim(owner, lease_seconds)
+        if job is None:
+            if drain:
+                return count
+            time.sleep(IDLE_SECONDS)
+            continue
+        run_job(job_queue, job, owner, lease_seconds, **kwargs)
+        count += 1
+
+def main():
+    parser = argparse.ArgumentParser(description='Run ingest jobs from the durable job queue.')
+    parser.add_argument('--processes', type=int, default=1, help='Number of worker processes')
+    parser.add_argument('--lease', type=int, default=LEASE_SECONDS, help='Lease length in seconds')
+    parser.add_argument('--drain', action='store_true', help='Exit once the queue has no runnable jobs')
+    parser.add_argument('--chunk_size', type=int, default=None, help='Chunk size used when splitting documents')
+    parser.add_argument('--chunk_overlap', type=int, default=None, help='Chunk overlap used when splitting documents')
+    parser.add_argument('--extract_workers', type=int, default=1, help='PDF extraction processes per file')
+    args = parser.parse_args()
+
+    options = dict(lease_seconds=args.lease, drain=args.drain, chunk_size=args.chunk_size,
+                   chunk_overlap=args.chunk_overlap, workers=args.extract_workers)
+    if args.processes <= 1:
+        run_worker(**options)
+        return
+    # Every process claims on its own connection; SKIP LOCKED keeps them off each other's jobs
+    context = multiprocessing.get_context('spawn')
+    processes = [context.Process(target=run_worker, kwargs=options, name=f"ingest-worker-{i}")
+                 for i in range(args.processes)]
+    for process in processes:
+        process.start()
+    try:
+        for process in processes:
+            process.join()
+    except KeyboardInterrupt:
+        for process in processes:
+            process.terminate()
+
+if __name__ == "__main__":
+    main()
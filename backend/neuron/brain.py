@@ -14,14 +14,14 @@ class Brain:
         logger.info("Brain initialized with OpenAI API key.")
 
     async def _query_api(self, model, prompt, is_chat_model=False, **kwargs):
-        """Internal method to perform the actual query to the OpenAI API."""
+        """Internal method to perform the actual query to the OpenAI API, without blocking the event loop."""
         try:
             if is_chat_model:
-                return openai.ChatCompletion.create(
+                return await openai.ChatCompletion.acreate(
                     model=model, messages=[{"role": "user", "content": prompt}], **kwargs
                 )
             else:
-                return openai.Completion.create(
+                return await openai.Completion.acreate(
                     model=model, prompt=prompt, **kwargs
                 )
         except Exception as e:
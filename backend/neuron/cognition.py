@@ -2,25 +2,64 @@ from pydantic import BaseModel
 from logger import setup_logger
 # Importing from the new module files
 from ..settings.embedding import embedding
+from ..settings.settings import Setting
+from ..settings.query_embedding import QueryEmbeddingCache, EmbeddingCoalescer
 from ..axon.in_come import File
 
 logger = setup_logger(__name__)
 
+setting = Setting()
+# Query embeddings, shared by every Cognition instance in the process
+query_cache = QueryEmbeddingCache(setting.query_cache_size, setting.query_cache_ttl)
+coalescer = (EmbeddingCoalescer(embedding.embed_documents, setting.query_coalesce_ms / 1000)
+             if setting.query_coalesce_ms > 0 else None)
+
 class Cognition(BaseModel):
     def embed_file(self, file: File, loader_class):
         file.compute_documents(loader_class)
-        embed = embedding.embed_documents([doc.page_content for doc in file.documents])
+        return self.embed_chunks(file)
+
+    def embed_chunks(self, file: File):
+        """
+        Embeds the chunks of a file whose documents have already been computed.
+
+        Only the chunks listed in ``file.embed_indexes`` are embedded when it is
+        set, as for near duplicates that reuse another document's vectors.
+
+        Args:
+            file (File): The file, after ``compute_documents``.
+
+        Returns:
+            list: One embedding vector per embedded chunk.
+        """
+        documents = file.documents
+        if file.embed_indexes is not None:
+            documents = [documents[index] for index in file.embed_indexes]
+        if not documents:
+            return []
+        embed = embedding.embed_documents([doc.page_content for doc in documents])
         return embed
     
     def embed_text(self, text: str):
         """
         Embeds the given text (query or any string input) using the same embedding model as for documents.
 
+        Repeated texts are answered from an in-process LRU cache. With
+        ``QUERY_COALESCE_MS`` set, texts embedded concurrently within that many
+        milliseconds of each other share one embedding request.
+
         Args:
             text (str): The text to embed.
 
         Returns:
             list: The embedding vector for the text.
         """
-        text_embedding = embedding.embed_documents([text])[0]
-        return text_embedding  # Assuming embed_text returns a list of embeddings
\ No newline at end of file
+        text_embedding = query_cache.get(text)
+        if text_embedding is not None:
+            return text_embedding
+        if coalescer is not None:
+            text_embedding = coalescer.embed(text)
+        else:
+            text_embedding = embedding.embed_documents([text])[0]
+        query_cache.put(text, text_embedding)
+        return text_embedding
\ No newline at end of file
@@ -1,30 +1,61 @@
 import uuid
-from typing import List
+from typing import Dict, Iterable, List, Optional
+import numpy as np
 from logger import setup_logger
-from ..settings.storage import store
+from ..settings.storage import store, CONTENT_BLOCK_SIZE
 from ..axon.in_come import File
+from .resemblance import forget_signature
 
 logger = setup_logger(__name__)
 
+# SHA-1s resolved per duplicate-check query
+DUPLICATE_BATCH_SIZE = 1000
+
+class DocumentMatch:
+    """
+    The chunks of one document that matched a search.
+
+    The document's full content is only fetched, once, when ``content`` is read.
+
+    Attributes:
+        doc_id (UUID): The matched document.
+        score (float): Similarity of its best matching chunk.
+        chunks (List[tuple]): ``(vector_index, snippet, similarity)`` of each
+            matching chunk, most similar first.
+    """
+
+    def __init__(self, doc_id, memory: 'Memory'):
+        self.doc_id = doc_id
+        self.score = float('-inf')
+        self.chunks = []
+        self._memory = memory
+        self._content = None
+
+    def add(self, vector_index, snippet, similarity):
+        self.chunks.append((vector_index, snippet, similarity))
+        self.score = max(self.score, similarity)
+
+    @property
+    def content(self) -> Optional[str]:
+        if self._content is None:
+            self._content = self._memory.retrieve_content(self.doc_id)
+        return self._content
+
+    def __repr__(self):
+        return f"DocumentMatch(doc_id={self.doc_id}, score={self.score:.3f}, chunks={len(self.chunks)})"
+
 class Memory:
     def __init__(self):
         self.store = store
 
-    def _execute_db_command(self, query, params):
-        """
-        Executes a database command with the provided query and parameters,
-        handling transactions and cursor management.
-        """
-        with self.store.get_cursor() as cur:
-            try:
-                cur.execute(query, params)
-                self.store.commit()
-                return cur.fetchone() if 'RETURNING' in query else None
-            except Exception as e:
-                self.store.rollback()
-                logger.error(f"Database command execution failed: {e}")
-                return None
-        
+    @staticmethod
+    def _quietly(write, *args, default=None):
+        """Run a store write, returning ``default`` if it fails; the store logs the error."""
+        try:
+            return write(*args)
+        except Exception:
+            return default
+
     def check_duplicate_in_db(self, file: File):
         """
         Check if a file with the same SHA1 hash already exists in the database.
@@ -34,51 +65,154 @@ class Memory:
             bool: True if a duplicate exists, False otherwise.
         """
         try:
-            with self.store.get_cursor() as cur:
-                cur.execute("SELECT doc_id FROM documents WHERE file_sha1 = %s", (file.file_sha1,))
-                duplicate = cur.fetchone()
-                return duplicate is not None
+            return self.store.retrieve_doc_id(file.file_sha1) is not None
         except Exception as e:
             logger.error(f"Error checking for duplicate: {e}")
             return False
     
+    def find_duplicates(self, sha1s: Iterable[str]) -> Dict[str, uuid.UUID]:
+        """
+        Resolve many SHA-1 hashes to stored documents in a few round trips.
+
+        Documents left incomplete by an interrupted ingest are not reported, so
+        those files are ingested again.
+
+        Args:
+            sha1s (Iterable[str]): SHA-1 hashes of the files to check.
+
+        Returns:
+            dict: The doc_id of every hash that is already stored, keyed by hash.
+        """
+        try:
+            return self.store.find_duplicates(list(dict.fromkeys(sha1s)), DUPLICATE_BATCH_SIZE)
+        except Exception as e:
+            logger.error(f"Error checking for duplicates: {e}")
+            return {}
+
     def add_document(self, file: File):
-        return self._execute_db_command("""
-            INSERT INTO documents (file_path, file_name, file_size, file_sha1, file_extension, chunk_size, chunk_overlap)
-            VALUES (%s, %s, %s, %s, %s, %s, %s) RETURNING doc_id
-        """, (
-            file.file_path,
-            file.file_name,
-            file.file_size,
-            file.file_sha1,
-            file.file_extension,
-            file.chunk_size,
-            file.chunk_overlap
-        ))
-
-    def add_vectors(self, file: File, embed: List):
-        vector_ids = [uuid.uuid4() for _ in embed]
-        for vector_id, vector_data in zip(vector_ids, embed):
-            self._execute_db_command("""
-                INSERT INTO vectors (vector_id, doc_id, vector_index, embeddings, created_at)
-                VALUES (%s, %s, %s, %s, CURRENT_TIMESTAMP)
-            """, (
-                vector_id,
-                file.doc_id,
-                vector_data
-            ))
-        return vector_ids
+        return self._quietly(self.store.add_document, {
+            'file_path': file.file_path,
+            'file_name': file.file_name,
+            'file_size': file.file_size,
+            'file_sha1': file.file_sha1,
+            'file_extension': file.file_extension,
+            'chunk_size': file.chunk_size,
+            'chunk_overlap': file.chunk_overlap,
+        })
+
+    @staticmethod
+    def chunk_texts(file: File, indexes: Optional[List[int]] = None) -> Optional[List[str]]:
+        """The text of the file's chunks at ``indexes``, or of every chunk; None if documents were not computed."""
+        if file.documents is None:
+            return None
+        indexes = range(len(file.documents)) if indexes is None else indexes
+        return [file.documents[index].page_content for index in indexes]
+
+    def add_vectors(self, file: File, embed: List, indexes: Optional[List[int]] = None):
+        """
+        Store a file's chunk embeddings, with the text of their chunks, in one transaction.
+
+        Args:
+            file (File): The stored file.
+            embed (List): The embedding vectors.
+            indexes (List[int]): Chunk index of each vector. Defaults to 0, 1, 2...,
+                for files whose every chunk was embedded.
+
+        Returns:
+            List[UUID]: The new vector ids, or an empty list if the write failed.
+        """
+        return self._quietly(self.store.add_vectors, file.doc_id, embed, indexes,
+                             self.chunk_texts(file, indexes), default=[])
+
+    def store_document(self, file: File, embed: List, content: str):
+        """
+        Store a file's document row, content, vectors and chunk texts in a single transaction.
+
+        Args:
+            file (File): The file, with its documents computed.
+            embed (List): The embedding vectors, one per chunk in ``file.embed_indexes``
+                when it is set, otherwise one per chunk.
+            content (str): The document's full text.
+
+        Returns:
+            UUID: The new doc_id, or None if nothing was stored.
+        """
+        document = {
+            'file_path': file.file_path,
+            'file_name': file.file_name,
+            'file_size': file.file_size,
+            'file_sha1': file.file_sha1,
+            'file_extension': file.file_extension,
+            'chunk_size': file.chunk_size,
+            'chunk_overlap': file.chunk_overlap,
+            'content': content,
+            'duplicate_of': file.duplicate_of,
+        }
+        try:
+            return self.store.store_document(document, embed, file.embed_indexes,
+                                             self.chunk_texts(file, file.embed_indexes))
+        except Exception as e:
+            logger.error(f"Failed to store {file.file_name}: {e}")
+            return None
 
     def update_document_vectors(self, doc_id, vector_ids: List[uuid.UUID]):
-        self._execute_db_command("""
-            UPDATE documents SET vectors_ids = %s WHERE doc_id = %s
-        """, (vector_ids, doc_id))
+        self._quietly(self.store.update_document_vectors, doc_id, vector_ids)
 
     def update_file_content(self, doc_id, file_content):
-        self._execute_db_command("""
-            UPDATE documents SET content = %s WHERE doc_id = %s
-        """, (file_content, doc_id))
+        self._quietly(self.store.update_content, doc_id, file_content)
     
+    def is_document_complete(self, doc_id):
+        """
+        Check whether every step of storing a document finished.
+
+        The content is written last, so a document without content was left
+        behind by an ingest that died part way through.
+
+        Args:
+            doc_id (UUID): The unique identifier of the document.
+
+        Returns:
+            bool: True if the document's content has been stored.
+        """
+        return self.store.is_document_complete(doc_id)
+
+    def delete_document(self, doc_id):
+        """
+        Delete a document, its content and its vectors.
+
+        Args:
+            doc_id (UUID): The unique identifier of the document.
+        """
+        self._quietly(self.store.delete_document, doc_id)
+        forget_signature(doc_id)
+        logger.info(f"Deleted document {doc_id}")
+
+    def add_minhash(self, doc_id, signature: bytes, chunk_hashes: List[int]):
+        """
+        Store a document's MinHash signature and chunk hashes in one transaction.
+
+        Args:
+            doc_id (UUID): The unique identifier of the document.
+            signature (bytes): The signature as packed uint32 values.
+            chunk_hashes (List[int]): A hash of each chunk's text.
+        """
+        self._quietly(self.store.add_minhash, doc_id, signature, chunk_hashes)
+
+    def retrieve_minhashes(self, after_seq: int = 0):
+        """
+        Retrieve MinHash signatures stored after a given sequence number.
+
+        Args:
+            after_seq (int): Only signatures with a higher sequence number are returned.
+
+        Returns:
+            list: Tuples of sequence number, doc_id and signature bytes.
+        """
+        return self.store.retrieve_minhashes(after_seq)
+
+    def retrieve_chunk_hashes(self, doc_id) -> List[int]:
+        return self.store.retrieve_chunk_hashes(doc_id)
+
     def retrieve_doc_id(self, sha1):
         try:
             doc_id = self.store.retrieve_doc_id(sha1)
@@ -89,10 +223,19 @@ class Memory:
         except Exception as e:
             logger.error(f"An error occurred while retrieving the document ID for SHA-1 hash {sha1}: {e}")
 
-    def retrieve_embeddings(self, doc_id):
-        # Assuming store.retrieve_embeddings returns a list of embedding strings
-        embedding_strings = self.store.retrieve_embeddings(doc_id)
-        return [np.array(embed_str.strip('[]').split(','), dtype=float) for embed_str in embedding_strings]
+    def retrieve_embeddings(self, doc_id, with_indexes: bool = False):
+        """
+        Retrieve a document's embeddings, in chunk order.
+
+        Args:
+            doc_id (UUID): The unique identifier of the document.
+            with_indexes (bool): Also return the chunk index of each row.
+
+        Returns:
+            np.ndarray: A ``(vectors, dimension)`` float32 matrix, one row per stored
+            vector; with ``with_indexes``, a tuple of the chunk indexes and the matrix.
+        """
+        return self.store.retrieve_embeddings(doc_id, with_indexes=with_indexes)
 
     def retrieve_file(self, doc_id):
         try:
@@ -101,16 +244,23 @@ class Memory:
                 file = File()
                 file.import_path(filepath=chunks_metadata['file_path'],
                                  chunk_size=chunks_metadata['chunk_size'],
-                                 chunk_overlap=chunks_metadata['chunk_overlap'])
+                                 chunk_overlap=chunks_metadata['chunk_overlap'],
+                                 stream=True)
                 return file
             else:
                 logger.error(f"No file found for doc_id {doc_id}")
         except Exception as e:
             logger.error(f"An error occurred while retrieving the file for doc_id {doc_id}: {e}")
     
-    def retrieve_content(self, doc_id):
+    def retrieve_content(self, doc_id, offset: int = 0, length: Optional[int] = None):
+        """
+        Retrieve a document's content, or only ``length`` characters from ``offset``.
+
+        Returns:
+            str: The content, or None if there is none or it could not be read.
+        """
         try:
-            content = self.store.retrieve_content(doc_id)
+            content = self.store.retrieve_content(doc_id, offset, length)
             if content is not None:
                 logger.info(f"Content retrieved for doc_id {doc_id}")
                 return content
@@ -119,18 +269,70 @@ class Memory:
         except Exception as e:
             logger.error(f"Error retrieving content for doc_id {doc_id}: {e}")
     
-    def retrieve_chunk(self, doc_id, chunk_index, loader_class):
+    def stream_content(self, doc_id, block_size: int = CONTENT_BLOCK_SIZE):
+        """
+        Read a document's content in blocks, for consumers that need the full text
+        but not all of it in memory at once.
+
+        Yields:
+            str: Successive blocks of the content.
         """
-        Retrieve and return a specific chunk from a document using its doc_id.
+        yield from self.store.iter_content(doc_id, block_size)
+
+    def retrieve_chunk(self, doc_id, chunk_index, loader_class=None):
+        """
+        Retrieve the text of a specific chunk of a document.
+
+        The text stored with the chunk's vector is returned from a single indexed
+        lookup. Only chunks stored before chunk text was kept fall back to parsing
+        the source file again, which needs ``loader_class``.
 
         Args:
             doc_id (UUID): The unique identifier of the document.
             chunk_index (int): The index of the chunk to retrieve.
-            loader_class (class): The class of the loader to use to load the file.
+            loader_class (class): The loader of the source file, for the fallback.
 
         Returns:
             str: The text of the specified chunk.
         """
+        texts = self.retrieve_chunk_batch([(doc_id, chunk_index)], loader_class)
+        return texts[(uuid.UUID(str(doc_id)), int(chunk_index))]
+
+    def retrieve_chunk_batch(self, chunks, loader_class=None) -> Dict[tuple, str]:
+        """
+        Retrieve the text of many chunks, from any number of documents, in one query.
+
+        Args:
+            chunks (Iterable[tuple]): ``(doc_id, chunk_index)`` pairs.
+            loader_class (class): The loader of the source files, for chunks stored
+                without their text; each such document is parsed once.
+
+        Returns:
+            dict: Chunk text keyed by ``(doc_id, chunk_index)``.
+
+        Raises:
+            IndexError: If a chunk index is out of range for its document.
+            ValueError: If a chunk has no stored text and no loader was given.
+        """
+        chunks = [(uuid.UUID(str(doc_id)), int(index)) for doc_id, index in chunks]
+        texts = self.store.retrieve_chunk_texts(chunks)
+        missing = {}
+        for doc_id, index in chunks:
+            if (doc_id, index) not in texts:
+                missing.setdefault(doc_id, []).append(index)
+        for doc_id, indexes in missing.items():
+            if loader_class is None:
+                raise ValueError(f"No stored text for chunks {indexes} of document {doc_id}")
+            logger.info(f"Parsing the source of document {doc_id} for chunks stored without text")
+            documents = self._parse_chunks(doc_id, loader_class)
+            for index in indexes:
+                if index < 0 or index >= len(documents):
+                    raise IndexError(f"Chunk index {index} is out of range for document {doc_id}")
+                texts[(doc_id, index)] = documents[index].page_content
+        return texts
+
+    def _parse_chunks(self, doc_id, loader_class):
+        """Split a document's source file again, as documents ingested before chunk text was stored require."""
         # Retrieve metadata from PGDocStore
         chunks_metadata = self.store.retrieve_chunks(doc_id)
         file_path = chunks_metadata['file_path']
@@ -143,19 +345,45 @@ class Memory:
             chunk_size=chunk_size,
             chunk_overlap=chunk_overlap
         )
-        file_processor.import_path(file_path, chunk_size, chunk_overlap)
+        file_processor.import_path(file_path, chunk_size, chunk_overlap, stream=True)
         file_processor.compute_documents(loader_class)
+        return file_processor.documents
+    
+    def search(self, query_embedding, match_threshold=0.8, match_count=5, ef_search=None, probes=None) -> List[DocumentMatch]:
+        """
+        Find the chunks most similar to a query, grouped by document.
 
-        # Extract and return the specific chunk
-        if chunk_index < 0 or chunk_index >= len(file_processor.documents):
-            raise IndexError(f"Chunk index {chunk_index} is out of range for document {doc_id}")
+        Each matching chunk is reported once, with a snippet of its text; the
+        documents' content is not transferred unless a match's ``content`` is read.
+
+        Args:
+            query_embedding (list): The embedding vector of the query.
+            match_threshold (float): The threshold for matching similarity. Defaults to 0.8.
+            match_count (int): The number of chunks to consider. Defaults to 5.
+            ef_search (int): HNSW candidate list size for this query.
+            probes (int): IVFFlat lists scanned for this query.
+
+        Returns:
+            List[DocumentMatch]: The matched documents, best match first.
+        """
+        rows = self.store.similarity_search(query_embedding, match_threshold, match_count, ef_search, probes)
+        matches = {}
+        seen = set()
+        for doc_id, vector_index, snippet, similarity in rows:
+            if (doc_id, vector_index) in seen:
+                continue
+            seen.add((doc_id, vector_index))
+            if doc_id not in matches:
+                matches[doc_id] = DocumentMatch(doc_id, self)
+            matches[doc_id].add(vector_index, snippet, similarity)
+        return sorted(matches.values(), key=lambda match: match.score, reverse=True)
 
-        return file_processor.documents[chunk_index]
-    
     def retrieval_in_document(self, query_embedding, doc_id, match_threshold=0.8, match_count=5):
         """
         Perform a similarity search for the given query embeddings within a specific document.
 
+        The document's embeddings are scored in memory, so no vector index is involved.
+
         Args:
             query_embedding (list): The embedding vector of the query.
             doc_id (UUID): The unique identifier of the document to search within.
@@ -163,22 +391,31 @@ class Memory:
             match_count (int): The number of matches to return. Defaults to 5.
 
         Returns:
-            list: A list of tuples containing matched content and similarity scores within the specified document.
+            list: ``(vector_index, chunk text, similarity)`` tuples, most similar first.
+            The text is None for chunks stored before chunk text was kept.
 
         Raises:
             Exception: If an error occurs during the database interaction or the search process.
         """
         try:
             # Retrieve embeddings for the specified document
-            document_embeddings = self.store.retrieve_document_embeddings(doc_id)
+            chunk_indexes, document_embeddings = self.retrieve_embeddings(doc_id, with_indexes=True)
+            if not len(document_embeddings):
+                return []
+
+            # Cosine similarity of the query with every chunk
+            query = np.asarray(query_embedding, dtype=np.float32)
+            norms = np.linalg.norm(document_embeddings, axis=1) * np.linalg.norm(query)
+            scores = document_embeddings @ query / np.maximum(norms, 1e-12)
+            best = np.argsort(-scores)[:match_count]
+            best = best[scores[best] > match_threshold]
 
-            # Perform similarity search with the query embedding against these document embeddings
-            matches = self.perform_similarity_search(query_embedding, document_embeddings, match_threshold, match_count)
-            
+            doc_id = uuid.UUID(str(doc_id))
+            texts = self.store.retrieve_chunk_texts([(doc_id, int(chunk_indexes[row])) for row in best])
+            matches = [(int(chunk_indexes[row]), texts.get((doc_id, int(chunk_indexes[row]))), float(scores[row]))
+                       for row in best]
             logger.info(f"Retrieved {len(matches)} matches for the given query in document {doc_id}.")
             return matches
         except Exception as e:
             logger.error(f"An error occurred during the retrieval process in document {doc_id}: {e}")
             raise e
-
-        
\ No newline at end of file
@@ -1,50 +1,175 @@
 import os
 import time
+import queue
+import argparse
+import threading
 from watchdog.observers import Observer
 from watchdog.events import FileSystemEventHandler
-from settings import Setting
-from collections import defaultdict
-import time
+from ..settings.settings import Setting
+from logger import setup_logger
+
+logger = setup_logger(__name__)
+
+# A file is handed to ingest once its size and mtime have not changed for this long
+SETTLE_SECONDS = 0.5
+
+# How often pending files are checked for write completion
+POLL_INTERVAL = 0.1
+
+# Files waiting for ingest; when full, settled files are held back until there is room
+QUEUE_SIZE = 64
+
+# Partial downloads and editor scratch files that are never ingested
+IGNORED_SUFFIXES = ('~', '.part', '.crdownload', '.tmp', '.swp')
+
+class Debouncer:
+    """
+    Collects file system events and releases each file once it has finished being written.
+
+    Repeated events for the same path collapse into one pending entry. A file is
+    released when its size and modification time have stayed the same for
+    ``settle_seconds``. Released files go to a bounded queue; while it is full,
+    settled files stay pending instead of being dropped.
+    """
+
+    def __init__(self, ready_queue: queue.Queue, settle_seconds: float = SETTLE_SECONDS):
+        self.ready_queue = ready_queue
+        self.settle_seconds = settle_seconds
+        # path -> ((size, mtime_ns), time the signature was first seen), or None when just touched
+        self._pending = {}
+        self._lock = threading.Lock()
+        self._stopped = threading.Event()
+        self._backpressure = False
+
+    def touch(self, path: str) -> None:
+        """Record an event for a path, restarting its settle timer."""
+        with self._lock:
+            self._pending[path] = None
+
+    def poll(self) -> None:
+        """Release every pending file that has settled, as far as the queue has room."""
+        now = time.monotonic()
+        with self._lock:
+            for path, state in list(self._pending.items()):
+                try:
+                    stat = os.stat(path)
+                except FileNotFoundError:
+                    # Deleted or renamed away before it settled
+                    del self._pending[path]
+                    continue
+                signature = (stat.st_size, stat.st_mtime_ns)
+                if state is None or state[0] != signature:
+                    self._pending[path] = (signature, now)
+                elif now - state[1] >= self.settle_seconds:
+                    try:
+                        self.ready_queue.put_nowait(path)
+                    except queue.Full:
+                        if not self._backpressure:
+                            logger.warning(f"Ingest queue is full; holding {len(self._pending)} files")
+                            self._backpressure = True
+                        break
+                    del self._pending[path]
+                    self._backpressure = False
+
+    def run(self) -> None:
+        while not self._stopped.wait(POLL_INTERVAL):
+            self.poll()
+
+    def stop(self) -> None:
+        self._stopped.set()
 
 class NewFileHandler(FileSystemEventHandler):
-    def __init__(self, signal_queue):
-        self.signal_queue = signal_queue
+    def __init__(self, debouncer: Debouncer, extensions):
+        self.debouncer = debouncer
+        self.extensions = set(extensions)
+
+    def _accept(self, path: str) -> bool:
+        name = os.path.basename(path)
+        return (not name.startswith('.') and not name.endswith(IGNORED_SUFFIXES)
+                and os.path.splitext(name)[-1].lower() in self.extensions)
 
     def on_created(self, event):
-        if not event.is_directory:
-            creation_time = os.path.getctime(event.src_path)
-            self.signal_queue[creation_time].append(event.src_path)
+        if not event.is_directory and self._accept(event.src_path):
+            self.debouncer.touch(event.src_path)
+
+    def on_modified(self, event):
+        self.on_created(event)
+
+    def on_moved(self, event):
+        # Downloads and atomic saves often land as a rename from a temporary name
+        if not event.is_directory and self._accept(event.dest_path):
+            self.debouncer.touch(event.dest_path)
 
-def signal_handler(signal_queue):
-    # Sort keys (creation times) to ensure files are processed in the order they were created
-    for creation_time in sorted(signal_queue.keys()):
-        files = signal_queue[creation_time]
-        # Here you can add the code to signal services and plugins with the list of files
-        print(f"Files created at {time.ctime(creation_time)}: {files}")
+def iter_queue(ready_queue: queue.Queue, stopped: threading.Event):
+    """Yield paths from the queue until ``stopped`` is set."""
+    while not stopped.is_set():
+        try:
+            yield ready_queue.get(timeout=POLL_INTERVAL)
+        except queue.Empty:
+            continue
 
-    # Clear the queue after handling
-    signal_queue.clear()
+def enqueue_files(paths):
+    """Add each settled file to the durable job queue for ingest workers to run."""
+    from ..settings.jobs import get_job_queue
+    from ..dendron.worker import enqueue_path
+
+    job_queue = get_job_queue()
+    for path in paths:
+        try:
+            if enqueue_path(job_queue, path):
+                logger.info(f"Queued {path} for ingest")
+            else:
+                logger.info(f"{path} is already queued")
+        except Exception as e:
+            logger.error(f"Failed to enqueue {path}: {e}")
+
+def ingest_files(paths):
+    """Ingest settled files in this process through the ingest pipeline."""
+    # Imported here so importing this module does not open a database connection
+    from ..dendron.pipeline import IngestPipeline
+
+    pipeline = IngestPipeline()
+    # The pipeline pulls from the queue only as fast as it can ingest,
+    # so a deep backlog stays in the debouncer rather than in memory twice
+    for item in pipeline.run(paths):
+        if item.status == 'failed':
+            logger.error(f"Failed to ingest {item.path}: {item.error}")
+        else:
+            logger.info(f"Ingested {item.path} as doc_id {item.doc_id} ({item.status})")
 
 def main():
+    # Extensions only; unlike the pipeline's loaders, importing these needs no database
+    from ..dendron.bulk import INGESTERS
+
+    parser = argparse.ArgumentParser(description='Watch the input directory and ingest new files.')
+    parser.add_argument('--enqueue', action='store_true',
+                        help='Add new files to the durable job queue instead of ingesting them here')
+    args = parser.parse_args()
+
     settings = Setting()
     input_dir = settings.input_dir
 
     if not input_dir or not os.path.isdir(input_dir):
-        print(f"Input directory {input_dir} is not valid")
+        logger.error(f"Input directory {input_dir} is not valid")
         return
 
-    signal_queue = defaultdict(list)
-    event_handler = NewFileHandler(signal_queue)
+    ready_queue = queue.Queue(maxsize=QUEUE_SIZE)
+    debouncer = Debouncer(ready_queue)
     observer = Observer()
-    observer.schedule(event_handler, path=input_dir, recursive=True)
+    observer.schedule(NewFileHandler(debouncer, INGESTERS), path=input_dir, recursive=True)
     observer.start()
+    debounce_thread = threading.Thread(target=debouncer.run, name='perception-debounce', daemon=True)
+    debounce_thread.start()
 
-    print(f"Monitoring directory for new files: {input_dir}")
+    stopped = threading.Event()
+    logger.info(f"Monitoring directory for new files: {input_dir}")
     try:
-        while True:
-            time.sleep(10)  # Adjust the frequency of checking new files as needed
-            signal_handler(signal_queue)
+        consume = enqueue_files if args.enqueue else ingest_files
+        consume(iter_queue(ready_queue, stopped))
     except KeyboardInterrupt:
+        stopped.set()
+    finally:
+        debouncer.stop()
         observer.stop()
     observer.join()
 
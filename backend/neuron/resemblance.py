@@ -0,0 +1,289 @@
+import re
+import time
+import zlib
+import hashlib
+import threading
+from typing import TYPE_CHECKING, Dict, Iterable, List, Optional, Tuple
+import numpy as np
+from ..settings.settings import Setting
+from logger import setup_logger
+
+if TYPE_CHECKING:
+    from ..axon.in_come import File
+
+logger = setup_logger(__name__)
+
+# Signature length; the estimate's standard error is about 1/sqrt(NUM_PERM)
+NUM_PERM = 128
+
+# 16 bands of 8 rows make documents above ~0.7 Jaccard similarity likely to share a bucket
+LSH_BANDS = 16
+
+# Documents are compared as sets of overlapping runs of this many words
+SHINGLE_WORDS = 5
+
+# Shingles hashed per numpy block, bounding the temporary matrix to BLOCK x NUM_PERM
+BLOCK_SIZE = 4096
+
+# Seconds between picking up signatures stored by other processes
+REFRESH_SECONDS = 5.0
+
+_MERSENNE_PRIME = np.uint64((1 << 61) - 1)
+_MAX_HASH = np.uint64(0xFFFFFFFF)
+_WORD = re.compile(r'\w+')
+_SPACE = re.compile(r'\s+')
+
+# Fixed seed: signatures must stay comparable with the ones already stored
+_random = np.random.RandomState(1)
+_A = _random.randint(1, 1 << 31, size=NUM_PERM).astype(np.uint64)
+_B = _random.randint(0, 1 << 31, size=NUM_PERM).astype(np.uint64)
+
+def shingle_hashes(text: str, size: int = SHINGLE_WORDS) -> np.ndarray:
+    """
+    Hash every run of ``size`` consecutive words of a text.
+
+    Args:
+        text (str): The text.
+        size (int): Words per shingle.
+
+    Returns:
+        np.ndarray: The distinct 32-bit shingle hashes, as uint64.
+    """
+    words = _WORD.findall(text.lower())
+    if not words:
+        return np.empty(0, dtype=np.uint64)
+    size = min(size, len(words))
+    word_hashes = np.fromiter((zlib.crc32(word.encode('utf-8')) for word in words),
+                              dtype=np.uint64, count=len(words))
+    count = len(words) - size + 1
+    combined = np.zeros(count, dtype=np.uint64)
+    for offset in range(size):
+        combined = (combined * np.uint64(1000003) + word_hashes[offset:offset + count]) & _MAX_HASH
+    return np.unique(combined)
+
+def minhash(text: str) -> Optional[np.ndarray]:
+    """
+    Compute the MinHash signature of a text.
+
+    Args:
+        text (str): The text.
+
+    Returns:
+        np.ndarray: ``NUM_PERM`` uint32 values, or None if the text has no words.
+    """
+    hashes = shingle_hashes(text)
+    if not len(hashes):
+        return None
+    signature = np.full(NUM_PERM, _MAX_HASH, dtype=np.uint64)
+    for start in range(0, len(hashes), BLOCK_SIZE):
+        block = hashes[start:start + BLOCK_SIZE, None]
+        values = ((block * _A + _B) % _MERSENNE_PRIME) & _MAX_HASH
+        np.minimum(signature, values.min(axis=0), out=signature)
+    return signature.astype(np.uint32)
+
+def jaccard(signature: np.ndarray, other: np.ndarray) -> float:
+    """Estimate the Jaccard similarity of two documents from their signatures."""
+    return float(np.count_nonzero(signature == other)) / len(signature)
+
+def band_keys(signature: np.ndarray, bands: int = LSH_BANDS) -> List[int]:
+    """
+    Hash each band of a signature to a signed 64-bit LSH bucket key.
+
+    The band number is part of the hash, so keys of different bands never collide
+    and all of them can live in one indexed column.
+    """
+    rows = len(signature) // bands
+    return [int.from_bytes(hashlib.blake2b(bytes([band]) + signature[band * rows:(band + 1) * rows].tobytes(),
+                                           digest_size=8).digest(), 'little', signed=True)
+            for band in range(bands)]
+
+def chunk_hashes(texts: Iterable[str]) -> List[int]:
+    """Hash chunk texts, ignoring differences in whitespace, for delta ingest."""
+    return [int.from_bytes(hashlib.blake2b(_SPACE.sub(' ', text).strip().encode('utf-8'),
+                                           digest_size=8).digest(), 'little', signed=True)
+            for text in texts]
+
+class LSHIndex:
+    """
+    In-memory locality-sensitive hashing index of MinHash signatures.
+
+    A lookup touches ``LSH_BANDS`` buckets and compares the signatures found
+    there, which takes microseconds regardless of how many documents are indexed.
+    """
+
+    def __init__(self, bands: int = LSH_BANDS):
+        self.bands = bands
+        self.buckets: Dict[int, List] = {}
+        self.signatures: Dict = {}
+        self._lock = threading.Lock()
+
+    def add(self, doc_id, signature: np.ndarray, keys: Optional[List[int]] = None) -> None:
+        keys = keys or band_keys(signature, self.bands)
+        with self._lock:
+            if doc_id in self.signatures:
+                return
+            self.signatures[doc_id] = signature
+            for key in keys:
+                self.buckets.setdefault(key, []).append(doc_id)
+
+    def remove(self, doc_id) -> None:
+        with self._lock:
+            signature = self.signatures.pop(doc_id, None)
+            if signature is None:
+                return
+            for key in band_keys(signature, self.bands):
+                bucket = self.buckets.get(key)
+                if bucket is not None and doc_id in bucket:
+                    bucket.remove(doc_id)
+                    if not bucket:
+                        del self.buckets[key]
+
+    def query(self, signature: np.ndarray, threshold: float) -> Optional[Tuple[object, float]]:
+        """
+        Find the most similar indexed document.
+
+        Args:
+            signature (np.ndarray): Signature of the document to look up.
+            threshold (float): Minimum estimated Jaccard similarity.
+
+        Returns:
+            tuple: The doc_id and estimated similarity of the best match at or
+            above the threshold, or None.
+        """
+        best = None
+        with self._lock:
+            candidates = {doc_id for key in band_keys(signature, self.bands)
+                          for doc_id in self.buckets.get(key, ())}
+            for doc_id in candidates:
+                similarity = jaccard(signature, self.signatures[doc_id])
+                if similarity >= threshold and (best is None or similarity > best[1]):
+                    best = (doc_id, similarity)
+        return best
+
+    def __len__(self):
+        return len(self.signatures)
+
+class NearDuplicateIndex:
+    """
+    The LSH index of stored documents, kept in sync with the database.
+
+    Signatures are persisted in ``document_minhash`` and bucketed in memory. The
+    index is loaded on first use; signatures stored by other processes are picked
+    up at most ``REFRESH_SECONDS`` later. Documents deleted in this process leave
+    the index at once; a match deleted by another process is dropped when a query
+    finds it gone.
+    """
+
+    def __init__(self, memory, refresh_seconds: float = REFRESH_SECONDS):
+        self.memory = memory
+        self.refresh_seconds = refresh_seconds
+        self.index = LSHIndex()
+        self._last_seq = 0
+        self._refreshed = 0.0
+        self._lock = threading.Lock()
+
+    def refresh(self, force: bool = False) -> None:
+        with self._lock:
+            if not force and time.monotonic() - self._refreshed < self.refresh_seconds:
+                return
+            for seq, doc_id, signature in self.memory.retrieve_minhashes(self._last_seq):
+                self.index.add(doc_id, np.frombuffer(bytes(signature), dtype=np.uint32))
+                self._last_seq = max(self._last_seq, seq)
+            self._refreshed = time.monotonic()
+
+    def query(self, signature: np.ndarray, threshold: float):
+        self.refresh()
+        while True:
+            match = self.index.query(signature, threshold)
+            if match is None or self.memory.is_document_complete(match[0]):
+                return match
+            logger.info(f"Dropping the signature of {match[0]}, which is no longer stored")
+            self.index.remove(match[0])
+
+_near_duplicate_index = None
+_near_duplicate_index_lock = threading.Lock()
+
+def get_near_duplicate_index(memory) -> NearDuplicateIndex:
+    """Return the process-wide near-duplicate index, loading it on first use."""
+    global _near_duplicate_index
+    with _near_duplicate_index_lock:
+        if _near_duplicate_index is None:
+            _near_duplicate_index = NearDuplicateIndex(memory)
+            _near_duplicate_index.refresh(force=True)
+            logger.info(f"Loaded {len(_near_duplicate_index.index)} MinHash signatures")
+        return _near_duplicate_index
+
+def forget_signature(doc_id) -> None:
+    """Drop a deleted document from the loaded near-duplicate index, if any."""
+    if _near_duplicate_index is not None:
+        _near_duplicate_index.index.remove(doc_id)
+
+def screen_near_duplicate(file: 'File', memory, policy: Optional[str] = None,
+                          threshold: Optional[float] = None):
+    """
+    Look a loaded file up among stored documents and apply the near-duplicate policy.
+
+    Sets ``file.minhash``. When a stored document is at least ``threshold``
+    similar, ``file.duplicate_of`` is set to it and:
+
+    - ``skip``: the file is not stored; its original's doc_id is returned.
+    - ``link``: the file is stored without vectors, linked to the original.
+    - ``delta``: only chunks whose text the original does not have are embedded.
+
+    Args:
+        file (File): A file whose documents have been computed.
+        memory (Memory): Memory used to read and persist signatures.
+        policy (str): ``off``, ``skip``, ``link`` or ``delta``. Defaults to the
+            ``NEAR_DUPLICATE`` setting.
+        threshold (float): Minimum Jaccard similarity. Defaults to the
+            ``NEAR_DUPLICATE_THRESHOLD`` setting.
+
+    Returns:
+        UUID: The original's doc_id if the file should be skipped, otherwise None.
+    """
+    if policy is None or threshold is None:
+        setting = Setting()
+        policy = policy or setting.near_duplicate
+        threshold = threshold if threshold is not None else setting.near_duplicate_threshold
+    file.minhash = minhash(file.page_text())
+    if policy == 'off' or file.minhash is None:
+        return None
+
+    started = time.perf_counter()
+    match = get_near_duplicate_index(memory).query(file.minhash, threshold)
+    elapsed = (time.perf_counter() - started) * 1000
+    if match is None:
+        logger.debug(f"No near duplicate for {file.file_name} ({elapsed:.3f} ms)")
+        return None
+
+    doc_id, similarity = match
+    logger.info(f"{file.file_name} is a near duplicate of {doc_id} "
+                f"(Jaccard ~{similarity:.2f}, {elapsed:.3f} ms); policy {policy}")
+    if policy == 'skip':
+        return doc_id
+    file.duplicate_of = doc_id
+    if policy == 'link':
+        file.embed_indexes = []
+    elif policy == 'delta':
+        known = set(memory.retrieve_chunk_hashes(doc_id))
+        hashes = chunk_hashes(document.page_content for document in file.documents)
+        file.embed_indexes = [index for index, value in enumerate(hashes) if value not in known]
+        logger.info(f"Embedding {len(file.embed_indexes)} of {len(hashes)} chunks not in {doc_id}")
+    else:
+        raise ValueError(f"Unsupported near-duplicate policy: {policy}")
+    return None
+
+def record_signature(file: 'File', memory) -> None:
+    """
+    Index a newly stored file's signature so later near duplicates are found.
+
+    Documents stored as a link or delta of another are not indexed; their
+    original already represents them.
+    """
+    if file.minhash is None or file.duplicate_of is not None:
+        return
+    hashes = chunk_hashes(document.page_content for document in file.documents)
+    memory.add_minhash(file.doc_id, file.minhash.tobytes(), hashes)
+    # Without a loaded index the signature is picked up when one is loaded
+    if _near_duplicate_index is not None:
+        _near_duplicate_index.index.add(file.doc_id, file.minhash)
@@ -1,9 +1,9 @@
 from ..settings.plugin import PluginInterface
 from ..settings.storage import store # Import store to access the database connection
+from ..settings.async_storage import get_async_store
 from ..settings.file_utils import sanitize_filename, open_file, save_file, move_file, delete_file, copy_file, rename_file
 import asyncio
 from ..neuron.brain import Brain
-from ..neuron.memory import Memory
 from typing import Any, Optional, List
 from logger import setup_logger
 import os
@@ -135,6 +135,23 @@ class DOIHandle(PluginInterface):
             logger.error(f"Error verifying DOI {doi}: {e}")
             return False
    
+    async def save_doi(self, async_store, doc_id, doi):
+        """
+        Insert or update the DOI of a document without blocking the event loop.
+
+        Args:
+            async_store (AsyncPGDocStore): The async document store.
+            doc_id (UUID): The unique identifier of the document.
+            doi (str): The DOI to save.
+        """
+        async with async_store.acquire() as connection:
+            await connection.execute("""
+                INSERT INTO articles_doi (doc_id, doi)
+                VALUES ($1, $2)
+                ON CONFLICT (doc_id) DO UPDATE
+                SET doi = EXCLUDED.doi;
+            """, doc_id, doi)
+
     async def retrieve_doi(self, doc_id):
         """
         Retrieves the DOI from the text content of a document or prompts the user to input one.
@@ -149,13 +166,14 @@ class DOIHandle(PluginInterface):
         Returns:
             str: The detected or user-input DOI, or None if not found or provided.
         """
-        memory = Memory()
+        async_store = get_async_store()
         brain = Brain()
 
         try:
-            file_content = memory.retrieve_content(doc_id)
+            # Only the head is needed; the database cuts it, so the rest is never transferred
+            file_content = await async_store.retrieve_content(doc_id, 0, 10000)
             if file_content:
-                prompt = file_content[:10000]  # Truncate to avoid overload
+                prompt = file_content
                 custom_instructions = open_file(r'prompt/citation_bot_prompt.txt')
                 full_prompt = f"{custom_instructions}\n{prompt}"
 
@@ -170,18 +188,10 @@ class DOIHandle(PluginInterface):
                     doi = response['choices'][0]['message']['content'] # Logic to extract DOI from response
                     if doi != "No DOI available, caution for citation." and self.verify_doi(doi):
                         try:
-                            with store.connection.cursor() as cursor:
-                                cursor.execute("""
-                                    INSERT INTO articles_doi (doc_id, doi)
-                                    VALUES (%s, %s)
-                                    ON CONFLICT (doc_id) DO UPDATE 
-                                    SET doi = EXCLUDED.doi;
-                                """, (doc_id, doi))
-                                store.connection.commit()
-                                logger.info(f"Verified DOI {doi} saved for doc_id {doc_id}")
-                                return doi
+                            await self.save_doi(async_store, doc_id, doi)
+                            logger.info(f"Verified DOI {doi} saved for doc_id {doc_id}")
+                            return doi
                         except Exception as e:
-                            store.connection.rollback()
                             logger.error(f"Error saving DOI for doc_id {doc_id}: {e}")
                     else:
                         logger.info("No valid DOI found to save.")
@@ -189,19 +199,10 @@ class DOIHandle(PluginInterface):
                         if user_provided_doi and self.verify_doi(user_provided_doi):
                             doi = user_provided_doi
                             try:
-                                with store.connection.cursor() as cursor:
-                                    # Insert the user-provided DOI into the database
-                                    cursor.execute("""
-                                        INSERT INTO articles_doi (doc_id, doi)
-                                        VALUES (%s, %s)
-                                        ON CONFLICT (doc_id) DO UPDATE 
-                                        SET doi = EXCLUDED.doi;
-                                    """, (doc_id, doi))
-                                    store.connection.commit()
-                                    logger.info(f"User-provided DOI {doi} saved for doc_id {doc_id}")
-                                    return doi
+                                await self.save_doi(async_store, doc_id, doi)
+                                logger.info(f"User-provided DOI {doi} saved for doc_id {doc_id}")
+                                return doi
                             except Exception as e:
-                                store.connection.rollback()
                                 logger.error(f"Error saving user-provided DOI for doc_id {doc_id}: {e}")
                             # logger.info(f"User-provided DOI {doi} saved for doc_id {doc_id}")
                             # return doi
@@ -0,0 +1,297 @@
+import uuid
+import asyncio
+import threading
+from contextlib import asynccontextmanager
+from typing import List, Optional
+import numpy as np
+import asyncpg
+from pgvector.asyncpg import register_vector
+from .settings import Setting
+from .vector_index import search_settings
+from .file_utils import clean_text
+from logger import setup_logger
+
+logger = setup_logger(__name__)
+
+class AsyncPGDocStore:
+    """
+    Postgres document store for coroutines, on asyncpg with its own connection pool.
+
+    It offers the read and write methods of ``PGDocStore`` as coroutines, so
+    async plugins can run many queries concurrently without blocking the event
+    loop. Vectors are exchanged with pgvector's binary codec. The pool is created
+    on first use in the running event loop, and created again if a later call
+    runs in a different loop.
+
+    Attributes:
+        config (dict): Connection parameters, as returned by ``Setting.get_database_config``.
+        max_connections (int): Size of the pool.
+    """
+
+    def __init__(self, config, min_connections: int = 1, max_connections: int = 10,
+                 ef_search: int = 40, probes: int = 10):
+        self.config = dict(config)
+        # asyncpg names the database parameter differently from psycopg2
+        self.config['database'] = self.config.pop('dbname', None)
+        if self.config.get('port'):
+            self.config['port'] = int(self.config['port'])
+        self.min_connections = min_connections
+        self.max_connections = max_connections
+        self.ef_search = ef_search
+        self.probes = probes
+        self._pool_task = None
+        self._loop = None
+        self._lock = threading.Lock()
+
+    @staticmethod
+    async def _init_connection(connection):
+        await register_vector(connection)
+
+    async def _create_pool(self) -> asyncpg.Pool:
+        # create_pool returns an awaitable Pool, not a coroutine, so it cannot be a task itself
+        return await asyncpg.create_pool(min_size=self.min_connections, max_size=self.max_connections,
+                                         init=self._init_connection, **self.config)
+
+    async def connect(self) -> asyncpg.Pool:
+        """Return the pool of the running event loop, creating it on first use."""
+        loop = asyncio.get_running_loop()
+        stale = None
+        with self._lock:
+            if self._loop is not loop or self._pool_task is None:
+                stale = self._pool_task
+                self._loop = loop
+                # Coroutines arriving while the pool is being created wait on the same task
+                self._pool_task = loop.create_task(self._create_pool())
+            task = self._pool_task
+        if stale is not None and stale.done() and not stale.cancelled() and stale.exception() is None:
+            # Its loop is gone, so the connections cannot be closed gracefully
+            stale.result().terminate()
+        try:
+            return await task
+        except Exception:
+            with self._lock:
+                if self._pool_task is task:
+                    self._pool_task = None
+            raise
+
+    async def close(self):
+        """Close every connection in the pool."""
+        with self._lock:
+            task, self._pool_task, self._loop = self._pool_task, None, None
+        if task is not None:
+            await (await task).close()
+
+    @asynccontextmanager
+    async def acquire(self):
+        """
+        Borrow a connection from the pool for the duration of an ``async with`` block.
+
+        Yields:
+            asyncpg.Connection: The connection; use ``connection.transaction()`` to group writes.
+        """
+        pool = await self.connect()
+        async with pool.acquire() as connection:
+            yield connection
+
+    async def write_vectors(self, connection, doc_id, vector_ids, embeddings, indexes=None, texts=None):
+        """
+        Write all of a document's vectors with binary COPY on the given connection.
+
+        Args:
+            connection (asyncpg.Connection): Connection of the transaction to write in.
+            doc_id (UUID): The document the vectors belong to.
+            vector_ids (List[UUID]): Id of each vector.
+            embeddings (List[List[float]]): The vectors.
+            indexes (List[int]): Chunk index of each vector. Defaults to 0, 1, 2...
+            texts (List[str]): Text of each vector's chunk.
+        """
+        if not vector_ids:
+            return
+        indexes = range(len(vector_ids)) if indexes is None else indexes
+        texts = [None] * len(vector_ids) if texts is None else [clean_text(text) for text in texts]
+        embeddings = np.asarray(embeddings, dtype=np.float32)
+        await connection.copy_records_to_table(
+            'vectors',
+            columns=['vector_id', 'doc_id', 'vector_index', 'embeddings', 'chunk_text'],
+            records=[(vector_id, doc_id, int(index), embedding, text)
+                     for vector_id, index, embedding, text in zip(vector_ids, indexes, embeddings, texts)])
+
+    async def store_document(self, document: dict, embeddings, indexes=None, texts=None) -> uuid.UUID:
+        """
+        Insert a document row, its content and all of its vectors in a single transaction.
+
+        Args:
+            document (dict): Column values of the ``documents`` row; a ``content``
+                entry is stored in ``document_contents`` instead.
+            embeddings (List[List[float]]): The document's vectors.
+            indexes (List[int]): Chunk index of each vector. Defaults to 0, 1, 2...
+            texts (List[str]): Text of each vector's chunk.
+
+        Returns:
+            UUID: The new document's doc_id.
+
+        Raises:
+            asyncpg.PostgresError: If any write fails; nothing is stored.
+        """
+        doc_id = uuid.uuid4()
+        vector_ids = [uuid.uuid4() for _ in embeddings]
+        document = dict(document)
+        content = document.pop('content', None)
+        columns = ['doc_id', 'vectors_ids'] + list(document)
+        placeholders = ', '.join(f'${position}' for position in range(1, len(columns) + 1))
+        try:
+            async with self.acquire() as connection:
+                async with connection.transaction():
+                    await connection.execute(f"""
+                        INSERT INTO documents ({', '.join(columns)}) VALUES ({placeholders})
+                    """, doc_id, vector_ids, *document.values())
+                    if content is not None:
+                        await self.write_content(connection, doc_id, content)
+                    await self.write_vectors(connection, doc_id, vector_ids, embeddings, indexes, texts)
+            return doc_id
+        except Exception as e:
+            logger.error(f"Failed to store document {document.get('file_name')}: {e}")
+            raise e
+
+    async def add_vectors(self, doc_id, embeddings, indexes=None, texts=None) -> List[uuid.UUID]:
+        """
+        Store vectors of an existing document in one transaction.
+
+        Returns:
+            List[UUID]: The new vector ids.
+        """
+        vector_ids = [uuid.uuid4() for _ in embeddings]
+        async with self.acquire() as connection:
+            async with connection.transaction():
+                await self.write_vectors(connection, doc_id, vector_ids, embeddings, indexes, texts)
+        return vector_ids
+
+    async def delete_document(self, doc_id):
+        """Delete a document and its vectors in one transaction."""
+        async with self.acquire() as connection:
+            async with connection.transaction():
+                await connection.execute("DELETE FROM vectors WHERE doc_id = $1", doc_id)
+                await connection.execute("DELETE FROM documents WHERE doc_id = $1", doc_id)
+
+    async def similarity_search(self, query_embedding, match_threshold=0.8, match_count=5, ef_search=None, probes=None):
+        """
+        Perform a similarity search in the database using vector embeddings.
+
+        Args:
+            query_embedding (list): The embedding vector of the query document.
+            match_threshold (float): The threshold for matching similarity (default is 0.8).
+            match_count (int): The number of matches to return (default is 5).
+            ef_search (int): HNSW candidate list size for this query. Defaults to the store's setting.
+            probes (int): IVFFlat lists scanned for this query. Defaults to the store's setting.
+
+        Returns:
+            list: One tuple per matching chunk: doc_id, vector_index, a snippet of
+            the chunk's text, and similarity, most similar first.
+        """
+        try:
+            async with self.acquire() as connection:
+                async with connection.transaction():
+                    await connection.execute("SELECT set_config('hnsw.ef_search', $1, true), "
+                                             "set_config('ivfflat.probes', $2, true)",
+                                             *search_settings(match_count, ef_search or self.ef_search,
+                                                              probes or self.probes))
+                    rows = await connection.fetch("SELECT * FROM match_documents($1, $2, $3)",
+                                                  np.asarray(query_embedding, dtype=np.float32),
+                                                  match_threshold, match_count)
+                return [tuple(row) for row in rows]
+        except asyncpg.PostgresError as e:
+            logger.error(f"Database error during similarity search: {e}")
+            raise e
+
+    async def retrieve_doc_id(self, sha1) -> Optional[uuid.UUID]:
+        """
+        Retrieves the document ID for a given SHA-1 hash value.
+
+        Returns:
+            UUID: The unique identifier of the document if found, otherwise None.
+        """
+        async with self.acquire() as connection:
+            doc_id = await connection.fetchval("SELECT doc_id FROM documents WHERE file_sha1 = $1", sha1)
+        if doc_id is None:
+            logger.info(f"No document found for SHA-1 hash {sha1}")
+        return doc_id
+
+    async def retrieve_embeddings(self, doc_id, with_indexes: bool = False):
+        """
+        Retrieves all embeddings associated with a specific document, in chunk order.
+
+        Returns:
+            np.ndarray: A ``(vectors, dimension)`` float32 matrix; with ``with_indexes``,
+            a tuple of the chunk indexes and the matrix.
+        """
+        async with self.acquire() as connection:
+            rows = await connection.fetch(
+                "SELECT vector_index, embeddings FROM vectors WHERE doc_id = $1 ORDER BY vector_index", doc_id)
+        indexes = np.array([row[0] for row in rows], dtype=np.int64)
+        matrix = (np.stack([row[1] for row in rows]).astype(np.float32, copy=False) if rows
+                  else np.empty((0, 0), dtype=np.float32))
+        if with_indexes:
+            return indexes, matrix
+        return matrix
+
+    async def retrieve_chunks(self, doc_id):
+        """
+        Retrieves file_path, chunk_size, and chunk_overlap for a given document.
+
+        Raises:
+            ValueError: If the document does not exist.
+        """
+        async with self.acquire() as connection:
+            row = await connection.fetchrow(
+                "SELECT file_path, chunk_size, chunk_overlap FROM documents WHERE doc_id = $1", doc_id)
+        if row is None:
+            raise ValueError(f"Document with doc_id {doc_id} not found")
+        return dict(row)
+
+    async def retrieve_content(self, doc_id, offset: int = 0, length: Optional[int] = None) -> Optional[str]:
+        """
+        Retrieves the content of a document, or ``length`` characters from ``offset``.
+
+        Returns:
+            str: The content of the document, or None if not found.
+        """
+        async with self.acquire() as connection:
+            if length is None:
+                content = await connection.fetchval(
+                    "SELECT substr(content, $1) FROM document_contents WHERE doc_id = $2", offset + 1, doc_id)
+            else:
+                content = await connection.fetchval(
+                    "SELECT substr(content, $1, $2) FROM document_contents WHERE doc_id = $3",
+                    offset + 1, length, doc_id)
+        if content is None:
+            logger.info(f"No content found for doc_id {doc_id}")
+        return content
+
+    async def write_content(self, connection, doc_id, content: str):
+        """Store or replace a document's content on the given connection; see ``PGDocStore.write_content``."""
+        content = clean_text(content)
+        await connection.execute("""
+            INSERT INTO document_contents (doc_id, content) VALUES ($1, $2)
+            ON CONFLICT (doc_id) DO UPDATE SET content = EXCLUDED.content
+        """, doc_id, content)
+        await connection.execute("UPDATE documents SET content_length = $1 WHERE doc_id = $2", len(content), doc_id)
+
+_async_store = None
+_async_store_lock = threading.Lock()
+
+def get_async_store() -> AsyncPGDocStore:
+    """
+    Return the shared async document store; its pool opens on first use.
+
+    Raises:
+        ValueError: If the configured database has no async store.
+    """
+    global _async_store
+    with _async_store_lock:
+        if _async_store is None:
+            setting = Setting()
+            if setting.database_type != 'pg':
+                raise ValueError(f"No async store for database type: {setting.database_type}")
+            _async_store = AsyncPGDocStore(setting.get_database_config(), max_connections=setting.pg_pool_size,
+                                           ef_search=setting.vector_ef_search, probes=setting.vector_probes)
+        return _async_store
@@ -0,0 +1,192 @@
+import os
+import time
+import sqlite3
+import threading
+from typing import Dict, Iterable, Optional
+from logger import setup_logger
+
+logger = setup_logger(__name__)
+
+# SQLite limits the number of bound parameters per statement
+SQLITE_BATCH_SIZE = 500
+
+# How long a statement waits for another process's write lock before failing
+BUSY_TIMEOUT_SECONDS = 30
+
+# Eviction trims the cache to this fraction of its budget, so a full cache does
+# not evict on every write
+EVICTION_TARGET = 0.9
+
+class DiskCache:
+    """
+    A size-bounded key/value cache persisted in SQLite with least-recently-used eviction.
+
+    Values are stored as blobs. The cache is safe to share between threads and can
+    be opened by several processes at once.
+
+    Attributes:
+        path (str): Location of the SQLite database.
+        max_bytes (int): Total size of stored values before eviction starts.
+        hits (int): Number of lookups answered from the cache.
+        misses (int): Number of lookups not found in the cache.
+    """
+
+    def __init__(self, path: str, max_bytes: int):
+        """
+        Opens (or creates) the cache database.
+
+        Args:
+            path (str): Location of the SQLite database.
+            max_bytes (int): Total size of stored values before eviction starts.
+        """
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self.path = path
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._connection = sqlite3.connect(path, check_same_thread=False, isolation_level=None,
+                                           timeout=BUSY_TIMEOUT_SECONDS)
+        self._connection.execute("PRAGMA journal_mode=WAL")
+        self._connection.execute("PRAGMA synchronous=NORMAL")
+        self._connection.execute("""
+            CREATE TABLE IF NOT EXISTS cache (
+                key TEXT PRIMARY KEY,
+                value BLOB NOT NULL,
+                size INTEGER NOT NULL,
+                accessed REAL NOT NULL
+            )
+        """)
+        self._connection.execute("CREATE INDEX IF NOT EXISTS cache_accessed ON cache (accessed)")
+        self._size = self._connection.execute("SELECT COALESCE(SUM(size), 0) FROM cache").fetchone()[0]
+
+    def get(self, key: str) -> Optional[bytes]:
+        """
+        Look up a single value.
+
+        Args:
+            key (str): The cache key.
+
+        Returns:
+            bytes: The cached value, or None on a miss.
+        """
+        return self.get_many([key]).get(key)
+
+    def get_many(self, keys: Iterable[str]) -> Dict[str, bytes]:
+        """
+        Look up many values, a few hundred keys per query.
+
+        Args:
+            keys (Iterable[str]): The cache keys.
+
+        Returns:
+            dict: The cached values of the keys that were found.
+        """
+        keys = list(dict.fromkeys(keys))
+        found = {}
+        with self._lock:
+            for start in range(0, len(keys), SQLITE_BATCH_SIZE):
+                batch = keys[start:start + SQLITE_BATCH_SIZE]
+                placeholders = ','.join('?' * len(batch))
+                rows = self._connection.execute(
+                    f"SELECT key, value FROM cache WHERE key IN ({placeholders})", batch
+                ).fetchall()
+                found.update(rows)
+            self._touch(list(found))
+            self.hits += len(found)
+            self.misses += len(keys) - len(found)
+        return found
+
+    def _touch(self, keys) -> None:
+        # One statement per batch of hits; a missed touch only makes eviction less exact
+        now = time.time()
+        try:
+            for start in range(0, len(keys), SQLITE_BATCH_SIZE):
+                batch = keys[start:start + SQLITE_BATCH_SIZE]
+                self._connection.execute(f"UPDATE cache SET accessed = ? WHERE key IN ({','.join('?' * len(batch))})",
+                                         [now] + batch)
+        except sqlite3.Error as e:
+            logger.warning(f"Could not record access to {len(keys)} entries of {self.path}: {e}")
+
+    def put(self, key: str, value: bytes) -> None:
+        """
+        Store a single value.
+
+        Args:
+            key (str): The cache key.
+            value (bytes): The value to store.
+        """
+        self.put_many({key: value})
+
+    def put_many(self, items: Dict[str, bytes]) -> None:
+        """
+        Store many values in one transaction, then evict if over budget.
+
+        Args:
+            items (dict): Values keyed by cache key.
+        """
+        if not items or self.max_bytes <= 0:
+            return
+        now = time.time()
+        with self._lock:
+            self._connection.execute("BEGIN")
+            try:
+                self._connection.executemany(
+                    "INSERT OR REPLACE INTO cache (key, value, size, accessed) VALUES (?, ?, ?, ?)",
+                    [(key, value, len(value), now) for key, value in items.items()]
+                )
+                self._connection.execute("COMMIT")
+            except Exception:
+                self._connection.execute("ROLLBACK")
+                raise
+            self._size += sum(len(value) for value in items.values())
+            if self._size > self.max_bytes:
+                self._evict()
+
+    def _evict(self) -> None:
+        # Replaced entries and other processes make the running total approximate
+        self._size = self._connection.execute("SELECT COALESCE(SUM(size), 0) FROM cache").fetchone()[0]
+        excess = self._size - int(self.max_bytes * EVICTION_TARGET)
+        if excess <= 0:
+            return
+        freed = 0
+        victims = []
+        for key, size in self._connection.execute("SELECT key, size FROM cache ORDER BY accessed"):
+            victims.append((key,))
+            freed += size
+            if freed >= excess:
+                break
+        self._connection.executemany("DELETE FROM cache WHERE key = ?", victims)
+        self._size -= freed
+        logger.info(f"Evicted {len(victims)} entries ({freed} bytes) from {self.path}")
+
+    def stats(self) -> Dict[str, float]:
+        """
+        Report cache effectiveness and size.
+
+        Returns:
+            dict: Hit and miss counts, hit rate, number of entries and stored bytes.
+        """
+        with self._lock:
+            entries = self._connection.execute("SELECT COUNT(*) FROM cache").fetchone()[0]
+            lookups = self.hits + self.misses
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': self.hits / lookups if lookups else 0.0,
+                'entries': entries,
+                'bytes': self._size,
+            }
+
+    def clear(self) -> None:
+        """Remove every entry and reset the counters."""
+        with self._lock:
+            self._connection.execute("DELETE FROM cache")
+            self._size = 0
+            self.hits = 0
+            self.misses = 0
+
+    def close(self) -> None:
+        """Close the underlying database connection."""
+        with self._lock:
+            self._connection.close()
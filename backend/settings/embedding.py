@@ -1,7 +1,9 @@
 
 from .settings import Setting
-from langchain.embeddings.openai import OpenAIEmbeddings
-import openai
+from .embedding_cache import get_embedding_cache
+from .embedding_scheduler import EmbeddingScheduler
+from .embedding_backends import create_backend
+import numpy as np
 import logging
 from logger import setup_logger
 
@@ -10,17 +12,25 @@ logger = setup_logger(__name__)
 class EmbeddingService:
     def __init__(self, setting: Setting):
         self.setting = setting
-        if self.setting.embedding_model == 'openai':
-            self.embedder = OpenAIEmbeddings(openai_api_key=self.setting.openai_api_key)
-        # Add other models here
-        else:
-            logger.error(f"Unsupported embedding model: {self.setting.embedding_model}")
-            raise NotImplementedError(f"Embedding model {self.setting.embedding_model} is not implemented")
+        self.backend = create_backend(setting)
+        self.model_name = self.backend.model_name
+        self.dimension = self.backend.dimension
+        self.scheduler = None
+        if self.backend.remote:
+            self.scheduler = EmbeddingScheduler(self.backend.embed_documents,
+                                                max_batch_tokens=setting.embedding_batch_tokens,
+                                                max_batch_size=setting.embedding_batch_size,
+                                                concurrency=setting.embedding_concurrency,
+                                                tokens_per_minute=setting.embedding_tokens_per_minute,
+                                                requests_per_minute=setting.embedding_requests_per_minute)
 
     def embed_documents(self, documents):
         """
         Embeds the given documents using the selected embedding model.
 
+        Texts already in the embedding cache are not sent to the model, nor are
+        repeats of a text within the same call.
+
         Args:
             documents (List[str]): A list of document texts to be embedded.
 
@@ -30,8 +40,34 @@ class EmbeddingService:
         Raises:
             Exception: If an error occurs during the embedding process.
         """
+        cache = get_embedding_cache()
+        if cache is None:
+            return self._embed(documents)
+        keys = [cache.key(self.model_name, text) for text in documents]
+        vectors = cache.get_vectors(keys)
+        # First text seen for every missing key
+        misses = {}
+        for key, text in zip(keys, documents):
+            if key not in vectors:
+                misses.setdefault(key, text)
+        if misses:
+            embedded = dict(zip(misses, self._embed(list(misses.values()))))
+            try:
+                cache.put_vectors(embedded)
+            except Exception as e:
+                # The vectors are paid for; losing them from the cache must not fail the ingest
+                logger.error(f"Failed to cache {len(embedded)} embeddings: {e}")
+            # Round through float32 so a vector is the same whether or not it came from the cache
+            vectors.update((key, np.asarray(vector, dtype=np.float32).tolist()) for key, vector in embedded.items())
+        logger.info(f"Embedded {len(documents)} texts, sending {len(misses)} to {self.model_name}")
+        return [vectors[key] for key in keys]
+
+    def _embed(self, documents):
         try:
-            return self.embedder.embed_documents(documents)
+            if self.scheduler is None:
+                # Local backends batch internally and have no rate limits
+                return self.backend.embed_documents(documents)
+            return self.scheduler.embed(documents)
         except Exception as e:
             logger.error(f"Error during document embedding: {e}")
             raise e
@@ -0,0 +1,172 @@
+import os
+import re
+import hashlib
+from abc import ABC, abstractmethod
+from typing import Dict, List, Type
+import numpy as np
+from .settings import Setting
+from logger import setup_logger
+
+logger = setup_logger(__name__)
+
+# Embedding backends by the name used in the EMBEDDING_MODEL setting
+BACKENDS: Dict[str, Type['EmbeddingBackend']] = {}
+
+def register_backend(name: str):
+    """Class decorator adding an embedding backend to the registry under ``name``."""
+    def register(cls):
+        BACKENDS[name] = cls
+        return cls
+    return register
+
+class EmbeddingBackend(ABC):
+    """
+    A source of embedding vectors.
+
+    Attributes:
+        model_name (str): Identifies the model, and with it the vector space; used in cache keys.
+        dimension (int): Length of the vectors.
+        remote (bool): Whether requests go over the network and are subject to rate limits.
+    """
+
+    model_name: str
+    dimension: int
+    remote: bool = False
+
+    @abstractmethod
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        """Embed a batch of texts, returning one vector per text."""
+
+@register_backend('openai')
+class OpenAIBackend(EmbeddingBackend):
+    remote = True
+
+    def __init__(self, setting: Setting):
+        from langchain.embeddings.openai import OpenAIEmbeddings
+
+        self.embedder = OpenAIEmbeddings(openai_api_key=setting.openai_api_key)
+        # Batching and rate-limit retries are the scheduler's; one attempt per request
+        self.embedder.max_retries = 1
+        self.model_name = f"openai/{self.embedder.model}"
+        self.dimension = setting.embedding_dim
+
+    def embed_documents(self, texts):
+        return self.embedder.embed_documents(texts)
+
+@register_backend('local')
+class LocalBackend(EmbeddingBackend):
+    """
+    A transformer model run on the CPU of this machine.
+
+    ``EMBEDDING_LOCAL_MODEL`` is either a directory holding an exported
+    ``model.onnx`` and its ``tokenizer.json``, run with onnxruntime, or any model
+    name or path sentence-transformers can load. The model is loaded once and
+    shared by all threads. Texts are sorted by length before batching, so each
+    batch pads to a similar length, and vectors are mean-pooled and normalized.
+    """
+
+    def __init__(self, setting: Setting):
+        self.path = setting.embedding_local_model
+        self.batch_size = setting.embedding_batch_size
+        threads = setting.embedding_local_threads or os.cpu_count() or 1
+        if os.path.isfile(os.path.join(self.path, 'model.onnx')):
+            self._load_onnx(threads)
+        else:
+            self._load_sentence_transformers(threads)
+        self.model_name = f"local/{os.path.basename(os.path.normpath(self.path))}"
+        if self.dimension != setting.embedding_dim:
+            raise ValueError(f"{self.path} produces {self.dimension}-dimensional vectors, but EMBEDDING_DIM is "
+                             f"{setting.embedding_dim}; set EMBEDDING_DIM={self.dimension} and create the "
+                             f"vector tables with that dimension")
+        logger.info(f"Loaded local embedding model {self.path} ({self.dimension} dimensions, {threads} threads)")
+
+    def _load_onnx(self, threads: int):
+        import onnxruntime
+        from tokenizers import Tokenizer
+
+        options = onnxruntime.SessionOptions()
+        options.intra_op_num_threads = threads
+        self.session = onnxruntime.InferenceSession(os.path.join(self.path, 'model.onnx'), options,
+                                                    providers=['CPUExecutionProvider'])
+        self.input_names = {model_input.name for model_input in self.session.get_inputs()}
+        self.tokenizer = Tokenizer.from_file(os.path.join(self.path, 'tokenizer.json'))
+        self.tokenizer.enable_truncation(max_length=512)
+        self.tokenizer.enable_padding()
+        self.dimension = self.session.get_outputs()[0].shape[-1]
+        self._encode = self._encode_onnx
+
+    def _load_sentence_transformers(self, threads: int):
+        import torch
+        from sentence_transformers import SentenceTransformer
+
+        torch.set_num_threads(threads)
+        self.model = SentenceTransformer(self.path, device='cpu')
+        self.dimension = self.model.get_sentence_embedding_dimension()
+        self._encode = self._encode_sentence_transformers
+
+    def _encode_onnx(self, texts: List[str]) -> np.ndarray:
+        encodings = self.tokenizer.encode_batch(texts)
+        mask = np.array([encoding.attention_mask for encoding in encodings], dtype=np.int64)
+        inputs = {'input_ids': np.array([encoding.ids for encoding in encodings], dtype=np.int64),
+                  'attention_mask': mask,
+                  'token_type_ids': np.array([encoding.type_ids for encoding in encodings], dtype=np.int64)}
+        hidden = self.session.run(None, {name: value for name, value in inputs.items()
+                                         if name in self.input_names})[0]
+        # Mean over the real tokens, ignoring padding
+        pooled = (hidden * mask[:, :, None]).sum(axis=1) / np.maximum(mask.sum(axis=1, keepdims=True), 1)
+        return pooled / np.maximum(np.linalg.norm(pooled, axis=1, keepdims=True), 1e-12)
+
+    def _encode_sentence_transformers(self, texts: List[str]) -> np.ndarray:
+        return self.model.encode(texts, batch_size=len(texts), convert_to_numpy=True, normalize_embeddings=True)
+
+    def embed_documents(self, texts):
+        order = sorted(range(len(texts)), key=lambda index: len(texts[index]))
+        vectors = np.empty((len(texts), self.dimension), dtype=np.float32)
+        for start in range(0, len(order), self.batch_size):
+            batch = order[start:start + self.batch_size]
+            vectors[batch] = self._encode([texts[index] for index in batch])
+        return vectors.tolist()
+
+@register_backend('hashing')
+class HashingBackend(EmbeddingBackend):
+    """
+    Deterministic bag-of-words feature hashing, for tests and offline development.
+
+    Each word adds +1 or -1 to one dimension chosen by its hash, and the vector
+    is normalized. Texts sharing words get similar vectors, identical texts get
+    identical vectors on every machine, and no model or network is needed.
+    """
+
+    _WORD = re.compile(r'\w+')
+
+    def __init__(self, setting: Setting):
+        self.dimension = setting.embedding_dim
+        self.model_name = f"hashing/{self.dimension}"
+
+    @staticmethod
+    def _hash(word: str) -> int:
+        return int.from_bytes(hashlib.blake2b(word.encode('utf-8'), digest_size=8).digest(), 'little')
+
+    def embed_documents(self, texts):
+        vectors = np.zeros((len(texts), self.dimension), dtype=np.float32)
+        for row, text in enumerate(texts):
+            hashes = np.fromiter((self._hash(word) for word in self._WORD.findall(text.lower())), dtype=np.uint64)
+            if not len(hashes):
+                continue
+            signs = np.where(hashes >> np.uint64(63), -1.0, 1.0).astype(np.float32)
+            np.add.at(vectors[row], (hashes % np.uint64(self.dimension)).astype(np.intp), signs)
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        return (vectors / np.maximum(norms, 1e-12)).tolist()
+
+def create_backend(setting: Setting) -> EmbeddingBackend:
+    """
+    Instantiate the backend named by the ``EMBEDDING_MODEL`` setting.
+
+    Raises:
+        NotImplementedError: If no backend is registered under that name.
+    """
+    backend_class = BACKENDS.get(setting.embedding_model)
+    if backend_class is None:
+        logger.error(f"Unsupported embedding model: {setting.embedding_model}")
+        raise NotImplementedError(f"Embedding model {setting.embedding_model} is not implemented")
+    return backend_class(setting)
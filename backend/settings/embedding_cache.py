@@ -0,0 +1,72 @@
+import os
+import re
+import hashlib
+import threading
+import unicodedata
+from typing import Dict, Iterable, List, Optional
+import numpy as np
+from .settings import Setting
+from .disk_cache import DiskCache
+from logger import setup_logger
+
+logger = setup_logger(__name__)
+
+_SPACE = re.compile(r'\s+')
+
+def normalize_text(text: str) -> str:
+    """Canonical form of a chunk for caching: NFC unicode with runs of whitespace collapsed."""
+    return _SPACE.sub(' ', unicodedata.normalize('NFC', text)).strip()
+
+class EmbeddingCache:
+    """
+    Persistent, content-addressed cache of embedding vectors.
+
+    Entries are keyed by the embedding model and the SHA-256 of the normalized
+    chunk text, so identical text is embedded once per model however many
+    documents, or chunk sizes, it turns up in. Vectors are stored as float32.
+    """
+
+    def __init__(self, path: str, max_bytes: int):
+        self.cache = DiskCache(path, max_bytes)
+
+    @staticmethod
+    def key(model: str, text: str) -> str:
+        return f"{model}:{hashlib.sha256(normalize_text(text).encode('utf-8')).hexdigest()}"
+
+    def get_vectors(self, keys: Iterable[str]) -> Dict[str, List[float]]:
+        """
+        Look up the vectors of many keys in one pass.
+
+        Returns:
+            dict: The cached vectors of the keys that were found.
+        """
+        found = self.cache.get_many(keys)
+        return {key: np.frombuffer(value, dtype=np.float32).tolist() for key, value in found.items()}
+
+    def put_vectors(self, vectors: Dict[str, List[float]]) -> None:
+        """Store vectors keyed by cache key."""
+        self.cache.put_many({key: np.asarray(vector, dtype=np.float32).tobytes()
+                             for key, vector in vectors.items()})
+
+    def stats(self):
+        return self.cache.stats()
+
+_embedding_cache = None
+_embedding_cache_lock = threading.Lock()
+
+def get_embedding_cache() -> Optional[EmbeddingCache]:
+    """
+    Return the shared embedding cache, opening it on first use.
+
+    Returns:
+        EmbeddingCache: The cache, or None if it is disabled by ``EMBEDDING_CACHE_MAX_MB=0``.
+    """
+    global _embedding_cache
+    with _embedding_cache_lock:
+        if _embedding_cache is None:
+            setting = Setting()
+            if setting.embedding_cache_size <= 0:
+                return None
+            _embedding_cache = EmbeddingCache(os.path.join(setting.cache_dir, 'embeddings.sqlite3'),
+                                              setting.embedding_cache_size)
+        return _embedding_cache
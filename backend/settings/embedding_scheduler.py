@@ -0,0 +1,146 @@
+import time
+import random
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, List, Optional
+import tiktoken
+from logger import setup_logger
+
+logger = setup_logger(__name__)
+
+# Retries of a batch rejected for exceeding the rate limit
+MAX_RETRIES = 6
+BACKOFF_BASE_SECONDS = 1.0
+BACKOFF_MAX_SECONDS = 60.0
+
+def is_rate_limit_error(error: Exception) -> bool:
+    """Whether an error from the embedding API is an HTTP 429, across openai client versions."""
+    status = getattr(error, 'http_status', None) or getattr(error, 'status_code', None)
+    return status == 429 or type(error).__name__ == 'RateLimitError'
+
+class TokenBucket:
+    """
+    Thread-safe token bucket refilled continuously at a per-minute rate.
+
+    Callers block in ``acquire`` until enough capacity is available. ``pause``
+    holds back every caller, for when the API reports that the limit was hit.
+    """
+
+    def __init__(self, per_minute: float, capacity: Optional[float] = None):
+        self.rate = per_minute / 60.0
+        self.capacity = capacity or per_minute
+        self.tokens = self.capacity
+        self._updated = time.monotonic()
+        self._paused_until = 0.0
+        self._lock = threading.Lock()
+
+    def acquire(self, amount: float) -> None:
+        # A request larger than the whole bucket waits for a full bucket, not forever
+        amount = min(amount, self.capacity)
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                wait = self._paused_until - now
+                if wait <= 0:
+                    if self.tokens >= amount:
+                        self.tokens -= amount
+                        return
+                    wait = (amount - self.tokens) / self.rate
+            time.sleep(wait)
+
+    def pause(self, seconds: float) -> None:
+        with self._lock:
+            self._paused_until = max(self._paused_until, time.monotonic() + seconds)
+
+class EmbeddingScheduler:
+    """
+    Sends texts to an embedding API in token-budgeted batches, several at a time.
+
+    Texts are packed in order into batches of at most ``max_batch_tokens`` tokens
+    and ``max_batch_size`` texts. Batches run on a thread pool shared by every
+    caller, so concurrent documents together never exceed ``concurrency``
+    requests in flight, and every request first draws from shared token and
+    request buckets. A rate-limit error pauses all callers and retries the batch
+    with exponential backoff. Results come back in input order.
+    """
+
+    def __init__(self,
+                 embed_batch: Callable[[List[str]], List],
+                 max_batch_tokens: int = 50000,
+                 max_batch_size: int = 256,
+                 concurrency: int = 4,
+                 tokens_per_minute: float = 1000000,
+                 requests_per_minute: float = 3000,
+                 encoding: str = 'cl100k_base'):
+        """
+        Args:
+            embed_batch (Callable): Embeds one batch of texts, returning one vector per text.
+            max_batch_tokens (int): Token budget of one request.
+            max_batch_size (int): Texts in one request.
+            concurrency (int): Requests in flight at once.
+            tokens_per_minute (float): Token rate limit of the API account.
+            requests_per_minute (float): Request rate limit of the API account.
+            encoding (str): tiktoken encoding used to count tokens.
+        """
+        self.embed_batch = embed_batch
+        self.max_batch_tokens = max_batch_tokens
+        self.max_batch_size = max_batch_size
+        self.encoding = tiktoken.get_encoding(encoding)
+        self.token_bucket = TokenBucket(tokens_per_minute)
+        self.request_bucket = TokenBucket(requests_per_minute)
+        self._executor = ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix='embedding')
+
+    def count_tokens(self, texts: List[str]) -> List[int]:
+        return [len(tokens) for tokens in self.encoding.encode_ordinary_batch(texts)]
+
+    def batches(self, texts: List[str]):
+        """
+        Pack texts, in order, into batches under the token and size budgets.
+
+        Yields:
+            tuple: The texts of a batch and their total token count.
+        """
+        batch, batch_tokens = [], 0
+        for text, tokens in zip(texts, self.count_tokens(texts)):
+            if batch and (batch_tokens + tokens > self.max_batch_tokens or len(batch) >= self.max_batch_size):
+                yield batch, batch_tokens
+                batch, batch_tokens = [], 0
+            batch.append(text)
+            batch_tokens += tokens
+        if batch:
+            yield batch, batch_tokens
+
+    def _run(self, batch: List[str], tokens: int) -> List:
+        for attempt in range(MAX_RETRIES + 1):
+            self.request_bucket.acquire(1)
+            self.token_bucket.acquire(tokens)
+            try:
+                return self.embed_batch(batch)
+            except Exception as e:
+                if not is_rate_limit_error(e) or attempt == MAX_RETRIES:
+                    raise
+                delay = min(BACKOFF_BASE_SECONDS * 2 ** attempt, BACKOFF_MAX_SECONDS)
+                delay += random.uniform(0, delay / 2)
+                logger.warning(f"Embedding rate limited; retrying {len(batch)} texts in {delay:.1f}s")
+                self.token_bucket.pause(delay)
+                time.sleep(delay)
+
+    def embed(self, texts: List[str]) -> List:
+        """
+        Embed texts, returning one vector per text in input order.
+
+        Args:
+            texts (List[str]): The texts to embed.
+
+        Returns:
+            List: The embedding vectors.
+        """
+        if not texts:
+            return []
+        futures = [self._executor.submit(self._run, batch, tokens) for batch, tokens in self.batches(texts)]
+        vectors = []
+        for future in futures:
+            vectors.extend(future.result())
+        return vectors
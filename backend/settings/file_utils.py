@@ -2,6 +2,7 @@ import os
 import re
 import shutil
 import hashlib
+import mmap
 import uuid
 from logger import setup_logger
 
@@ -35,6 +36,10 @@ def sanitize_filename(filename: str) -> str:
     logger.info(f"Sanitized filename: {sanitized}")
     return sanitized
 
+def clean_text(text: str) -> str:
+    """Text as Postgres accepts it; NUL characters, which extracted PDF text can contain, are dropped."""
+    return text.replace('\x00', '')
+
 def delete_file(filepath: str) -> None:
     if not os.path.isfile(filepath):
         raise ValueError(f"{filepath} is not a valid file.")
@@ -77,14 +82,65 @@ def get_file_size(source_filepath: str) -> int:
         raise ValueError(f"{source_filepath} is not a valid file.")
     return os.path.getsize(source_filepath)
 
+# Read buffer used when hashing files; large enough to keep syscalls cheap,
+# small enough that hashing never holds more than this much of a file in memory.
+HASH_BUFFER_SIZE = 1024 * 1024
+
+def compute_sha1_and_size_from_file(source_filepath: str, buffer_size: int = HASH_BUFFER_SIZE):
+    """
+    Compute the SHA-1 hash and size of a file in a single streaming pass.
+
+    The file is read into one reusable fixed-size buffer, so memory use stays at
+    ``buffer_size`` regardless of how large the file is.
+
+    Args:
+        source_filepath (str): Path to the file.
+        buffer_size (int): Size of the read buffer in bytes.
+
+    Returns:
+        tuple: The hex SHA-1 digest and the number of bytes read.
+    """
+    sha1 = hashlib.sha1()
+    size = 0
+    buffer = bytearray(buffer_size)
+    view = memoryview(buffer)
+    with open(source_filepath, "rb", buffering=0) as file:
+        while True:
+            read = file.readinto(buffer)
+            if not read:
+                break
+            sha1.update(view[:read])
+            size += read
+    return sha1.hexdigest(), size
+
 def compute_sha1_from_file(source_filepath: str):
-    with open(source_filepath, "rb") as file:
-        bytes = file.read()
-        readable_hash = compute_sha1_from_content(bytes)
+    readable_hash, _ = compute_sha1_and_size_from_file(source_filepath)
     return readable_hash
 
 def compute_sha1_from_content(content):
     return hashlib.sha1(content).hexdigest()
 
+def map_file(source_filepath: str):
+    """
+    Open a read-only memory-mapped view of a file.
+
+    The returned object supports the buffer protocol as well as ``read``/``seek``,
+    so it can be handed to loaders expecting bytes or a binary stream without
+    copying the file into memory. Empty files cannot be mapped and yield ``b''``.
+
+    Args:
+        source_filepath (str): Path to the file.
+
+    Returns:
+        mmap.mmap | bytes: The mapped file contents.
+    """
+    if not os.path.isfile(source_filepath):
+        raise ValueError(f"{source_filepath} is not a valid file.")
+    with open(source_filepath, "rb") as file:
+        if os.fstat(file.fileno()).st_size == 0:
+            return b''
+        # The mapping keeps its own reference to the file, so closing it here is safe
+        return mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+
 def vector_id_from_sha1(sha1: str) -> uuid.UUID:
     return uuid.UUID(sha1[:32])
\ No newline at end of file
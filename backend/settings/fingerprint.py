@@ -0,0 +1,124 @@
+import os
+import time
+import sqlite3
+import threading
+from typing import Optional, Tuple
+from .settings import Setting
+from .file_utils import compute_sha1_and_size_from_file
+from logger import setup_logger
+
+logger = setup_logger(__name__)
+
+# Files modified this recently are hashed but not cached: a write landing in the
+# same mtime tick as the hash would otherwise go unnoticed on the next scan.
+RACY_SECONDS = 2.0
+
+class FingerprintCache:
+    """
+    Remembers the SHA-1 of files by path, size, modification time and inode.
+
+    A file whose stat still matches its cached fingerprint is not read again, so
+    rescanning a folder of unchanged files costs one ``stat`` and one indexed
+    lookup per file instead of a full hash.
+
+    Attributes:
+        path (str): Location of the SQLite database.
+        hits (int): Number of files whose hash came from the cache.
+        misses (int): Number of files that had to be hashed.
+    """
+
+    def __init__(self, path: str):
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self.path = path
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._connection = sqlite3.connect(path, check_same_thread=False, isolation_level=None, timeout=30)
+        self._connection.execute("PRAGMA journal_mode=WAL")
+        self._connection.execute("PRAGMA synchronous=NORMAL")
+        self._connection.execute("""
+            CREATE TABLE IF NOT EXISTS fingerprints (
+                path TEXT PRIMARY KEY,
+                size INTEGER NOT NULL,
+                mtime_ns INTEGER NOT NULL,
+                inode INTEGER NOT NULL,
+                sha1 TEXT NOT NULL
+            )
+        """)
+
+    def lookup(self, path: str, stat: os.stat_result) -> Optional[str]:
+        """
+        Return the cached SHA-1 of a file if its fingerprint is unchanged.
+
+        Args:
+            path (str): Path to the file.
+            stat (os.stat_result): The file's current stat.
+
+        Returns:
+            str: The cached SHA-1, or None if the file is new or has changed.
+        """
+        with self._lock:
+            row = self._connection.execute(
+                "SELECT sha1 FROM fingerprints WHERE path = ? AND size = ? AND mtime_ns = ? AND inode = ?",
+                (os.path.abspath(path), stat.st_size, stat.st_mtime_ns, stat.st_ino)
+            ).fetchone()
+            if row:
+                self.hits += 1
+            else:
+                self.misses += 1
+        return row[0] if row else None
+
+    def sha1_and_size(self, path: str) -> Tuple[str, int]:
+        """
+        Return the SHA-1 and size of a file, hashing it only if it has changed.
+
+        Args:
+            path (str): Path to the file.
+
+        Returns:
+            tuple: The hex SHA-1 digest and the file size in bytes.
+        """
+        stat = os.stat(path)
+        sha1 = self.lookup(path, stat)
+        if sha1 is not None:
+            return sha1, stat.st_size
+        sha1, size = compute_sha1_and_size_from_file(path)
+        after = os.stat(path)
+        # Only cache a hash that provably belongs to the fingerprint it is stored under
+        unchanged = (after.st_size, after.st_mtime_ns, after.st_ino) == (stat.st_size, stat.st_mtime_ns, stat.st_ino)
+        if unchanged and size == stat.st_size and time.time() - stat.st_mtime > RACY_SECONDS:
+            with self._lock:
+                self._connection.execute(
+                    "INSERT OR REPLACE INTO fingerprints (path, size, mtime_ns, inode, sha1) VALUES (?, ?, ?, ?, ?)",
+                    (os.path.abspath(path), stat.st_size, stat.st_mtime_ns, stat.st_ino, sha1)
+                )
+        return sha1, size
+
+    def sha1(self, path: str) -> str:
+        return self.sha1_and_size(path)[0]
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': self.hits / lookups if lookups else 0.0,
+            }
+
+_fingerprint_cache = None
+_fingerprint_cache_lock = threading.Lock()
+
+def get_fingerprint_cache() -> FingerprintCache:
+    """
+    Return the shared fingerprint cache, opening it on first use.
+
+    Returns:
+        FingerprintCache: The cache, stored as ``fingerprints.sqlite3`` in the cache directory.
+    """
+    global _fingerprint_cache
+    with _fingerprint_cache_lock:
+        if _fingerprint_cache is None:
+            setting = Setting()
+            _fingerprint_cache = FingerprintCache(os.path.join(setting.cache_dir, 'fingerprints.sqlite3'))
+        return _fingerprint_cache
@@ -0,0 +1,311 @@
+import os
+import time
+import sqlite3
+import threading
+from abc import ABC, abstractmethod
+from typing import Optional
+from .settings import Setting
+from logger import setup_logger
+
+logger = setup_logger(__name__)
+
+# Seconds a claimed job stays leased to its worker before others may take it over
+LEASE_SECONDS = 600
+
+# Retry delay after the first failure, doubled on every further failure
+RETRY_BASE_SECONDS = 30
+RETRY_MAX_SECONDS = 3600
+
+MAX_ATTEMPTS = 5
+
+# Recorded on jobs whose lease ran out on their last attempt, typically because the file crashed the worker
+LEASE_EXPIRED_ERROR = 'lease expired'
+
+def retry_delay(attempts: int) -> float:
+    """
+    Exponential backoff before the next attempt of a job.
+
+    Args:
+        attempts (int): Number of attempts made so far.
+
+    Returns:
+        float: Seconds to wait.
+    """
+    return min(RETRY_BASE_SECONDS * 2 ** max(attempts - 1, 0), RETRY_MAX_SECONDS)
+
+class Job:
+    """
+    An ingest job claimed from the queue.
+
+    Attributes:
+        job_id (int): Queue identifier of the job.
+        file_path (str): Path of the file to ingest.
+        file_sha1 (str): SHA-1 of the file when it was enqueued.
+        attempts (int): Attempts so far, including the current one.
+        max_attempts (int): Attempts allowed before the job is marked dead.
+    """
+
+    def __init__(self, job_id, file_path, file_sha1, attempts, max_attempts):
+        self.job_id = job_id
+        self.file_path = file_path
+        self.file_sha1 = file_sha1
+        self.attempts = attempts
+        self.max_attempts = max_attempts
+
+class JobQueue(ABC):
+    """
+    Durable queue of ingest jobs, one per file SHA-1.
+
+    Jobs move from ``queued`` to ``running`` when a worker claims them under a
+    time-limited lease, then to ``done``, back to ``queued`` with a backoff delay
+    on failure, or to ``dead`` once they run out of attempts. A worker that dies
+    simply lets its lease expire, and the job is claimed again; a job whose lease
+    expires on its last attempt is marked dead instead, so a file that kills its
+    worker is not retried forever.
+    """
+
+    @abstractmethod
+    def enqueue(self, file_path: str, file_sha1: str, max_attempts: int = MAX_ATTEMPTS) -> bool:
+        """
+        Add a job unless one already exists for the same SHA-1.
+
+        Returns:
+            bool: True if a new job was added.
+        """
+
+    @abstractmethod
+    def claim(self, owner: str, lease_seconds: int = LEASE_SECONDS) -> Optional[Job]:
+        """
+        Lease the next runnable job to a worker.
+
+        Returns:
+            Job: The claimed job, or None if nothing is runnable.
+        """
+
+    @abstractmethod
+    def renew(self, job: Job, owner: str, lease_seconds: int = LEASE_SECONDS) -> bool:
+        """Extend the lease on a running job. Returns False if the lease was lost."""
+
+    @abstractmethod
+    def complete(self, job: Job, owner: str, doc_id) -> None:
+        """Mark a job done with the doc_id it produced."""
+
+    @abstractmethod
+    def fail(self, job: Job, owner: str, error: str) -> None:
+        """Schedule a retry with backoff, or mark the job dead when out of attempts."""
+
+    @abstractmethod
+    def counts(self) -> dict:
+        """Number of jobs in each state."""
+
+class PGJobQueue(JobQueue):
+    """
+    Job queue in the ``ingest_jobs`` table of the cognimesh Postgres database.
+
+    Claims use ``FOR UPDATE SKIP LOCKED`` so any number of workers, on any number
+    of hosts, can drain the queue without blocking each other.
+    """
+
+    def __init__(self, config):
+        # Imported here so the SQLite queue works without a Postgres driver installed
+        import psycopg2
+        self.config = config
+        self._connect = psycopg2.connect
+        self.connection = self._connect(**config)
+        self._lock = threading.Lock()
+
+    def _execute(self, query, params=()):
+        with self._lock:
+            if self.connection.closed:
+                self.connection = self._connect(**self.config)
+            try:
+                with self.connection.cursor() as cur:
+                    cur.execute(query, params)
+                    result = cur.fetchall() if cur.description else cur.rowcount
+                self.connection.commit()
+                return result
+            except Exception:
+                self.connection.rollback()
+                raise
+
+    def enqueue(self, file_path, file_sha1, max_attempts=MAX_ATTEMPTS):
+        return self._execute("""
+            INSERT INTO ingest_jobs (file_path, file_sha1, max_attempts)
+            VALUES (%s, %s, %s)
+            ON CONFLICT (file_sha1) DO NOTHING
+        """, (file_path, file_sha1, max_attempts)) == 1
+
+    def claim(self, owner, lease_seconds=LEASE_SECONDS):
+        # Jobs whose worker died on their last attempt are buried rather than leased again
+        rows = self._execute("""
+            WITH expired AS (
+                UPDATE ingest_jobs
+                SET state = 'dead', last_error = %s, lease_owner = NULL, lease_expires = NULL,
+                    updated_at = CURRENT_TIMESTAMP
+                WHERE state = 'running' AND lease_expires < CURRENT_TIMESTAMP AND attempts >= max_attempts
+            )
+            UPDATE ingest_jobs
+            SET state = 'running', attempts = attempts + 1, lease_owner = %s,
+                lease_expires = CURRENT_TIMESTAMP + %s * INTERVAL '1 second',
+                updated_at = CURRENT_TIMESTAMP
+            WHERE job_id = (
+                SELECT job_id FROM ingest_jobs
+                WHERE (state = 'queued' AND run_after <= CURRENT_TIMESTAMP)
+                   OR (state = 'running' AND lease_expires < CURRENT_TIMESTAMP AND attempts < max_attempts)
+                ORDER BY run_after
+                LIMIT 1
+                FOR UPDATE SKIP LOCKED
+            )
+            RETURNING job_id, file_path, file_sha1, attempts, max_attempts
+        """, (LEASE_EXPIRED_ERROR, owner, lease_seconds))
+        return Job(*rows[0]) if rows else None
+
+    def renew(self, job, owner, lease_seconds=LEASE_SECONDS):
+        return self._execute("""
+            UPDATE ingest_jobs
+            SET lease_expires = CURRENT_TIMESTAMP + %s * INTERVAL '1 second', updated_at = CURRENT_TIMESTAMP
+            WHERE job_id = %s AND lease_owner = %s AND state = 'running'
+        """, (lease_seconds, job.job_id, owner)) == 1
+
+    def complete(self, job, owner, doc_id):
+        self._execute("""
+            UPDATE ingest_jobs
+            SET state = 'done', doc_id = %s, lease_owner = NULL, lease_expires = NULL,
+                last_error = NULL, updated_at = CURRENT_TIMESTAMP
+            WHERE job_id = %s AND lease_owner = %s
+        """, (doc_id, job.job_id, owner))
+
+    def fail(self, job, owner, error):
+        state = 'dead' if job.attempts >= job.max_attempts else 'queued'
+        self._execute("""
+            UPDATE ingest_jobs
+            SET state = %s, last_error = %s, lease_owner = NULL, lease_expires = NULL,
+                run_after = CURRENT_TIMESTAMP + %s * INTERVAL '1 second', updated_at = CURRENT_TIMESTAMP
+            WHERE job_id = %s AND lease_owner = %s
+        """, (state, error, retry_delay(job.attempts), job.job_id, owner))
+
+    def counts(self):
+        return dict(self._execute("SELECT state, COUNT(*) FROM ingest_jobs GROUP BY state"))
+
+class SQLiteJobQueue(JobQueue):
+    """
+    Job queue in a local SQLite database, for running without Postgres.
+
+    Claims take SQLite's write lock with ``BEGIN IMMEDIATE``, so several worker
+    processes on the same machine can share the queue.
+    """
+
+    def __init__(self, path: str):
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self.path = path
+        self._lock = threading.Lock()
+        self.connection = sqlite3.connect(path, check_same_thread=False, isolation_level=None, timeout=30)
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        self.connection.execute("""
+            CREATE TABLE IF NOT EXISTS ingest_jobs (
+                job_id INTEGER PRIMARY KEY AUTOINCREMENT,
+                file_sha1 TEXT UNIQUE NOT NULL,
+                file_path TEXT NOT NULL,
+                state TEXT NOT NULL DEFAULT 'queued',
+                attempts INTEGER NOT NULL DEFAULT 0,
+                max_attempts INTEGER NOT NULL DEFAULT 5,
+                run_after REAL NOT NULL,
+                lease_owner TEXT,
+                lease_expires REAL,
+                doc_id TEXT,
+                last_error TEXT,
+                created_at REAL NOT NULL,
+                updated_at REAL NOT NULL
+            )
+        """)
+        self.connection.execute("CREATE INDEX IF NOT EXISTS ingest_jobs_claim_idx ON ingest_jobs (state, run_after)")
+
+    def _execute(self, query, params=(), immediate=False, before=()):
+        """Run a statement in its own transaction, after the ``(query, params)`` pairs in ``before``."""
+        with self._lock:
+            self.connection.execute("BEGIN IMMEDIATE" if immediate else "BEGIN")
+            try:
+                for statement, statement_params in before:
+                    self.connection.execute(statement, statement_params)
+                cur = self.connection.execute(query, params)
+                result = cur.fetchall() if cur.description else cur.rowcount
+                self.connection.execute("COMMIT")
+                return result
+            except Exception:
+                self.connection.execute("ROLLBACK")
+                raise
+
+    def enqueue(self, file_path, file_sha1, max_attempts=MAX_ATTEMPTS):
+        now = time.time()
+        return self._execute("""
+            INSERT OR IGNORE INTO ingest_jobs (file_path, file_sha1, max_attempts, run_after, created_at, updated_at)
+            VALUES (?, ?, ?, ?, ?, ?)
+        """, (file_path, file_sha1, max_attempts, now, now, now)) == 1
+
+    def claim(self, owner, lease_seconds=LEASE_SECONDS):
+        now = time.time()
+        rows = self._execute("""
+            UPDATE ingest_jobs
+            SET state = 'running', attempts = attempts + 1, lease_owner = ?, lease_expires = ?, updated_at = ?
+            WHERE job_id = (
+                SELECT job_id FROM ingest_jobs
+                WHERE (state = 'queued' AND run_after <= ?)
+                   OR (state = 'running' AND lease_expires < ? AND attempts < max_attempts)
+                ORDER BY run_after
+                LIMIT 1
+            )
+            RETURNING job_id, file_path, file_sha1, attempts, max_attempts
+        """, (owner, now + lease_seconds, now, now, now), immediate=True, before=[("""
+            UPDATE ingest_jobs
+            SET state = 'dead', last_error = ?, lease_owner = NULL, lease_expires = NULL, updated_at = ?
+            WHERE state = 'running' AND lease_expires < ? AND attempts >= max_attempts
+        """, (LEASE_EXPIRED_ERROR, now, now))])
+        return Job(*rows[0]) if rows else None
+
+    def renew(self, job, owner, lease_seconds=LEASE_SECONDS):
+        now = time.time()
+        return self._execute("""
+            UPDATE ingest_jobs SET lease_expires = ?, updated_at = ?
+            WHERE job_id = ? AND lease_owner = ? AND state = 'running'
+        """, (now + lease_seconds, now, job.job_id, owner)) == 1
+
+    def complete(self, job, owner, doc_id):
+        self._execute("""
+            UPDATE ingest_jobs
+            SET state = 'done', doc_id = ?, lease_owner = NULL, lease_expires = NULL, last_error = NULL, updated_at = ?
+            WHERE job_id = ? AND lease_owner = ?
+        """, (str(doc_id), time.time(), job.job_id, owner))
+
+    def fail(self, job, owner, error):
+        now = time.time()
+        state = 'dead' if job.attempts >= job.max_attempts else 'queued'
+        self._execute("""
+            UPDATE ingest_jobs
+            SET state = ?, last_error = ?, lease_owner = NULL, lease_expires = NULL, run_after = ?, updated_at = ?
+            WHERE job_id = ? AND lease_owner = ?
+        """, (state, error, now + retry_delay(job.attempts), now, job.job_id, owner))
+
+    def counts(self):
+        return dict(self._execute("SELECT state, COUNT(*) FROM ingest_jobs GROUP BY state"))
+
+def get_job_queue(setting: Setting = None) -> JobQueue:
+    """
+    Open the job queue selected by the ``JOB_QUEUE`` setting.
+
+    Args:
+        setting (Setting): Settings to use; loaded from the environment if omitted.
+
+    Returns:
+        JobQueue: A Postgres queue for ``pg``, a SQLite queue for ``sqlite``.
+
+    Raises:
+        ValueError: If the queue type is not supported.
+    """
+    setting = setting or Setting()
+    if setting.job_queue == 'pg':
+        return PGJobQueue(setting.get_database_config())
+    elif setting.job_queue == 'sqlite':
+        return SQLiteJobQueue(setting.job_db_path)
+    else:
+        logger.error(f"Unsupported job queue: {setting.job_queue}")
+        raise ValueError(f"Unsupported job queue: {setting.job_queue}")
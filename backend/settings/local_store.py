@@ -0,0 +1,609 @@
+import os
+import json
+import uuid
+import time
+import sqlite3
+import threading
+from contextlib import contextmanager
+from typing import Dict, List, Optional
+import numpy as np
+from .file_utils import clean_text
+from logger import setup_logger
+
+logger = setup_logger(__name__)
+
+# Bytes of vectors in one segment file before the next one is started
+SEGMENT_BYTES = 256 * 1024 * 1024
+
+# Sealed segments with a larger share of deleted rows are rewritten by compaction
+COMPACT_DEAD_FRACTION = 0.3
+
+# Seconds between background compaction passes; 0 turns the compactor off
+COMPACT_INTERVAL_SECONDS = 300.0
+
+# Seconds a compacted segment's file is kept, so readers that listed it before the compaction can still map it
+RETIRE_GRACE_SECONDS = 600.0
+
+# Columns of the documents table a caller may set
+DOCUMENT_COLUMNS = ('file_path', 'file_name', 'file_size', 'file_sha1', 'file_extension',
+                    'chunk_size', 'chunk_overlap', 'duplicate_of', 'vectors_ids')
+
+def _uuid_text(value) -> Optional[str]:
+    return None if value is None else str(uuid.UUID(str(value)))
+
+class Segment:
+    """
+    The committed rows of one segment file, mapped read-only, and what they belong to.
+
+    Attributes:
+        segment (int): Number of the segment.
+        version (int): Bumped whenever rows of the segment are added or deleted.
+        matrix (np.memmap): The ``(rows, dimension)`` float32 vectors, mapped without copying.
+        norms (np.ndarray): Length of each vector.
+        vector_ids (np.ndarray): The vector_id stored in each row, None for dead rows.
+        live (np.ndarray): Whether each row still belongs to a stored vector.
+    """
+
+    def __init__(self, segment, version, matrix, norms, vector_ids):
+        self.segment = segment
+        self.version = version
+        self.matrix = matrix
+        self.norms = norms
+        self.vector_ids = vector_ids
+        self.live = np.array([vector_id is not None for vector_id in vector_ids], dtype=bool)
+
+class LocalDocStore:
+    """
+    Document store kept in a local directory, for deployments without Postgres.
+
+    Vectors are appended to float32 segment files, which searches memory-map and
+    scan in process without copying. Documents, content, chunk texts and the
+    position of every vector live in a small SQLite database next to them.
+
+    Writes are crash safe: under SQLite's write lock, vectors are appended and
+    synced to the segment file first, and only then is the metadata that points at
+    them committed. Rows written by a writer that died before committing lie past
+    the segment's committed row count and are cut off by the next writer. Deleted
+    vectors leave dead rows behind; a background thread rewrites segments that
+    are mostly dead, and removes their files once ``RETIRE_GRACE_SECONDS`` have
+    passed, so readers in any process never find a listed segment missing.
+    Several processes may share one directory.
+
+    It implements the ``PGDocStore`` methods used by ``Memory``; the Postgres
+    specific plugins, vector indexes and async store are not available with it.
+
+    Attributes:
+        path (str): The store's directory.
+        dimension (int): Length of the vectors.
+    """
+
+    def __init__(self, path: str, dimension: int, compact_interval: float = COMPACT_INTERVAL_SECONDS):
+        os.makedirs(path, exist_ok=True)
+        self.path = path
+        self.dimension = dimension
+        self.segment_rows = max(SEGMENT_BYTES // (4 * dimension), 1)
+        self._lock = threading.RLock()
+        self._segments: Dict[int, Segment] = {}
+        self.connection = sqlite3.connect(os.path.join(path, 'store.sqlite3'), check_same_thread=False,
+                                          isolation_level=None, timeout=30)
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        self.connection.execute("PRAGMA foreign_keys=ON")
+        self._create_tables()
+        self._recover()
+        self._stopped = threading.Event()
+        self._compactor = None
+        if compact_interval > 0:
+            self._compactor = threading.Thread(target=self._compact_periodically, args=(compact_interval,),
+                                               name='local-store-compactor', daemon=True)
+            self._compactor.start()
+
+    def _create_tables(self):
+        self.connection.executescript("""
+            CREATE TABLE IF NOT EXISTS store_settings (
+                key TEXT PRIMARY KEY,
+                value TEXT NOT NULL
+            );
+            CREATE TABLE IF NOT EXISTS documents (
+                doc_key INTEGER PRIMARY KEY,
+                doc_id TEXT UNIQUE NOT NULL,
+                file_path TEXT,
+                file_name TEXT DEFAULT '',
+                file_size INTEGER,
+                file_sha1 TEXT UNIQUE,
+                vectors_ids TEXT DEFAULT '[]',
+                file_extension TEXT DEFAULT '',
+                chunk_size INTEGER DEFAULT 500,
+                chunk_overlap INTEGER DEFAULT 0,
+                duplicate_of TEXT,
+                content_length INTEGER,
+                date REAL DEFAULT (strftime('%s', 'now'))
+            );
+            CREATE TABLE IF NOT EXISTS document_contents (
+                doc_key INTEGER PRIMARY KEY REFERENCES documents(doc_key) ON DELETE CASCADE,
+                content TEXT NOT NULL
+            );
+            CREATE TABLE IF NOT EXISTS segments (
+                segment INTEGER PRIMARY KEY AUTOINCREMENT,
+                rows INTEGER NOT NULL DEFAULT 0,
+                version INTEGER NOT NULL DEFAULT 0,
+                sealed INTEGER NOT NULL DEFAULT 0
+            );
+            CREATE TABLE IF NOT EXISTS vectors (
+                vector_id TEXT PRIMARY KEY,
+                doc_key INTEGER NOT NULL REFERENCES documents(doc_key) ON DELETE CASCADE,
+                vector_index INTEGER NOT NULL,
+                chunk_text TEXT,
+                segment INTEGER NOT NULL,
+                row INTEGER NOT NULL,
+                UNIQUE (doc_key, vector_index)
+            );
+            CREATE INDEX IF NOT EXISTS vectors_segment_idx ON vectors (segment, row);
+            CREATE TABLE IF NOT EXISTS retired_segments (
+                segment INTEGER PRIMARY KEY,
+                retired_at REAL NOT NULL
+            );
+            CREATE TABLE IF NOT EXISTS document_minhash (
+                seq INTEGER PRIMARY KEY AUTOINCREMENT,
+                doc_key INTEGER UNIQUE NOT NULL REFERENCES documents(doc_key) ON DELETE CASCADE,
+                signature BLOB NOT NULL,
+                chunk_hashes TEXT NOT NULL DEFAULT '[]'
+            );
+        """)
+        row = self.connection.execute("SELECT value FROM store_settings WHERE key = 'dimension'").fetchone()
+        if row is None:
+            self.connection.execute("INSERT OR IGNORE INTO store_settings (key, value) VALUES ('dimension', ?)",
+                                    (str(self.dimension),))
+        elif int(row[0]) != self.dimension:
+            raise ValueError(f"{self.path} holds {row[0]}-dimensional vectors, but EMBEDDING_DIM is {self.dimension}")
+
+    @contextmanager
+    def _transaction(self, immediate: bool = True):
+        """A transaction on the metadata; ``immediate`` takes the write lock up front."""
+        with self._lock:
+            self.connection.execute("BEGIN IMMEDIATE" if immediate else "BEGIN")
+            try:
+                yield self.connection
+                self.connection.execute("COMMIT")
+            except BaseException:
+                self.connection.execute("ROLLBACK")
+                raise
+
+    def _segment_path(self, segment: int) -> str:
+        return os.path.join(self.path, f"segment-{segment:08d}.f32")
+
+    def _recover(self):
+        """Cut uncommitted rows off segment files and remove files no segment refers to."""
+        with self._transaction() as conn:
+            committed = dict(conn.execute("SELECT segment, rows FROM segments").fetchall())
+            retired = {segment for segment, in conn.execute("SELECT segment FROM retired_segments")}
+            for name in os.listdir(self.path):
+                if not (name.startswith('segment-') and name.endswith('.f32')):
+                    continue
+                segment = int(name[len('segment-'):-len('.f32')])
+                path = os.path.join(self.path, name)
+                if segment in retired:
+                    # Removed by compaction once its grace period is over
+                    continue
+                if segment not in committed:
+                    # Started by a writer that died before committing it
+                    os.remove(path)
+                elif os.path.getsize(path) > committed[segment] * 4 * self.dimension:
+                    logger.warning(f"Discarding uncommitted vectors at the end of {name}")
+                    with open(path, 'r+b') as f:
+                        f.truncate(committed[segment] * 4 * self.dimension)
+
+    def _append(self, conn, matrix: np.ndarray):
+        """
+        Append vectors to the active segment, starting new ones as segments fill up.
+
+        Must run inside a write transaction; the rows only count once it commits.
+
+        Returns:
+            list: The ``(segment, row)`` of each vector.
+        """
+        if matrix.ndim != 2 or matrix.shape[1] != self.dimension:
+            raise ValueError(f"Expected {self.dimension}-dimensional vectors, got shape {matrix.shape}")
+        row = conn.execute("SELECT segment, rows FROM segments WHERE sealed = 0 ORDER BY segment DESC LIMIT 1").fetchone()
+        segment, rows = row if row else (None, self.segment_rows)
+        placements = []
+        start = 0
+        while start < len(matrix):
+            if rows >= self.segment_rows:
+                if segment is not None:
+                    conn.execute("UPDATE segments SET sealed = 1 WHERE segment = ?", (segment,))
+                segment, rows = conn.execute("INSERT INTO segments (rows) VALUES (0)").lastrowid, 0
+            count = min(self.segment_rows - rows, len(matrix) - start)
+            with open(self._segment_path(segment), 'ab') as f:
+                # Rows past the committed count were written by a writer that died before committing
+                f.truncate(rows * 4 * self.dimension)
+                f.write(matrix[start:start + count].tobytes())
+                f.flush()
+                os.fsync(f.fileno())
+            conn.execute("UPDATE segments SET rows = rows + ?, version = version + 1 WHERE segment = ?",
+                         (count, segment))
+            placements.extend((segment, rows + offset) for offset in range(count))
+            rows += count
+            start += count
+        return placements
+
+    def _doc_key(self, conn, doc_id) -> Optional[int]:
+        row = conn.execute("SELECT doc_key FROM documents WHERE doc_id = ?", (_uuid_text(doc_id),)).fetchone()
+        return row[0] if row else None
+
+    def _insert_document(self, conn, doc_id, document: dict) -> int:
+        document = {column: value for column, value in document.items() if value is not None}
+        unknown = set(document) - set(DOCUMENT_COLUMNS)
+        if unknown:
+            raise ValueError(f"Unknown document columns: {', '.join(sorted(unknown))}")
+        if 'duplicate_of' in document:
+            document['duplicate_of'] = _uuid_text(document['duplicate_of'])
+        if 'vectors_ids' in document:
+            document['vectors_ids'] = json.dumps([str(vector_id) for vector_id in document['vectors_ids']])
+        columns = ['doc_id'] + list(document)
+        return conn.execute(f"""
+            INSERT INTO documents ({', '.join(columns)}) VALUES ({', '.join(['?'] * len(columns))})
+        """, [str(doc_id)] + list(document.values())).lastrowid
+
+    def _write_vectors(self, conn, doc_key, vector_ids, embeddings, indexes=None, texts=None):
+        if not vector_ids:
+            return
+        indexes = range(len(vector_ids)) if indexes is None else indexes
+        texts = [None] * len(vector_ids) if texts is None else [clean_text(text) for text in texts]
+        placements = self._append(conn, np.ascontiguousarray(embeddings, dtype=np.float32))
+        conn.executemany("""
+            INSERT INTO vectors (vector_id, doc_key, vector_index, chunk_text, segment, row) VALUES (?, ?, ?, ?, ?, ?)
+        """, [(str(vector_id), doc_key, int(index), text, segment, row)
+              for vector_id, index, text, (segment, row) in zip(vector_ids, indexes, texts, placements)])
+
+    def _write_content(self, conn, doc_key, content: str):
+        conn.execute("INSERT OR REPLACE INTO document_contents (doc_key, content) VALUES (?, ?)", (doc_key, content))
+        conn.execute("UPDATE documents SET content_length = ? WHERE doc_key = ?", (len(content), doc_key))
+
+    def store_document(self, document: dict, embeddings, indexes=None, texts=None, method=None):
+        """
+        Insert a document, its content and all of its vectors in a single transaction.
+
+        Args:
+            document (dict): Column values of the document; ``content`` is stored apart.
+            embeddings (List[List[float]]): The document's vectors.
+            indexes (List[int]): Chunk index of each vector. Defaults to 0, 1, 2...
+            texts (List[str]): Text of each vector's chunk.
+            method: Accepted for compatibility with ``PGDocStore``; ignored.
+
+        Returns:
+            UUID: The new document's doc_id.
+        """
+        document = dict(document)
+        content = document.pop('content', None)
+        doc_id = uuid.uuid4()
+        vector_ids = [uuid.uuid4() for _ in embeddings]
+        try:
+            with self._transaction() as conn:
+                doc_key = self._insert_document(conn, doc_id, dict(document, vectors_ids=vector_ids))
+                self._write_vectors(conn, doc_key, vector_ids, embeddings, indexes, texts)
+                if content is not None:
+                    self._write_content(conn, doc_key, clean_text(content))
+            return doc_id
+        except Exception as e:
+            logger.error(f"Failed to store document {document.get('file_name')}: {e}")
+            raise e
+
+    def add_document(self, document: dict):
+        doc_id = uuid.uuid4()
+        with self._transaction() as conn:
+            self._insert_document(conn, doc_id, document)
+        return doc_id
+
+    def add_vectors(self, doc_id, embeddings, indexes=None, texts=None):
+        vector_ids = [uuid.uuid4() for _ in embeddings]
+        try:
+            with self._transaction() as conn:
+                doc_key = self._doc_key(conn, doc_id)
+                if doc_key is None:
+                    raise ValueError(f"Document with doc_id {doc_id} not found")
+                self._write_vectors(conn, doc_key, vector_ids, embeddings, indexes, texts)
+            return vector_ids
+        except Exception as e:
+            logger.error(f"Failed to add vectors for doc_id {doc_id}: {e}")
+            raise e
+
+    def update_document_vectors(self, doc_id, vector_ids):
+        with self._transaction() as conn:
+            conn.execute("UPDATE documents SET vectors_ids = ? WHERE doc_id = ?",
+                         (json.dumps([str(vector_id) for vector_id in vector_ids]), _uuid_text(doc_id)))
+
+    def update_content(self, doc_id, content: str):
+        with self._transaction() as conn:
+            doc_key = self._doc_key(conn, doc_id)
+            if doc_key is not None:
+                self._write_content(conn, doc_key, clean_text(content))
+
+    def delete_document(self, doc_id):
+        """Delete a document, its content and its vectors; the vectors' rows become dead."""
+        with self._transaction() as conn:
+            doc_key = self._doc_key(conn, doc_id)
+            if doc_key is None:
+                return
+            conn.execute("""
+                UPDATE segments SET version = version + 1
+                WHERE segment IN (SELECT DISTINCT segment FROM vectors WHERE doc_key = ?)
+            """, (doc_key,))
+            conn.execute("DELETE FROM documents WHERE doc_key = ?", (doc_key,))
+
+    def is_document_complete(self, doc_id) -> bool:
+        with self._lock:
+            row = self.connection.execute("SELECT content_length IS NOT NULL FROM documents WHERE doc_id = ?",
+                                          (_uuid_text(doc_id),)).fetchone()
+        return bool(row and row[0])
+
+    def find_duplicates(self, sha1s, batch_size: int = 1000):
+        # SQLite builds before 3.32 allow at most 999 parameters
+        batch_size = min(batch_size, 900)
+        found = {}
+        with self._lock:
+            for start in range(0, len(sha1s), batch_size):
+                batch = sha1s[start:start + batch_size]
+                found.update((sha1, uuid.UUID(doc_id)) for sha1, doc_id in self.connection.execute(f"""
+                    SELECT file_sha1, doc_id FROM documents
+                    WHERE file_sha1 IN ({', '.join(['?'] * len(batch))}) AND content_length IS NOT NULL
+                """, batch))
+        return found
+
+    def add_minhash(self, doc_id, signature: bytes, chunk_hashes):
+        with self._transaction() as conn:
+            doc_key = self._doc_key(conn, doc_id)
+            conn.execute("INSERT OR IGNORE INTO document_minhash (doc_key, signature, chunk_hashes) VALUES (?, ?, ?)",
+                         (doc_key, bytes(signature), json.dumps([int(value) for value in chunk_hashes])))
+
+    def retrieve_minhashes(self, after_seq: int = 0):
+        with self._lock:
+            rows = self.connection.execute("""
+                SELECT m.seq, d.doc_id, m.signature FROM document_minhash m
+                JOIN documents d ON d.doc_key = m.doc_key
+                WHERE m.seq > ? ORDER BY m.seq
+            """, (after_seq,)).fetchall()
+        return [(seq, uuid.UUID(doc_id), signature) for seq, doc_id, signature in rows]
+
+    def retrieve_chunk_hashes(self, doc_id):
+        with self._lock:
+            row = self.connection.execute("""
+                SELECT m.chunk_hashes FROM document_minhash m JOIN documents d ON d.doc_key = m.doc_key
+                WHERE d.doc_id = ?
+            """, (_uuid_text(doc_id),)).fetchone()
+        return json.loads(row[0]) if row else []
+
+    def retrieve_doc_id(self, sha1):
+        with self._lock:
+            row = self.connection.execute("SELECT doc_id FROM documents WHERE file_sha1 = ?", (sha1,)).fetchone()
+        if row is None:
+            logger.info(f"No document found for SHA-1 hash {sha1}")
+            return None
+        return uuid.UUID(row[0])
+
+    def retrieve_chunks(self, doc_id):
+        with self._lock:
+            row = self.connection.execute("""
+                SELECT file_path, chunk_size, chunk_overlap FROM documents WHERE doc_id = ?
+            """, (_uuid_text(doc_id),)).fetchone()
+        if row is None:
+            raise ValueError(f"Document with doc_id {doc_id} not found")
+        return {'file_path': row[0], 'chunk_size': row[1], 'chunk_overlap': row[2]}
+
+    def retrieve_content(self, doc_id, offset: int = 0, length: Optional[int] = None):
+        # SQLite reads a negative length as characters before the start, so None means the rest
+        with self._lock:
+            row = self.connection.execute("""
+                SELECT substr(c.content, ?, coalesce(?, length(c.content))) FROM document_contents c
+                JOIN documents d ON d.doc_key = c.doc_key WHERE d.doc_id = ?
+            """, (offset + 1, length, _uuid_text(doc_id))).fetchone()
+        if row is None:
+            logger.info(f"No content found for doc_id {doc_id}")
+            return None
+        return row[0]
+
+    def iter_content(self, doc_id, block_size: int = 1 << 20):
+        with self._lock:
+            row = self.connection.execute("""
+                SELECT content_length FROM documents WHERE doc_id = ?
+            """, (_uuid_text(doc_id),)).fetchone()
+        total = row[0] if row and row[0] else 0
+        for offset in range(0, total, block_size):
+            block = self.retrieve_content(doc_id, offset, block_size)
+            if not block:
+                break
+            yield block
+
+    def retrieve_chunk_texts(self, chunks):
+        wanted = {}
+        for doc_id, index in chunks:
+            wanted.setdefault(_uuid_text(doc_id), set()).add(int(index))
+        texts = {}
+        with self._lock:
+            for doc_id, indexes in wanted.items():
+                indexes = sorted(indexes)
+                for start in range(0, len(indexes), 900):
+                    batch = indexes[start:start + 900]
+                    for index, text in self.connection.execute(f"""
+                        SELECT v.vector_index, v.chunk_text FROM vectors v
+                        JOIN documents d ON d.doc_key = v.doc_key
+                        WHERE d.doc_id = ? AND v.vector_index IN ({', '.join(['?'] * len(batch))})
+                          AND v.chunk_text IS NOT NULL
+                    """, [doc_id] + batch):
+                        texts[(uuid.UUID(doc_id), index)] = text
+        return texts
+
+    def _load_segments(self, conn) -> List[Segment]:
+        """
+        The segments committed in the snapshot of ``conn``'s open transaction, mapped.
+
+        Files are mapped within the snapshot, and compacted files outlive every
+        snapshot that lists them, so a listed segment can always be mapped. A
+        segment is only mapped and its rows looked up again when its version
+        changed since the last call; lengths of rows already seen are reused.
+        """
+        current = conn.execute("SELECT segment, rows, version FROM segments WHERE rows > 0").fetchall()
+        for segment, rows, version in current:
+            previous = self._segments.get(segment)
+            if previous is not None and previous.version == version:
+                continue
+            vector_ids = np.full(rows, None, dtype=object)
+            for row, vector_id in conn.execute("SELECT row, vector_id FROM vectors WHERE segment = ?", (segment,)):
+                vector_ids[row] = vector_id
+            matrix = np.memmap(self._segment_path(segment), dtype=np.float32, mode='r',
+                               shape=(rows, self.dimension))
+            known = min(len(previous.norms), rows) if previous is not None else 0
+            norms = np.empty(rows, dtype=np.float32)
+            norms[:known] = previous.norms[:known] if known else 0
+            norms[known:] = np.linalg.norm(matrix[known:], axis=1)
+            self._segments[segment] = Segment(segment, version, matrix, norms, vector_ids)
+        present = {segment for segment, _, _ in current}
+        for segment in list(self._segments):
+            if segment not in present:
+                del self._segments[segment]
+        return list(self._segments.values())
+
+    def similarity_search(self, query_embedding, match_threshold=0.8, match_count=5, ef_search=None, probes=None,
+                          snippet_length: int = 500):
+        """
+        Find the chunks most similar to a query by scanning every segment in process.
+
+        Matches ``match_documents``: the ``match_count`` nearest chunks are taken and
+        those under the threshold dropped. ``ef_search`` and ``probes`` only apply
+        to Postgres indexes and are ignored.
+
+        Returns:
+            list: One tuple per matching chunk: doc_id, vector_index, a snippet of
+            the chunk's text, and similarity, most similar first.
+        """
+        query = np.asarray(query_embedding, dtype=np.float32)
+        query_norm = float(np.linalg.norm(query))
+        with self._transaction(immediate=False) as conn:
+            segments = self._load_segments(conn)
+        candidates = []
+        for segment in segments:
+            if not segment.live.any():
+                continue
+            scores = segment.matrix @ query
+            scores /= np.maximum(segment.norms * query_norm, 1e-12)
+            scores[~segment.live] = -np.inf
+            count = min(match_count, len(scores))
+            for row in np.argpartition(-scores, count - 1)[:count]:
+                if np.isfinite(scores[row]):
+                    candidates.append((float(scores[row]), segment.vector_ids[row]))
+        candidates = sorted(candidates, reverse=True)[:match_count]
+        matches = []
+        with self._lock:
+            for score, vector_id in candidates:
+                if score <= match_threshold:
+                    continue
+                # Looked up by id, which compaction keeps while moving the row
+                found = self.connection.execute("""
+                    SELECT d.doc_id, v.vector_index, substr(v.chunk_text, 1, ?) FROM vectors v
+                    JOIN documents d ON d.doc_key = v.doc_key WHERE v.vector_id = ?
+                """, (snippet_length, vector_id)).fetchone()
+                # Deleted since the segments were loaded
+                if found:
+                    matches.append((uuid.UUID(found[0]), found[1], found[2], score))
+        return matches
+
+    def retrieve_embeddings(self, doc_id, fetch_rows: int = None, with_indexes: bool = False):
+        """
+        Retrieves all embeddings associated with a specific document, in chunk order.
+
+        Returns:
+            np.ndarray: A ``(vectors, dimension)`` float32 matrix; with ``with_indexes``,
+            a tuple of the chunk indexes and the matrix.
+        """
+        with self._transaction(immediate=False) as conn:
+            # Placements and segments come from one snapshot, so a compaction cannot come between them
+            rows = conn.execute("""
+                SELECT v.vector_index, v.segment, v.row FROM vectors v
+                JOIN documents d ON d.doc_key = v.doc_key
+                WHERE d.doc_id = ? ORDER BY v.vector_index
+            """, (_uuid_text(doc_id),)).fetchall()
+            segments = {segment.segment: segment for segment in self._load_segments(conn)}
+        indexes = np.array([index for index, _, _ in rows], dtype=np.int64)
+        matrix = np.empty((len(rows), self.dimension), dtype=np.float32)
+        for position, (_, segment, row) in enumerate(rows):
+            matrix[position] = segments[segment].matrix[row]
+        if with_indexes:
+            return indexes, matrix
+        return matrix
+
+    def compact(self, dead_fraction: float = COMPACT_DEAD_FRACTION) -> int:
+        """
+        Rewrite the live rows of sealed segments that are mostly dead into the active one.
+
+        Each segment is moved in one transaction that also retires its file; files
+        retired more than ``RETIRE_GRACE_SECONDS`` ago are removed.
+
+        Returns:
+            int: The number of segments compacted.
+        """
+        self._remove_retired()
+        with self._lock:
+            sealed = self.connection.execute("""
+                SELECT s.segment, s.rows, count(v.vector_id) FROM segments s
+                LEFT JOIN vectors v ON v.segment = s.segment
+                WHERE s.sealed = 1 GROUP BY s.segment
+            """).fetchall()
+        compacted = 0
+        for segment, rows, live in sealed:
+            if rows and live / rows > 1 - dead_fraction:
+                continue
+            with self._transaction() as conn:
+                # Another process sharing the directory may have compacted it since the listing
+                current = conn.execute("SELECT rows FROM segments WHERE segment = ? AND sealed = 1",
+                                       (segment,)).fetchone()
+                if current is None:
+                    continue
+                rows, = current
+                moved = conn.execute("SELECT vector_id, row FROM vectors WHERE segment = ? ORDER BY row",
+                                     (segment,)).fetchall()
+                if moved:
+                    source = np.memmap(self._segment_path(segment), dtype=np.float32, mode='r',
+                                       shape=(rows, self.dimension))
+                    placements = self._append(conn, np.array(source[[row for _, row in moved]]))
+                    del source
+                    conn.executemany("UPDATE vectors SET segment = ?, row = ? WHERE vector_id = ?",
+                                     [(new_segment, new_row, vector_id)
+                                      for (vector_id, _), (new_segment, new_row) in zip(moved, placements)])
+                conn.execute("DELETE FROM segments WHERE segment = ?", (segment,))
+                conn.execute("INSERT INTO retired_segments (segment, retired_at) VALUES (?, ?)",
+                             (segment, time.time()))
+            logger.info(f"Compacted segment {segment}: moved {len(moved)} of {rows} rows")
+            compacted += 1
+        return compacted
+
+    def _remove_retired(self, grace: float = RETIRE_GRACE_SECONDS):
+        """Remove the files of segments compacted more than ``grace`` seconds ago."""
+        with self._lock:
+            retired = self.connection.execute("SELECT segment FROM retired_segments WHERE retired_at < ?",
+                                              (time.time() - grace,)).fetchall()
+            for segment, in retired:
+                try:
+                    os.remove(self._segment_path(segment))
+                except FileNotFoundError:
+                    pass
+                except OSError as e:
+                    logger.warning(f"Could not remove compacted segment {segment}: {e}")
+                    continue
+                self.connection.execute("DELETE FROM retired_segments WHERE segment = ?", (segment,))
+
+    def _compact_periodically(self, interval: float):
+        while not self._stopped.wait(interval):
+            try:
+                self.compact()
+            except Exception as e:
+                logger.error(f"Segment compaction failed: {e}")
+
+    def close_connection(self):
+        """Kept for callers of ``PGDocStore``; the local store has no per-thread connection."""
+
+    def close_all(self):
+        """Stop the compactor and close the metadata database."""
+        self._stopped.set()
+        if self._compactor is not None:
+            self._compactor.join()
+        with self._lock:
+            self.connection.close()
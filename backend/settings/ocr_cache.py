@@ -0,0 +1,64 @@
+import os
+import threading
+from typing import Dict, List, Optional
+from .settings import Setting
+from .disk_cache import DiskCache
+from logger import setup_logger
+
+logger = setup_logger(__name__)
+
+class OCRCache:
+    """
+    Persistent cache of OCR output for individual PDF pages.
+
+    Entries are keyed by the file's SHA-1 together with everything that changes
+    tesseract's output: page index, rendering resolution, pixel budget and
+    tesseract configuration.
+    """
+
+    def __init__(self, path: str, max_bytes: int):
+        self.cache = DiskCache(path, max_bytes)
+
+    @staticmethod
+    def key(file_sha1: str, page_index: int, dpi: int, max_pixels: Optional[int], config: str) -> str:
+        return f"{file_sha1}:{page_index}:{dpi}:{max_pixels or 0}:{config}"
+
+    def get_pages(self, file_sha1: str, page_indexes: List[int], dpi: int,
+                  max_pixels: Optional[int], config: str) -> Dict[int, str]:
+        """
+        Look up cached OCR text for several pages of one file.
+
+        Returns:
+            dict: Cached text keyed by page index, for the pages that were found.
+        """
+        keys = {self.key(file_sha1, index, dpi, max_pixels, config): index for index in page_indexes}
+        found = self.cache.get_many(keys)
+        return {keys[key]: value.decode('utf-8') for key, value in found.items()}
+
+    def put_pages(self, file_sha1: str, texts: Dict[int, str], dpi: int,
+                  max_pixels: Optional[int], config: str) -> None:
+        """Store OCR text for several pages of one file."""
+        self.cache.put_many({self.key(file_sha1, index, dpi, max_pixels, config): text.encode('utf-8')
+                             for index, text in texts.items()})
+
+    def stats(self):
+        return self.cache.stats()
+
+_ocr_cache = None
+_ocr_cache_lock = threading.Lock()
+
+def get_ocr_cache() -> Optional[OCRCache]:
+    """
+    Return the shared OCR cache, opening it on first use.
+
+    Returns:
+        OCRCache: The cache, or None if it is disabled by ``OCR_CACHE_MAX_MB=0``.
+    """
+    global _ocr_cache
+    with _ocr_cache_lock:
+        if _ocr_cache is None:
+            setting = Setting()
+            if setting.ocr_cache_size <= 0:
+                return None
+            _ocr_cache = OCRCache(os.path.join(setting.cache_dir, 'ocr.sqlite3'), setting.ocr_cache_size)
+        return _ocr_cache
@@ -0,0 +1,64 @@
+"""
+PostgreSQL binary encodings of the ``vectors`` table's rows, built with numpy.
+
+Kept apart from ``storage`` so they can be used, and tested, without a database.
+"""
+import io
+import uuid
+import numpy as np
+from .file_utils import clean_text
+
+_COPY_HEADER = b'PGCOPY\n\xff\r\n\x00' + (0).to_bytes(4, 'big') + (0).to_bytes(4, 'big')
+_COPY_TRAILER = (-1).to_bytes(2, 'big', signed=True)
+
+def vectors_copy_buffer(doc_id: uuid.UUID, vector_ids, indexes, embeddings, texts=None) -> io.BytesIO:
+    """
+    Encode vector rows in PostgreSQL's binary COPY format.
+
+    The fixed-size columns of every row share one layout, so they are built as
+    one numpy structured array instead of packing rows one by one. The vector
+    column uses pgvector's binary representation: dimension, a reserved field,
+    then the values as big-endian float4. Chunk texts, when given, vary in length
+    and are appended to each row.
+
+    Args:
+        doc_id (UUID): The document the vectors belong to.
+        vector_ids (List[UUID]): Id of each vector.
+        indexes (List[int]): Chunk index of each vector.
+        embeddings (List[List[float]]): The vectors.
+        texts (List[str]): Text of each vector's chunk, or None to leave ``chunk_text`` out.
+
+    Returns:
+        io.BytesIO: Data for ``COPY vectors (vector_id, doc_id, vector_index, embeddings[, chunk_text]) FROM STDIN BINARY``.
+    """
+    matrix = np.asarray(embeddings, dtype='>f4')
+    rows, dim = matrix.shape
+    layout = np.dtype([
+        ('fields', '>i2'),
+        ('vector_id_size', '>i4'), ('vector_id', 'V16'),
+        ('doc_id_size', '>i4'), ('doc_id', 'V16'),
+        ('index_size', '>i4'), ('index', '>i4'),
+        ('vector_size', '>i4'), ('dim', '>i2'), ('unused', '>i2'), ('values', '>f4', (dim,)),
+    ])
+    records = np.zeros(rows, dtype=layout)
+    records['fields'] = 4 if texts is None else 5
+    records['vector_id_size'] = 16
+    records['vector_id'] = np.frombuffer(b''.join(vector_id.bytes for vector_id in vector_ids), dtype='V16')
+    records['doc_id_size'] = 16
+    records['doc_id'] = np.frombuffer(doc_id.bytes, dtype='V16')
+    records['index_size'] = 4
+    records['index'] = indexes
+    records['vector_size'] = 4 + 4 * dim
+    records['dim'] = dim
+    records['values'] = matrix
+    body = records.tobytes()
+    if texts is not None:
+        size = layout.itemsize
+        encoded = [clean_text(text).encode('utf-8') for text in texts]
+        body = b''.join(body[row * size:(row + 1) * size] + len(text).to_bytes(4, 'big') + text
+                        for row, text in enumerate(encoded))
+    return io.BytesIO(_COPY_HEADER + body + _COPY_TRAILER)
+
+def vector_binary_layout(dim: int) -> np.dtype:
+    """numpy layout of pgvector's binary representation: dimension, a reserved field, big-endian float4 values."""
+    return np.dtype([('dim', '>i2'), ('unused', '>i2'), ('values', '>f4', (dim,))])
@@ -0,0 +1,114 @@
+import time
+import queue
+import threading
+from collections import OrderedDict
+from concurrent.futures import Future
+from typing import Callable, List, Optional
+from .embedding_cache import normalize_text
+from logger import setup_logger
+
+logger = setup_logger(__name__)
+
+class QueryEmbeddingCache:
+    """
+    In-process LRU cache of query embeddings whose entries expire after a time to live.
+
+    Attributes:
+        max_entries (int): Entries kept before the least recently used is dropped.
+        ttl (float): Seconds an entry stays valid.
+        hits (int): Lookups answered from the cache.
+        misses (int): Lookups not found, or found expired.
+    """
+
+    def __init__(self, max_entries: int = 1024, ttl: float = 3600.0):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, text: str) -> Optional[List[float]]:
+        key = normalize_text(text)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or time.monotonic() - entry[1] > self.ttl:
+                if entry is not None:
+                    del self._entries[key]
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+    def put(self, text: str, vector: List[float]) -> None:
+        if self.max_entries <= 0:
+            return
+        key = normalize_text(text)
+        with self._lock:
+            self._entries[key] = (vector, time.monotonic())
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': self.hits / lookups if lookups else 0.0,
+                'entries': len(self._entries),
+            }
+
+class EmbeddingCoalescer:
+    """
+    Gathers queries arriving close together into one ``embed_documents`` call.
+
+    The first query of a batch waits up to ``window`` seconds for others to join,
+    then the whole batch is embedded at once and each caller gets its own vector.
+    Identical queries in flight at the same time share one embedding.
+    """
+
+    def __init__(self, embed_documents: Callable[[List[str]], List], window: float = 0.005, max_batch: int = 64):
+        self.embed_documents = embed_documents
+        self.window = window
+        self.max_batch = max_batch
+        self._queue = queue.Queue()
+        self._pending = {}
+        self._lock = threading.Lock()
+        self._thread = threading.Thread(target=self._run, name='query-coalescer', daemon=True)
+        self._thread.start()
+
+    def embed(self, text: str) -> List[float]:
+        """Embed one query, batched with whatever else arrives within the window."""
+        key = normalize_text(text)
+        with self._lock:
+            future = self._pending.get(key)
+            if future is None:
+                future = self._pending[key] = Future()
+                self._queue.put((key, text))
+        return future.result()
+
+    def _run(self):
+        while True:
+            batch = [self._queue.get()]
+            deadline = time.monotonic() + self.window
+            while len(batch) < self.max_batch:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(self._queue.get(timeout=remaining))
+                except queue.Empty:
+                    break
+            with self._lock:
+                futures = [self._pending.pop(key) for key, _ in batch]
+            try:
+                vectors = self.embed_documents([text for _, text in batch])
+            except Exception as e:
+                for future in futures:
+                    future.set_exception(e)
+                continue
+            for future, vector in zip(futures, vectors):
+                future.set_result(vector)
@@ -4,16 +4,47 @@ import os
 
 logger = setup_logger(__name__)
 
+# EMBEDDING_DIM when unset, by embedding backend; 384 is the size of the default local model's vectors
+DEFAULT_EMBEDDING_DIMS = {'openai': 1536, 'local': 384, 'hashing': 1536}
+
 class Setting:
     """
     This class is responsible for loading and providing access to configuration settings from the environment file.
 
     Attributes:
-        embedding_model (str): The selected embedding model.
+        embedding_model (str): The selected embedding backend: ``openai``, ``local`` or ``hashing``.
+        embedding_dim (int): Length of the embedding vectors; must match the database schema. Defaults
+            to the size produced by the selected backend's default model.
+        embedding_local_model (str): Model directory or name used by the ``local`` backend.
+        embedding_local_threads (int): CPU threads used by the ``local`` backend; 0 for all cores.
         openai_api_key (str): API key for OpenAI services.
         input_dir (str): Directory path for input files.
         output_dir (str): Directory path for output files.
         database_type (str): Type of database being used.
+        pg_pool_size (int): Maximum number of pooled Postgres connections. Each thread using the
+            store holds one, and searches borrow one more, so size it above the number of threads.
+        local_store_dir (str): Directory of the ``local`` document store.
+        vector_index (str): Approximate nearest neighbour index on the vectors: ``hnsw``, ``ivfflat`` or ``none``.
+        vector_index_m (int): Links per node of an HNSW index.
+        vector_index_ef_construction (int): Candidate list size while building an HNSW index.
+        vector_index_lists (int): Lists of an IVFFlat index; 0 picks a size from the row count.
+        vector_ef_search (int): Candidate list size of an HNSW search.
+        vector_probes (int): Lists scanned by an IVFFlat search.
+        cache_dir (str): Directory for on-disk caches.
+        ocr_cache_size (int): Size budget of the OCR result cache in bytes; 0 disables it.
+        embedding_cache_size (int): Size budget of the embedding cache in bytes; 0 disables it.
+        embedding_batch_tokens (int): Token budget of one embedding request.
+        embedding_batch_size (int): Texts in one embedding request.
+        embedding_concurrency (int): Embedding requests in flight at once.
+        embedding_tokens_per_minute (int): Token rate limit of the embedding API.
+        embedding_requests_per_minute (int): Request rate limit of the embedding API.
+        query_cache_size (int): Query embeddings kept in memory; 0 disables the cache.
+        query_cache_ttl (float): Seconds a cached query embedding stays valid.
+        query_coalesce_ms (float): Window for batching concurrent query embeddings; 0 disables it.
+        job_queue (str): Backend of the ingest job queue, ``pg`` or ``sqlite``.
+        job_db_path (str): Location of the SQLite job queue.
+        near_duplicate (str): What to do with near-duplicate documents: ``off``, ``skip``, ``link`` or ``delta``.
+        near_duplicate_threshold (float): Jaccard similarity above which documents are near duplicates.
     """
 
     def __init__(self):
@@ -23,10 +54,38 @@ class Setting:
         try:
             load_dotenv(os.path.join(os.path.dirname(__file__), '../.env'))
             self.embedding_model = os.getenv('EMBEDDING_MODEL')
+            self.embedding_dim = int(os.getenv('EMBEDDING_DIM',
+                                               DEFAULT_EMBEDDING_DIMS.get(self.embedding_model, 1536)))
+            self.embedding_local_model = os.getenv('EMBEDDING_LOCAL_MODEL', 'sentence-transformers/all-MiniLM-L6-v2')
+            self.embedding_local_threads = int(os.getenv('EMBEDDING_LOCAL_THREADS', '0'))
             self.openai_api_key = os.getenv('OPENAI_API_KEY')
             self.input_dir = os.getenv('INPUT_DIR')
             self.output_dir = os.getenv('OUTPUT_DIR')
             self.database_type = os.getenv('DATABASE')
+            self.pg_pool_size = int(os.getenv('PG_POOL_SIZE', '10'))
+            self.local_store_dir = os.getenv('LOCAL_STORE_DIR',
+                                             os.path.join(os.path.expanduser('~'), '.local', 'share', 'cognimesh'))
+            self.vector_index = os.getenv('VECTOR_INDEX', 'hnsw')
+            self.vector_index_m = int(os.getenv('VECTOR_INDEX_M', '16'))
+            self.vector_index_ef_construction = int(os.getenv('VECTOR_INDEX_EF_CONSTRUCTION', '64'))
+            self.vector_index_lists = int(os.getenv('VECTOR_INDEX_LISTS', '0'))
+            self.vector_ef_search = int(os.getenv('VECTOR_EF_SEARCH', '40'))
+            self.vector_probes = int(os.getenv('VECTOR_PROBES', '10'))
+            self.cache_dir = os.getenv('CACHE_DIR', os.path.join(os.path.expanduser('~'), '.cache', 'cognimesh'))
+            self.ocr_cache_size = int(os.getenv('OCR_CACHE_MAX_MB', '512')) * 1024 * 1024
+            self.embedding_cache_size = int(os.getenv('EMBEDDING_CACHE_MAX_MB', '1024')) * 1024 * 1024
+            self.embedding_batch_tokens = int(os.getenv('EMBEDDING_BATCH_TOKENS', '50000'))
+            self.embedding_batch_size = int(os.getenv('EMBEDDING_BATCH_SIZE', '256'))
+            self.embedding_concurrency = int(os.getenv('EMBEDDING_CONCURRENCY', '4'))
+            self.embedding_tokens_per_minute = int(os.getenv('EMBEDDING_TPM', '1000000'))
+            self.embedding_requests_per_minute = int(os.getenv('EMBEDDING_RPM', '3000'))
+            self.query_cache_size = int(os.getenv('QUERY_CACHE_SIZE', '1024'))
+            self.query_cache_ttl = float(os.getenv('QUERY_CACHE_TTL', '3600'))
+            self.query_coalesce_ms = float(os.getenv('QUERY_COALESCE_MS', '0'))
+            self.job_queue = os.getenv('JOB_QUEUE', 'pg' if self.database_type == 'pg' else 'sqlite')
+            self.job_db_path = os.getenv('JOB_DB_PATH', os.path.join(self.cache_dir, 'jobs.sqlite3'))
+            self.near_duplicate = os.getenv('NEAR_DUPLICATE', 'off')
+            self.near_duplicate_threshold = float(os.getenv('NEAR_DUPLICATE_THRESHOLD', '0.8'))
         except Exception as e:
             logging.error(f"Error loading environment variables: {e}")
             raise e
@@ -49,6 +108,8 @@ class Setting:
                 'password': os.getenv('PG_PASS'),
                 'dbname': 'cognimesh'
             }
+        elif self.database_type == 'local':
+            return {'path': self.local_store_dir}
         else:
             # Handle other database types here
             logger.error(f"Unsupported database type: {self.database_type}")
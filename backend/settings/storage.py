@@ -1,25 +1,172 @@
+import time
+import uuid
+import threading
+from contextlib import contextmanager
+from typing import Optional
 from logger import setup_logger
 from .settings import Setting
+from .vector_index import search_settings
+from .file_utils import clean_text
+from .pg_binary import vectors_copy_buffer, vector_binary_layout
+from .local_store import LocalDocStore
+import numpy as np
 import psycopg2
-from psycopg2.extras import register_uuid
+from psycopg2.extras import register_uuid, execute_values
+from psycopg2.pool import ThreadedConnectionPool, PoolError
 
 logger = setup_logger(__name__)
 
-class PGDocStore:    
-    def __init__(self, config):
+# Rows per statement when vectors are written with execute_values
+VALUES_PAGE_SIZE = 1000
+
+# Pooled connections idle longer than this are checked with a round trip before reuse
+HEALTH_CHECK_IDLE_SECONDS = 30.0
+
+# How long a caller waits for a free connection before giving up
+CHECKOUT_TIMEOUT_SECONDS = 30.0
+
+# Vectors fetched per round trip when a document's embeddings are streamed
+EMBEDDING_FETCH_ROWS = 2000
+
+# Characters per block when a document's content is streamed
+CONTENT_BLOCK_SIZE = 1 << 20
+
+class PGDocStore:
+    """
+    Postgres document store backed by a bounded pool of connections.
+
+    Each thread gets its own connection from the pool the first time it uses
+    ``connection``, ``get_cursor``, ``commit`` or ``rollback``, and keeps it until
+    it calls ``release`` or exits, so concurrent ingest and search threads never
+    share a transaction. ``checkout`` borrows a connection for a single block
+    instead. When every connection is in use, callers wait for one to be returned.
+
+    ``similarity_search``, ``retrieve_embeddings`` and ``iter_content`` check out
+    a connection besides the thread's own, so a pool shared by N threads needs
+    more than N connections; threads that outlive their work should ``release``.
+
+    Attributes:
+        config (dict): psycopg2 connection parameters.
+        max_connections (int): Size of the pool.
+        ef_search (int): Default HNSW candidate list size of a similarity search.
+        probes (int): Default number of IVFFlat lists scanned by a similarity search.
+    """
+
+    def __init__(self, config, min_connections: int = 1, max_connections: int = 10,
+                 ef_search: int = 40, probes: int = 10):
         self.config = config
-        self.connection = None
+        self.min_connections = min_connections
+        self.max_connections = max_connections
+        self.ef_search = ef_search
+        self.probes = probes
+        self.pool = None
+        self._local = threading.local()
+        # Connections held by threads, so those of threads that exited can be reclaimed
+        self._bound = {}
+        self._slots = threading.BoundedSemaphore(max_connections)
+        self._last_used = {}
+        self._lock = threading.Lock()
         self.connect()
-    
+
     def connect(self):
         register_uuid()
-        self.connection = psycopg2.connect(**self.config)
-    
+        self.pool = ThreadedConnectionPool(self.min_connections, self.max_connections, **self.config)
+
+    def _reclaim(self):
+        """Return the connections of threads that exited without releasing them."""
+        with self._lock:
+            dead = [thread for thread in self._bound if not thread.is_alive()]
+            connections = [self._bound.pop(thread) for thread in dead]
+        for connection in connections:
+            self._return(connection)
+
+    def _healthy(self, connection) -> bool:
+        if connection.closed:
+            return False
+        if time.monotonic() - self._last_used.get(id(connection), 0.0) < HEALTH_CHECK_IDLE_SECONDS:
+            return True
+        # Idle long enough for the server or a proxy to have dropped it
+        try:
+            with connection.cursor() as cur:
+                cur.execute("SELECT 1")
+            connection.rollback()
+            return True
+        except psycopg2.Error:
+            return False
+
+    def _borrow(self):
+        if not self._slots.acquire(timeout=0):
+            self._reclaim()
+            if not self._slots.acquire(timeout=CHECKOUT_TIMEOUT_SECONDS):
+                raise PoolError(f"No database connection free after {CHECKOUT_TIMEOUT_SECONDS}s")
+        try:
+            connection = self.pool.getconn()
+            if not self._healthy(connection):
+                logger.warning("Replacing a broken database connection")
+                self.pool.putconn(connection, close=True)
+                connection = self.pool.getconn()
+            return connection
+        except Exception:
+            self._slots.release()
+            raise
+
+    def _return(self, connection):
+        try:
+            if not connection.closed:
+                # Never hand the next borrower an open transaction
+                connection.rollback()
+            self._last_used[id(connection)] = time.monotonic()
+            self.pool.putconn(connection, close=bool(connection.closed))
+        finally:
+            self._slots.release()
+
+    @contextmanager
+    def checkout(self):
+        """
+        Borrow a connection from the pool for the duration of a ``with`` block.
+
+        The transaction is committed when the block completes and rolled back if
+        it raises; the connection then goes back to the pool.
+
+        Yields:
+            connection: A psycopg2 connection.
+        """
+        connection = self._borrow()
+        try:
+            yield connection
+            connection.commit()
+        except Exception:
+            connection.rollback()
+            raise
+        finally:
+            self._return(connection)
+
+    @property
+    def connection(self):
+        """The calling thread's connection, borrowed from the pool on first use."""
+        connection = getattr(self._local, 'connection', None)
+        if connection is None or connection.closed:
+            if connection is not None:
+                self.release()
+            connection = self._borrow()
+            self._local.connection = connection
+            with self._lock:
+                self._bound[threading.current_thread()] = connection
+        return connection
+
+    def release(self):
+        """Return the calling thread's connection to the pool."""
+        connection = getattr(self._local, 'connection', None)
+        if connection is None:
+            return
+        self._local.connection = None
+        with self._lock:
+            self._bound.pop(threading.current_thread(), None)
+        self._return(connection)
+
     def get_cursor(self):
-        # Ensure the connection is alive
-        self.ensure_connection()
         return self.connection.cursor()
-    
+
     def commit(self):
         self.connection.commit()
 
@@ -27,34 +174,280 @@ class PGDocStore:
         self.connection.rollback()
 
     def ensure_connection(self):
-        if self.connection.closed:
-            # Re-establish the connection if it's closed
-            self.connection = psycopg2.connect(**self.config)
+        # Kept for callers of the single-connection store; borrowing checks health
+        return self.connection
 
     def close_connection(self):
-        self.connection.close()
+        """Return the calling thread's connection to the pool; the pool stays open."""
+        self.release()
+
+    def close_all(self):
+        """Close every connection in the pool."""
+        self.pool.closeall()
+
+    def write_vectors(self, cur, doc_id, vector_ids, embeddings, indexes=None, texts=None, method='copy'):
+        """
+        Write all of a document's vectors with the given cursor, without committing.
+
+        Args:
+            cur: Cursor of the transaction to write in.
+            doc_id (UUID): The document the vectors belong to.
+            vector_ids (List[UUID]): Id of each vector.
+            embeddings (List[List[float]]): The vectors.
+            indexes (List[int]): Chunk index of each vector. Defaults to 0, 1, 2...
+            texts (List[str]): Text of each vector's chunk, stored so chunks can be
+                read back without parsing the source file again.
+            method (str): ``copy`` for binary COPY, ``values`` for multi-row INSERTs
+                through ``execute_values``.
+        """
+        if not vector_ids:
+            return
+        indexes = list(range(len(vector_ids))) if indexes is None else list(indexes)
+        if method == 'copy':
+            columns = 'vector_id, doc_id, vector_index, embeddings' + (', chunk_text' if texts is not None else '')
+            cur.copy_expert(f"COPY vectors ({columns}) FROM STDIN BINARY",
+                            vectors_copy_buffer(doc_id, vector_ids, indexes, embeddings, texts))
+        elif method == 'values':
+            texts = [None] * len(vector_ids) if texts is None else [clean_text(text) for text in texts]
+            execute_values(cur, """
+                INSERT INTO vectors (vector_id, doc_id, vector_index, embeddings, chunk_text) VALUES %s
+            """, [(vector_id, doc_id, index, str(list(map(float, embedding))), text)
+                  for vector_id, index, embedding, text in zip(vector_ids, indexes, embeddings, texts)],
+                template="(%s, %s, %s, %s::vector, %s)", page_size=VALUES_PAGE_SIZE)
+        else:
+            raise ValueError(f"Unsupported vector write method: {method}")
+
+    def store_document(self, document: dict, embeddings, indexes=None, texts=None, method='copy'):
+        """
+        Insert a document row, its content and all of its vectors in a single transaction.
+
+        The document either appears complete, with its content and vector ids, or
+        not at all, so an interrupted ingest leaves nothing behind.
 
-    def similarity_search(self, query_embedding, match_threshold=0.8, match_count=5):
+        Args:
+            document (dict): Column values of the ``documents`` row; a ``content``
+                entry is stored in ``document_contents`` instead.
+            embeddings (List[List[float]]): The document's vectors.
+            indexes (List[int]): Chunk index of each vector. Defaults to 0, 1, 2...
+            texts (List[str]): Text of each vector's chunk.
+            method (str): How vectors are written; see ``write_vectors``.
+
+        Returns:
+            UUID: The new document's doc_id.
+
+        Raises:
+            psycopg2.DatabaseError: If any write fails; nothing is stored.
+        """
+        doc_id = uuid.uuid4()
+        # Vector ids are generated here, so the document row is written once, complete
+        vector_ids = [uuid.uuid4() for _ in embeddings]
+        document = dict(document)
+        content = document.pop('content', None)
+        columns = ['doc_id', 'vectors_ids'] + list(document)
+        cur = self.get_cursor()
+        try:
+            cur.execute(f"""
+                INSERT INTO documents ({', '.join(columns)})
+                VALUES ({', '.join(['%s'] * len(columns))})
+            """, [doc_id, vector_ids] + list(document.values()))
+            if content is not None:
+                self.write_content(cur, doc_id, content)
+            self.write_vectors(cur, doc_id, vector_ids, embeddings, indexes, texts, method)
+            self.commit()
+            return doc_id
+        except Exception as e:
+            self.rollback()
+            logger.error(f"Failed to store document {document.get('file_name')}: {e}")
+            raise e
+        finally:
+            cur.close()
+
+    def _write(self, write, description: str):
+        """Run ``write(cur)`` in its own transaction, rolling back and logging on failure."""
+        cur = self.get_cursor()
+        try:
+            result = write(cur)
+            self.commit()
+            return result
+        except Exception as e:
+            self.rollback()
+            logger.error(f"Failed to {description}: {e}")
+            raise e
+        finally:
+            cur.close()
+
+    def add_document(self, document: dict):
+        """
+        Insert a document row without vectors or content.
+
+        Returns:
+            UUID: The new document's doc_id.
+        """
+        columns = list(document)
+        def write(cur):
+            cur.execute(f"""
+                INSERT INTO documents ({', '.join(columns)})
+                VALUES ({', '.join(['%s'] * len(columns))}) RETURNING doc_id
+            """, list(document.values()))
+            return cur.fetchone()[0]
+        return self._write(write, f"add document {document.get('file_name')}")
+
+    def add_vectors(self, doc_id, embeddings, indexes=None, texts=None):
+        """
+        Store vectors of an existing document in one transaction.
+
+        Returns:
+            List[UUID]: The new vector ids.
+        """
+        vector_ids = [uuid.uuid4() for _ in embeddings]
+        self._write(lambda cur: self.write_vectors(cur, doc_id, vector_ids, embeddings, indexes, texts),
+                    f"add vectors for doc_id {doc_id}")
+        return vector_ids
+
+    def update_document_vectors(self, doc_id, vector_ids):
+        self._write(lambda cur: cur.execute("UPDATE documents SET vectors_ids = %s WHERE doc_id = %s",
+                                            (vector_ids, doc_id)),
+                    f"update vector ids of doc_id {doc_id}")
+
+    def update_content(self, doc_id, content: str):
+        self._write(lambda cur: self.write_content(cur, doc_id, content), f"store content for doc_id {doc_id}")
+
+    def delete_document(self, doc_id):
+        """Delete a document, its content and its vectors in one transaction."""
+        def write(cur):
+            cur.execute("DELETE FROM vectors WHERE doc_id = %s", (doc_id,))
+            cur.execute("DELETE FROM documents WHERE doc_id = %s", (doc_id,))
+        self._write(write, f"delete doc_id {doc_id}")
+
+    def is_document_complete(self, doc_id) -> bool:
+        """Whether the document's content, written last by an ingest, has been stored."""
+        cur = self.get_cursor()
+        try:
+            cur.execute("SELECT content_length IS NOT NULL FROM documents WHERE doc_id = %s", (doc_id,))
+            row = cur.fetchone()
+            return bool(row and row[0])
+        finally:
+            cur.close()
+
+    def find_duplicates(self, sha1s, batch_size: int = 1000):
+        """
+        Resolve SHA-1 hashes to completely stored documents, ``batch_size`` per query.
+
+        Returns:
+            dict: The doc_id of every hash that is already stored, keyed by hash.
+        """
+        found = {}
+        cur = self.get_cursor()
+        try:
+            for start in range(0, len(sha1s), batch_size):
+                cur.execute("""
+                    SELECT file_sha1, doc_id FROM documents
+                    WHERE file_sha1 = ANY(%s) AND content_length IS NOT NULL
+                """, (sha1s[start:start + batch_size],))
+                found.update(cur.fetchall())
+            return found
+        except Exception as e:
+            self.rollback()
+            raise e
+        finally:
+            cur.close()
+
+    def add_minhash(self, doc_id, signature: bytes, chunk_hashes):
+        """Store a document's MinHash signature and chunk hashes."""
+        self._write(lambda cur: cur.execute("""
+            INSERT INTO document_minhash (doc_id, signature, chunk_hashes) VALUES (%s, %s, %s)
+            ON CONFLICT (doc_id) DO NOTHING
+        """, (doc_id, signature, chunk_hashes)), f"store MinHash signature for doc_id {doc_id}")
+
+    def retrieve_minhashes(self, after_seq: int = 0):
+        """
+        Retrieve MinHash signatures stored after a given sequence number.
+
+        Returns:
+            list: Tuples of sequence number, doc_id and signature bytes.
+        """
+        cur = self.get_cursor()
+        try:
+            cur.execute("""
+                SELECT seq, doc_id, signature FROM document_minhash WHERE seq > %s ORDER BY seq
+            """, (after_seq,))
+            return cur.fetchall()
+        finally:
+            cur.close()
+
+    def retrieve_chunk_hashes(self, doc_id):
+        cur = self.get_cursor()
+        try:
+            cur.execute("SELECT chunk_hashes FROM document_minhash WHERE doc_id = %s", (doc_id,))
+            row = cur.fetchone()
+            return (row[0] or []) if row else []
+        finally:
+            cur.close()
+
+    def retrieve_chunk_texts(self, chunks):
+        """
+        Look up the stored text of many chunks, across documents, in one query.
+
+        Args:
+            chunks (Iterable[tuple]): ``(doc_id, vector_index)`` pairs.
+
+        Returns:
+            dict: Chunk text keyed by ``(doc_id, vector_index)``. Chunks stored
+            before chunk text was kept, or not stored at all, are missing.
+        """
+        chunks = list(dict.fromkeys((doc_id, int(index)) for doc_id, index in chunks))
+        if not chunks:
+            return {}
+        cur = self.get_cursor()
+        try:
+            cur.execute("""
+                SELECT v.doc_id, v.vector_index, v.chunk_text
+                FROM vectors v
+                JOIN unnest(%s::uuid[], %s::int[]) AS wanted (doc_id, vector_index)
+                  ON v.doc_id = wanted.doc_id AND v.vector_index = wanted.vector_index
+                WHERE v.chunk_text IS NOT NULL
+            """, ([doc_id for doc_id, _ in chunks], [index for _, index in chunks]))
+            return {(doc_id, index): text for doc_id, index, text in cur.fetchall()}
+        except Exception as e:
+            self.rollback()
+            logger.error(f"Error retrieving chunk texts: {e}")
+            raise e
+        finally:
+            cur.close()
+
+    def similarity_search(self, query_embedding, match_threshold=0.8, match_count=5, ef_search=None, probes=None):
         """
         Perform a similarity search in the database using vector embeddings.
 
+        ``match_documents`` takes the ``match_count`` nearest vectors through the
+        vector index and only then drops those under the threshold, so fewer than
+        ``match_count`` matches may come back.
+
         Args:
             query_embedding (list): The embedding vector of the query document.
             match_threshold (float): The threshold for matching similarity (default is 0.8).
             match_count (int): The number of matches to return (default is 5).
+            ef_search (int): HNSW candidate list size for this query; raised to at
+                least ``match_count``. Defaults to the store's setting.
+            probes (int): IVFFlat lists scanned for this query. Defaults to the store's setting.
 
         Returns:
-            list: A list of tuples containing matched document IDs, content, and similarity scores.
+            list: One tuple per matching chunk: doc_id, vector_index, a snippet of
+            the chunk's text, and similarity, most similar first.
 
         Raises:
             psycopg2.DatabaseError: If a database error occurs.
         """
         try:
-            with self.connection.cursor() as cursor:
-                # Call the match_documents function in the database
-                cursor.callproc('match_documents', [query_embedding, match_threshold, match_count])
-                matches = cursor.fetchall()
-                return matches
+            # Its own transaction, so the search settings below end with it
+            with self.checkout() as connection:
+                with connection.cursor() as cursor:
+                    cursor.execute("SELECT set_config('hnsw.ef_search', %s, true), set_config('ivfflat.probes', %s, true)",
+                                   search_settings(match_count, ef_search or self.ef_search, probes or self.probes))
+                    # Call the match_documents function in the database
+                    cursor.callproc('match_documents', [query_embedding, match_threshold, match_count])
+                    matches = cursor.fetchall()
+                    return matches
         except psycopg2.DatabaseError as e:
             logger.error(f"Database error during similarity search: {e}")
             raise e
@@ -86,30 +479,55 @@ class PGDocStore:
         finally:
             cur.close()
     
-    def retrieve_embeddings(self, doc_id):
+    def retrieve_embeddings(self, doc_id, fetch_rows: int = EMBEDDING_FETCH_ROWS, with_indexes: bool = False):
         """
-        Retrieves all embeddings associated with a specific document.
+        Retrieves all embeddings associated with a specific document, in chunk order.
+
+        Vectors are transferred in pgvector's binary form through ``vector_send``
+        and decoded batch by batch straight into one preallocated float32 matrix,
+        with no text parsing and no Python float per value. A server-side cursor
+        streams them ``fetch_rows`` at a time, so large documents never sit in
+        memory twice.
 
         Args:
             doc_id (UUID): The unique identifier of the document.
+            fetch_rows (int): Vectors fetched per round trip.
+            with_indexes (bool): Also return the chunk index of each row, for
+                documents whose vectors cover only some of their chunks.
 
         Returns:
-            list: A list of embeddings associated with the document.
+            np.ndarray: A ``(vectors, dimension)`` float32 matrix; no rows if the
+            document has no vectors. With ``with_indexes``, a tuple of the chunk
+            indexes and the matrix.
         """
-        cur = self.get_cursor()
-        embeddings = []
-        try:
-            cur.execute("""
-                SELECT embeddings FROM vectors WHERE doc_id = %s
-            """, (doc_id,))
-            rows = cur.fetchall()
-            embeddings = [row[0] for row in rows]
-        except Exception as e:
-            self.rollback()
-            raise e
-        finally:
-            cur.close()
-        return embeddings
+        with self.checkout() as connection:
+            with connection.cursor() as cur:
+                # The count and the rows must come from the same snapshot
+                cur.execute("SET TRANSACTION ISOLATION LEVEL REPEATABLE READ")
+                cur.execute("SELECT count(*) FROM vectors WHERE doc_id = %s", (doc_id,))
+                count = cur.fetchone()[0]
+            indexes = np.empty(count, dtype=np.int64)
+            matrix, filled = np.empty((0, 0), dtype=np.float32), 0
+            with connection.cursor(name=f"embeddings_{uuid.uuid4().hex}") as cur:
+                cur.itersize = fetch_rows
+                cur.execute("""
+                    SELECT vector_index, vector_send(embeddings) FROM vectors WHERE doc_id = %s ORDER BY vector_index
+                """, (doc_id,))
+                while True:
+                    rows = cur.fetchmany(fetch_rows)
+                    if not rows:
+                        break
+                    if not filled:
+                        dim = int.from_bytes(rows[0][1][:2], 'big')
+                        matrix = np.empty((count, dim), dtype=np.float32)
+                        layout = vector_binary_layout(dim)
+                    indexes[filled:filled + len(rows)] = [row[0] for row in rows]
+                    matrix[filled:filled + len(rows)] = np.frombuffer(
+                        b''.join(row[1] for row in rows), dtype=layout)['values']
+                    filled += len(rows)
+        if with_indexes:
+            return indexes[:filled], matrix[:filled]
+        return matrix[:filled]
     
     def retrieve_chunks(self, doc_id):
         """
@@ -139,12 +557,18 @@ class PGDocStore:
         finally:
             cur.close()
 
-    def retrieve_content(self, doc_id):
+    def retrieve_content(self, doc_id, offset: int = 0, length: Optional[int] = None):
         """
-        Retrieves the content of a document given its document ID.
+        Retrieves the content of a document, or a range of it, given its document ID.
+
+        The range is cut by ``substr`` in the database, so only the requested
+        characters are transferred, and for a prefix only the leading part of the
+        stored value is read and decompressed.
 
         Args:
             doc_id (UUID): The unique identifier of the document.
+            offset (int): Characters to skip from the start.
+            length (int): Characters to return; the rest of the content if None.
 
         Returns:
             str: The content of the document, or None if not found.
@@ -154,9 +578,14 @@ class PGDocStore:
         """
         cur = self.get_cursor()
         try:
-            cur.execute("""
-                SELECT content FROM documents WHERE doc_id = %s;
-            """, (doc_id,))
+            if length is None:
+                cur.execute("""
+                    SELECT substr(content, %s) FROM document_contents WHERE doc_id = %s;
+                """, (offset + 1, doc_id))
+            else:
+                cur.execute("""
+                    SELECT substr(content, %s, %s) FROM document_contents WHERE doc_id = %s;
+                """, (offset + 1, length, doc_id))
             result = cur.fetchone()
             if result:
                 return result[0]
@@ -164,11 +593,62 @@ class PGDocStore:
                 logger.info(f"No content found for doc_id {doc_id}")
                 return None
         except Exception as e:
+            self.rollback()
             logger.error(f"Error retrieving content for doc_id {doc_id}: {e}")
             raise e
         finally:
             cur.close()
 
+    def iter_content(self, doc_id, block_size: int = CONTENT_BLOCK_SIZE):
+        """
+        Stream the content of a document in blocks of ``block_size`` characters.
+
+        Each block is its own ``substr`` query on a connection borrowed only for
+        that query, so the whole text never has to be held in memory at once and a
+        consumer that stops early holds nothing. The stored byte length is checked
+        with every block, so content replaced mid-stream by text of another size
+        is reported rather than spliced.
+
+        Args:
+            doc_id (UUID): The unique identifier of the document.
+            block_size (int): Characters per block.
+
+        Yields:
+            str: Successive blocks of the content; nothing if the document has none.
+
+        Raises:
+            RuntimeError: If the content is replaced or deleted while it is streamed.
+        """
+        with self.checkout() as connection:
+            with connection.cursor() as cur:
+                cur.execute("SELECT length(content), octet_length(content) FROM document_contents "
+                            "WHERE doc_id = %s", (doc_id,))
+                row = cur.fetchone()
+        total, size = row if row else (0, 0)
+        for offset in range(0, total, block_size):
+            with self.checkout() as connection:
+                with connection.cursor() as cur:
+                    # octet_length comes from the TOAST header, without reading the value
+                    cur.execute("SELECT substr(content, %s, %s), octet_length(content) FROM document_contents "
+                                "WHERE doc_id = %s", (offset + 1, block_size, doc_id))
+                    row = cur.fetchone()
+            if row is None or row[1] != size:
+                raise RuntimeError(f"Content of doc_id {doc_id} changed while it was streamed")
+            yield row[0]
+
+    def write_content(self, cur, doc_id, content: str):
+        """
+        Store or replace a document's content with the given cursor, without committing.
+
+        ``documents.content_length`` is set with it and marks the document as complete.
+        """
+        content = clean_text(content)
+        cur.execute("""
+            INSERT INTO document_contents (doc_id, content) VALUES (%s, %s)
+            ON CONFLICT (doc_id) DO UPDATE SET content = EXCLUDED.content
+        """, (doc_id, content))
+        cur.execute("UPDATE documents SET content_length = %s WHERE doc_id = %s", (len(content), doc_id))
+
 
 class Store:
     """
@@ -189,7 +669,10 @@ class Store:
             # Retrieve the database configuration based on the type of database
             config = setting.get_database_config()
             if setting.database_type == 'pg':
-                self.db = PGDocStore(config)
+                self.db = PGDocStore(config, max_connections=setting.pg_pool_size,
+                                     ef_search=setting.vector_ef_search, probes=setting.vector_probes)
+            elif setting.database_type == 'local':
+                self.db = LocalDocStore(config['path'], setting.embedding_dim)
             else:
                 raise ValueError("Unsupported database type")
         except Exception as e:
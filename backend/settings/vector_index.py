@@ -0,0 +1,169 @@
+"""
+Approximate nearest neighbour indexes on ``vectors.embeddings``.
+
+Without one, every similarity search is a sequential scan over every chunk.
+Indexes are built with ``CREATE INDEX CONCURRENTLY``, so ingest and search keep
+running meanwhile, and need pgvector 0.5 or later for HNSW:
+
+    python -m backend.settings.vector_index create --kind hnsw --m 16 --ef-construction 64
+    python -m backend.settings.vector_index status
+"""
+import math
+import argparse
+from typing import List, Optional
+from .settings import Setting
+from logger import setup_logger
+
+logger = setup_logger(__name__)
+
+INDEX_KINDS = ('hnsw', 'ivfflat')
+
+def index_name(kind: str) -> str:
+    return f"vectors_embeddings_{kind}_idx"
+
+def ivfflat_lists(rows: int) -> int:
+    """pgvector's rule of thumb: rows / 1000 up to a million rows, then the square root."""
+    if rows <= 1000000:
+        return max(rows // 1000, 1)
+    return int(math.sqrt(rows))
+
+def index_sql(kind: str, m: int = 16, ef_construction: int = 64, lists: int = 100) -> str:
+    """
+    The statement building an index of the given kind for cosine distance.
+
+    Raises:
+        ValueError: If the kind is not ``hnsw`` or ``ivfflat``.
+    """
+    if kind == 'hnsw':
+        options = f"m = {int(m)}, ef_construction = {int(ef_construction)}"
+    elif kind == 'ivfflat':
+        options = f"lists = {int(lists)}"
+    else:
+        raise ValueError(f"Unsupported vector index: {kind}")
+    return (f"CREATE INDEX CONCURRENTLY IF NOT EXISTS {index_name(kind)} "
+            f"ON vectors USING {kind} (embeddings vector_cosine_ops) WITH ({options})")
+
+def search_settings(match_count: int, ef_search: int, probes: int):
+    """
+    Values of ``hnsw.ef_search`` and ``ivfflat.probes`` for one search.
+
+    An HNSW scan returns at most ``ef_search`` rows, so it is never set below the
+    number of matches wanted.
+    """
+    return str(max(int(ef_search), int(match_count))), str(max(int(probes), 1))
+
+def _autocommit(store, statements: List[str]):
+    # CONCURRENTLY cannot run inside a transaction block
+    with store.checkout() as connection:
+        connection.autocommit = True
+        try:
+            with connection.cursor() as cur:
+                for statement in statements:
+                    cur.execute(statement)
+        finally:
+            connection.autocommit = False
+
+def vector_index_status(store) -> List[dict]:
+    """
+    Describe the vector indexes present on the ``vectors`` table.
+
+    Returns:
+        list: Name, access method, whether the index is valid, and size in bytes of each.
+    """
+    with store.checkout() as connection:
+        with connection.cursor() as cur:
+            cur.execute("""
+                SELECT c.relname, am.amname, i.indisvalid, pg_relation_size(c.oid)
+                FROM pg_index i
+                JOIN pg_class c ON c.oid = i.indexrelid
+                JOIN pg_am am ON am.oid = c.relam
+                WHERE i.indrelid = 'vectors'::regclass AND am.amname IN ('hnsw', 'ivfflat')
+            """)
+            return [{'name': name, 'kind': kind, 'valid': valid, 'size': size}
+                    for name, kind, valid, size in cur.fetchall()]
+
+def drop_vector_index(store, kind: str):
+    """Drop the index of the given kind, without blocking writes."""
+    _autocommit(store, [f"DROP INDEX CONCURRENTLY IF EXISTS {index_name(kind)}"])
+    logger.info(f"Dropped {index_name(kind)}")
+
+def create_vector_index(store,
+                        kind: Optional[str] = None,
+                        m: Optional[int] = None,
+                        ef_construction: Optional[int] = None,
+                        lists: Optional[int] = None,
+                        maintenance_work_mem: Optional[str] = None) -> Optional[str]:
+    """
+    Build the vector index configured by the settings, unless it already exists.
+
+    A concurrent build that failed leaves an invalid index behind, which is
+    dropped and built again. Unspecified parameters come from the ``VECTOR_INDEX*``
+    settings; an IVFFlat index with no configured list count sizes its lists from
+    the current row count, so build it once the table holds representative data.
+
+    Args:
+        store (PGDocStore): The document store.
+        kind (str): ``hnsw``, ``ivfflat`` or ``none``.
+        m (int): Links per node of an HNSW index.
+        ef_construction (int): Candidate list size while building an HNSW index.
+        lists (int): Lists of an IVFFlat index.
+        maintenance_work_mem (str): Memory for the build, such as ``2GB``; building
+            within memory is much faster.
+
+    Returns:
+        str: The name of the index, or None if indexing is turned off.
+    """
+    setting = Setting()
+    kind = kind or setting.vector_index
+    if kind == 'none':
+        logger.info("Vector index disabled; searches scan every vector")
+        return None
+    name = index_name(kind)
+    existing = {index['name']: index for index in vector_index_status(store)}
+    if name in existing and existing[name]['valid']:
+        logger.info(f"{name} already exists")
+        return name
+    if name in existing:
+        logger.warning(f"Dropping {name}, left invalid by an interrupted build")
+        drop_vector_index(store, kind)
+
+    lists = lists or setting.vector_index_lists
+    if kind == 'ivfflat' and not lists:
+        with store.checkout() as connection:
+            with connection.cursor() as cur:
+                cur.execute("SELECT count(*) FROM vectors")
+                lists = ivfflat_lists(cur.fetchone()[0])
+    statement = index_sql(kind,
+                          m=m or setting.vector_index_m,
+                          ef_construction=ef_construction or setting.vector_index_ef_construction,
+                          lists=lists or 1)
+    statements = [statement]
+    if maintenance_work_mem:
+        statements.insert(0, f"SET maintenance_work_mem = '{maintenance_work_mem}'")
+        statements.append("RESET maintenance_work_mem")
+    logger.info(f"Building {name}: {statement}")
+    _autocommit(store, statements)
+    logger.info(f"Built {name}")
+    return name
+
+def main():
+    parser = argparse.ArgumentParser(description='Manage the approximate nearest neighbour index on vectors.')
+    parser.add_argument('action', choices=['create', 'drop', 'status'])
+    parser.add_argument('--kind', choices=INDEX_KINDS + ('none',), default=None, help='Defaults to VECTOR_INDEX')
+    parser.add_argument('--m', type=int, default=None, help='HNSW links per node')
+    parser.add_argument('--ef-construction', type=int, default=None, help='HNSW build candidate list size')
+    parser.add_argument('--lists', type=int, default=None, help='IVFFlat list count; 0 sizes it from the row count')
+    parser.add_argument('--maintenance-work-mem', default=None, help='Memory for the build, such as 2GB')
+    args = parser.parse_args()
+
+    from .storage import store
+    if args.action == 'create':
+        create_vector_index(store, args.kind, args.m, args.ef_construction, args.lists, args.maintenance_work_mem)
+    elif args.action == 'drop':
+        drop_vector_index(store, args.kind or Setting().vector_index)
+    for index in vector_index_status(store):
+        state = 'valid' if index['valid'] else 'INVALID'
+        print(f"{index['name']:<32}{index['kind']:<10}{state:<10}{index['size'] / 2 ** 20:10.1f} MB")
+
+if __name__ == "__main__":
+    main()
@@ -12,6 +12,21 @@ if [ -z "$PG_HOST" ] || [ -z "$PG_USER" ] || [ -z "$PG_PASS" ]; then
     exit 1
 fi
 
+# Vector length of the embedding backend; the default local model produces 384
+if [ -z "$EMBEDDING_DIM" ]; then
+    if [ "$EMBEDDING_MODEL" == "local" ]; then EMBEDDING_DIM=384; else EMBEDDING_DIM=1536; fi
+fi
+
+# How document contents are stored: external keeps them uncompressed, so range
+# reads fetch only the pages they need; pglz or lz4 (PostgreSQL 14+) compress them
+CONTENT_STORAGE=${CONTENT_STORAGE:-external}
+if [ "$CONTENT_STORAGE" == "external" ]; then
+    CONTENT_STORAGE_SQL="ALTER TABLE document_contents ALTER COLUMN content SET STORAGE EXTERNAL;"
+else
+    CONTENT_STORAGE_SQL="ALTER TABLE document_contents ALTER COLUMN content SET STORAGE EXTENDED;
+ALTER TABLE document_contents ALTER COLUMN content SET COMPRESSION $CONTENT_STORAGE;"
+fi
+
 # Connect to PostgreSQL and set up tables
 PGPASSWORD=$PG_PASS psql -h $PG_HOST -U $PG_USER -d cognimesh -a <<EOF
 
@@ -42,38 +57,112 @@ CREATE TABLE IF NOT EXISTS documents (
     date TIMESTAMP DEFAULT CURRENT_TIMESTAMP
 );
 
+-- One document per file content; also serves the batched duplicate check.
+-- Fails on databases that already hold duplicate SHA-1s until they are removed.
+CREATE UNIQUE INDEX IF NOT EXISTS documents_file_sha1_idx ON documents (file_sha1);
+
 -- Create the 'vectors' table
 CREATE TABLE IF NOT EXISTS vectors (
     vector_id UUID PRIMARY KEY DEFAULT gen_random_uuid(), -- Changed to UUID to handle unique vector IDs
     doc_id UUID NOT NULL, 
     vector_index INT NOT NULL,
-    embeddings VECTOR(1536) NOT NULL,
+    embeddings VECTOR(${EMBEDDING_DIM}) NOT NULL, -- Must match the EMBEDDING_DIM of the embedding backend
     created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
     FOREIGN KEY (doc_id) REFERENCES documents(doc_id)
 );
 
--- Create (or replace) the match_documents function
+-- Text of each chunk, so chunks are read back without parsing the source file again.
+-- Empty for chunks ingested before it was added.
+ALTER TABLE vectors ADD COLUMN IF NOT EXISTS chunk_text TEXT;
+
+-- One vector per chunk; serves chunk lookups by document and index
+CREATE UNIQUE INDEX IF NOT EXISTS vectors_doc_id_vector_index_idx ON vectors (doc_id, vector_index);
+
+-- Create the 'document_contents' table, the extracted text of each document, kept
+-- apart so scans of document metadata do not read it
+CREATE TABLE IF NOT EXISTS document_contents (
+    doc_id UUID PRIMARY KEY REFERENCES documents(doc_id) ON DELETE CASCADE,
+    content TEXT NOT NULL
+);
+$CONTENT_STORAGE_SQL
+
+-- Set together with the content; marks a document whose ingest completed
+ALTER TABLE documents ADD COLUMN IF NOT EXISTS content_length BIGINT;
+
+-- Move content stored in documents before document_contents existed
+INSERT INTO document_contents (doc_id, content)
+SELECT doc_id, content FROM documents WHERE content IS NOT NULL
+ON CONFLICT (doc_id) DO NOTHING;
+UPDATE documents SET content_length = length(content), content = NULL WHERE content IS NOT NULL;
+
+-- Near-duplicate documents point at the original whose vectors they reuse
+ALTER TABLE documents ADD COLUMN IF NOT EXISTS duplicate_of UUID REFERENCES documents(doc_id) ON DELETE SET NULL;
+
+-- Create the 'document_minhash' table, the MinHash signature of each original document
+CREATE TABLE IF NOT EXISTS document_minhash (
+    seq BIGSERIAL UNIQUE, -- Lets ingest processes pick up signatures added by others
+    doc_id UUID PRIMARY KEY REFERENCES documents(doc_id) ON DELETE CASCADE,
+    signature BYTEA NOT NULL, -- 128 uint32 MinHash values
+    chunk_hashes BIGINT[] DEFAULT '{}', -- Hash of each chunk's text, for delta ingest
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+
+-- LSH buckets are rebuilt in memory from the signatures; drop the table earlier setups created
+DROP TABLE IF EXISTS document_lsh;
+
+-- Create the 'ingest_jobs' table, the durable queue drained by ingest workers
+CREATE TABLE IF NOT EXISTS ingest_jobs (
+    job_id BIGSERIAL PRIMARY KEY,
+    file_sha1 VARCHAR(40) UNIQUE NOT NULL, -- One job per file content; makes enqueueing idempotent
+    file_path TEXT NOT NULL,
+    state VARCHAR(16) NOT NULL DEFAULT 'queued', -- queued, running, done or dead
+    attempts INT NOT NULL DEFAULT 0,
+    max_attempts INT NOT NULL DEFAULT 5,
+    run_after TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP, -- Not claimed before this time (retry backoff)
+    lease_owner VARCHAR(255), -- Worker currently holding the job
+    lease_expires TIMESTAMP, -- Running jobs whose lease expired are claimed again
+    doc_id UUID,
+    last_error TEXT,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+CREATE INDEX IF NOT EXISTS ingest_jobs_claim_idx ON ingest_jobs (state, run_after);
+
+-- Create (or replace) the match_documents function.
+-- The nearest vectors are taken first, ordered by the bare distance so a vector
+-- index can serve the scan, and the threshold is applied to those candidates
+-- afterwards. Build the index with: python -m backend.settings.vector_index create
+-- One row per matching chunk, with a snippet of its text; document content is
+-- fetched separately, only when needed. The result columns changed, so the old
+-- function has to go first.
+DROP FUNCTION IF EXISTS match_documents(vector, float, int);
 CREATE OR REPLACE FUNCTION match_documents (
-  query_embedding vector(1536),
+  query_embedding vector(${EMBEDDING_DIM}),
   match_threshold float,
-  match_count int
+  match_count int,
+  snippet_length int DEFAULT 500
 )
 RETURNS TABLE (
-  id UUID,
-  content TEXT,
+  doc_id UUID,
+  vector_index INT,
+  snippet TEXT,
   similarity FLOAT
 )
 LANGUAGE SQL STABLE
 AS \$\$
   SELECT
-    d.doc_id,
-    d.content,
-    1 - (v.embeddings <=> query_embedding) AS similarity
-  FROM documents d
-  JOIN vectors v ON d.doc_id = v.doc_id
-  WHERE 1 - (v.embeddings <=> query_embedding) > match_threshold
-  ORDER BY similarity DESC
-  LIMIT match_count;
+    nearest.doc_id,
+    nearest.vector_index,
+    left(nearest.chunk_text, snippet_length),
+    1 - nearest.distance AS similarity
+  FROM (
+    SELECT v.doc_id, v.vector_index, v.chunk_text, v.embeddings <=> query_embedding AS distance
+    FROM vectors v
+    ORDER BY v.embeddings <=> query_embedding
+    LIMIT match_count
+  ) nearest
+  WHERE 1 - nearest.distance > match_threshold
+  ORDER BY nearest.distance;
 \$\$;
 
 EOF
@@ -7,9 +7,6 @@ _ = load_dotenv(find_dotenv()) # read local .env file
 from file_utils import sanitize_filename, open_file, save_file, move_file, delete_file, copy_file, rename_file
 from summarizer import summarize
 from zotero_hook import add_item_by_doi
-import pdfplumber
-from pdf2image import convert_from_path
-import pytesseract
 
 from langchain.document_loaders import PDFPlumberLoader, PyPDFLoader
 from langchain.text_splitter import TokenTextSplitter
@@ -17,6 +14,7 @@ from langchain.text_splitter import TokenTextSplitter
 # Import setup_logger from logger.py
 from logger import setup_logger
 from gpt2brain import OpenAIBrain
+from backend.dendron.pdf_extract import extract_pdf_text, OCR_MIN_CHARS
 
 # Initialize the GPT-3 brain
 brain = OpenAIBrain()
@@ -24,24 +22,15 @@ brain = OpenAIBrain()
 # Initialize the logger
 logger = setup_logger('pdf_loader')
 
-def convert_pdf_to_txt(path, ocr_threshold=0.8):
+def convert_pdf_to_txt(path, ocr_min_chars=OCR_MIN_CHARS, workers=None):
     text = ''
-    text_pages = 0
     try:
         logger.info(f"Converting PDF to text from path: {path}")
-        with pdfplumber.open(path) as pdf:
-            for page in pdf.pages:
-                page_text = page.extract_text()
-                if page_text:  # Not all pages will return text
-                    text += page_text
-                    text_pages += 1
-            # If the count of non-empty page_text is less than the number of pages
-            # convert the PDF to images and perform OCR
-            if text_pages < len(pdf.pages) * ocr_threshold:
-                text = ''
-                images = convert_from_path(path, dpi=300)
-                for img in images:
-                    text += pytesseract.image_to_string(img)
+        # Pages without a usable text layer are rasterized and OCR'd individually,
+        # the rest keep their native text. OCR output is cached per page under the
+        # file's SHA-1, so re-running on an unchanged file skips tesseract.
+        page_texts = extract_pdf_text(path, workers=workers, ocr_min_chars=ocr_min_chars)
+        text = ''.join(page_texts)
     except Exception as e:
         logger.error(f"Error occurred while converting PDF to text: {e}")
     return text
@@ -164,12 +153,13 @@ def save_text_to_file(text_content, sanitized_filename, output_directory):
     except Exception as e:
         logger.error(f"Error saving text to file: {e}")
 
-def load_pdf(file_path, output_directory='output', filename=None, summarize_ratio=0.2):
+def load_pdf(file_path, output_directory='output', filename=None, summarize_ratio=0.2, workers=None):
     """
     Loads a PDF file, extracts the text, finds and handles DOIs, and saves the text to a new file.
 
     Parameters:
     file_path (str): Path to the PDF file.
+    workers (int): Number of processes used for text extraction. Defaults to the CPU count.
 
     Returns:
     None
@@ -184,7 +174,7 @@ def load_pdf(file_path, output_directory='output', filename=None, summarize_rati
             return
 
         output_directory = ensure_output_directory_exists(output_directory)
-        text_content = convert_pdf_to_txt(file_path)
+        text_content = convert_pdf_to_txt(file_path, workers=workers)
 
         # Try to extract DOI from text content
         doi = extract_doi_from_text(text_content)
@@ -244,11 +234,12 @@ def main():
     parser.add_argument('--output_dir', default='output', help='The directory to save the output files.')
     parser.add_argument('--filename', help='The filename for the output files.')
     parser.add_argument('--ratio', default=0.2, help='The ratio to summarize document tokens')
+    parser.add_argument('--workers', type=int, default=None, help='Number of processes used for text extraction')
     args = parser.parse_args()
 
     try:
         logger.info("Starting PDF file processing")
-        load_pdf(args.file_path, args.output_dir, args.filename, args.ratio)
+        load_pdf(args.file_path, args.output_dir, args.filename, args.ratio, args.workers)
         logger.info("Finished PDF file processing")
     except Exception as e:
         logger.error(f"Error during PDF file processing: {e}")
@@ -0,0 +1,8 @@
+import os
+import sys
+import tempfile
+
+# Modules import ``logger`` from the repository root, which writes its files to LOG_DIR
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+os.environ.setdefault('LOG_DIR', tempfile.mkdtemp(prefix='cognimesh-test-logs-'))
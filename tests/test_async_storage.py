@@ -0,0 +1,70 @@
+import asyncio
+from contextlib import asynccontextmanager
+import pytest
+
+pytest.importorskip('asyncpg')
+pytest.importorskip('pgvector')
+
+from backend.settings import async_storage
+from backend.settings.async_storage import AsyncPGDocStore
+
+class FakePool:
+    """Stands in for asyncpg.Pool, which is awaitable but not a coroutine."""
+
+    def __init__(self, **kwargs):
+        self.kwargs = kwargs
+        self.closed = False
+        self.terminated = False
+
+    def __await__(self):
+        yield from asyncio.sleep(0).__await__()
+        return self
+
+    @asynccontextmanager
+    async def acquire(self):
+        yield 'connection'
+
+    async def close(self):
+        self.closed = True
+
+    def terminate(self):
+        self.terminated = True
+
+@pytest.fixture
+def pools(monkeypatch):
+    created = []
+
+    def create_pool(**kwargs):
+        created.append(FakePool(**kwargs))
+        return created[-1]
+
+    monkeypatch.setattr(async_storage.asyncpg, 'create_pool', create_pool)
+    return created
+
+def make_store():
+    return AsyncPGDocStore({'dbname': 'db', 'user': 'u', 'password': 'p', 'host': 'h', 'port': '5432'},
+                           max_connections=3)
+
+def test_connect_acquire_and_close(pools):
+    store = make_store()
+
+    async def run():
+        first, second = await asyncio.gather(store.connect(), store.connect())
+        async with store.acquire() as connection:
+            assert connection == 'connection'
+        await store.close()
+        return first, second
+
+    first, second = asyncio.run(run())
+    # Concurrent callers share one pool
+    assert first is second is pools[0] and len(pools) == 1
+    assert pools[0].kwargs['database'] == 'db' and pools[0].kwargs['port'] == 5432
+    assert pools[0].kwargs['max_size'] == 3
+    assert pools[0].closed
+
+def test_new_event_loop_gets_a_new_pool(pools):
+    store = make_store()
+    asyncio.run(store.connect())
+    asyncio.run(store.connect())
+    assert len(pools) == 2
+    assert pools[0].terminated and not pools[1].terminated
@@ -0,0 +1,15 @@
+from backend.dendron.bulk import _thread_workers
+
+def test_thread_workers_leave_a_pool_connection_free(monkeypatch):
+    monkeypatch.setenv('DATABASE', 'pg')
+    monkeypatch.setenv('PG_POOL_SIZE', '10')
+    assert _thread_workers(4) == 4
+    assert _thread_workers(10) == 9
+    assert _thread_workers(32) == 9
+    monkeypatch.setenv('PG_POOL_SIZE', '1')
+    assert _thread_workers(4) == 1
+
+def test_thread_workers_are_not_capped_without_a_pool(monkeypatch):
+    monkeypatch.setenv('DATABASE', 'local')
+    monkeypatch.setenv('PG_POOL_SIZE', '2')
+    assert _thread_workers(32) == 32
@@ -0,0 +1,30 @@
+import time
+from backend.settings.disk_cache import DiskCache
+
+def test_get_and_put(tmp_path):
+    cache = DiskCache(str(tmp_path / 'cache.sqlite3'), 1000)
+    cache.put_many({'a': b'1', 'b': b'22'})
+    assert cache.get_many(['a', 'b', 'c']) == {'a': b'1', 'b': b'22'}
+    assert cache.get('c') is None
+    stats = cache.stats()
+    assert (stats['hits'], stats['misses'], stats['entries'], stats['bytes']) == (2, 2, 2, 3)
+
+def test_evicts_least_recently_used(tmp_path):
+    cache = DiskCache(str(tmp_path / 'cache.sqlite3'), 100)
+    for key in 'abc':
+        cache.put(key, b'x' * 30)
+        time.sleep(0.01)
+    # Reading 'a' makes 'b' the least recently used
+    assert cache.get('a') == b'x' * 30
+    cache.put('d', b'x' * 30)
+    assert set(cache.get_many('abcd')) == {'a', 'c', 'd'}
+    assert cache.stats()['bytes'] <= 100
+
+def test_touches_every_hit_of_a_large_lookup(tmp_path):
+    cache = DiskCache(str(tmp_path / 'cache.sqlite3'), 10 ** 6)
+    keys = [f"key{i}" for i in range(1200)]
+    cache.put_many({key: b'v' for key in keys})
+    before = time.time()
+    assert len(cache.get_many(keys)) == 1200
+    oldest = cache._connection.execute("SELECT MIN(accessed) FROM cache").fetchone()[0]
+    assert oldest >= before
@@ -0,0 +1,80 @@
+import time
+from types import SimpleNamespace
+import pytest
+
+pytest.importorskip('tiktoken')
+
+from backend.settings import embedding_scheduler
+from backend.settings.embedding_scheduler import EmbeddingScheduler, TokenBucket, is_rate_limit_error
+
+class CharacterEncoding:
+    """One token per character, so tests need no tiktoken download."""
+
+    def encode_ordinary_batch(self, texts):
+        return [list(text) for text in texts]
+
+class RateLimited(Exception):
+    http_status = 429
+
+@pytest.fixture
+def make_scheduler(monkeypatch):
+    monkeypatch.setattr(embedding_scheduler.tiktoken, 'get_encoding', lambda name: CharacterEncoding())
+    def make(embed_batch, **options):
+        options = dict(dict(max_batch_tokens=10, max_batch_size=3, concurrency=2,
+                            tokens_per_minute=10 ** 9, requests_per_minute=10 ** 9), **options)
+        return EmbeddingScheduler(embed_batch, **options)
+    return make
+
+def test_batches_respect_token_and_size_budgets(make_scheduler):
+    scheduler = make_scheduler(None)
+    texts = ['aaaa', 'bbbb', 'cc', 'd', 'eeeeeeeeeeee', 'f', 'g', 'h', 'i']
+    assert list(scheduler.batches(texts)) == [
+        (['aaaa', 'bbbb', 'cc'], 10),
+        (['d'], 1),
+        # A text over the budget goes out alone rather than being dropped
+        (['eeeeeeeeeeee'], 12),
+        (['f', 'g', 'h'], 3),
+        (['i'], 1),
+    ]
+
+def test_embed_returns_vectors_in_input_order(make_scheduler):
+    scheduler = make_scheduler(lambda batch: [[len(text)] for text in batch])
+    texts = ['a' * n for n in range(1, 12)]
+    assert scheduler.embed(texts) == [[n] for n in range(1, 12)]
+    assert scheduler.embed([]) == []
+
+def test_rate_limit_pauses_and_retries(make_scheduler, monkeypatch):
+    # A clock of the scheduler's own that sleeping advances; time.sleep itself would reach every thread
+    clock = [time.monotonic()]
+    sleeps = []
+    def sleep(seconds):
+        sleeps.append(seconds)
+        clock[0] += seconds
+    monkeypatch.setattr(embedding_scheduler, 'time', SimpleNamespace(sleep=sleep, monotonic=lambda: clock[0]))
+    monkeypatch.setattr(embedding_scheduler.random, 'uniform', lambda low, high: 0.0)
+    calls = []
+    def embed_batch(batch):
+        calls.append(batch)
+        if len(calls) < 3:
+            raise RateLimited()
+        return [[1.0] for _ in batch]
+    scheduler = make_scheduler(embed_batch)
+    assert scheduler.embed(['ab']) == [[1.0]]
+    assert len(calls) == 3
+    assert sleeps == [embedding_scheduler.BACKOFF_BASE_SECONDS, 2 * embedding_scheduler.BACKOFF_BASE_SECONDS]
+
+def test_other_errors_are_not_retried(make_scheduler):
+    def embed_batch(batch):
+        raise ValueError('bad input')
+    with pytest.raises(ValueError):
+        make_scheduler(embed_batch).embed(['ab'])
+
+def test_is_rate_limit_error():
+    assert is_rate_limit_error(RateLimited())
+    assert not is_rate_limit_error(ValueError())
+
+def test_token_bucket_caps_requests_at_capacity():
+    bucket = TokenBucket(per_minute=6000, capacity=10)
+    # Larger than the bucket: waits for a full bucket instead of forever
+    bucket.acquire(50)
+    assert bucket.tokens < 1
@@ -0,0 +1,29 @@
+import os
+import hashlib
+from concurrent.futures import ThreadPoolExecutor
+from backend.settings.fingerprint import FingerprintCache
+
+def old_file(path, data):
+    with open(path, 'wb') as f:
+        f.write(data)
+    # Files modified within RACY_SECONDS are hashed but not cached
+    os.utime(path, (1_000_000_000, 1_000_000_000))
+    return str(path)
+
+def test_unchanged_files_are_not_hashed_again(tmp_path):
+    cache = FingerprintCache(str(tmp_path / 'fingerprints.sqlite3'))
+    path = old_file(tmp_path / 'a.txt', b'hello')
+    assert cache.sha1_and_size(path) == (hashlib.sha1(b'hello').hexdigest(), 5)
+    assert cache.sha1(path) == hashlib.sha1(b'hello').hexdigest()
+    old_file(path, b'changed')
+    assert cache.sha1(path) == hashlib.sha1(b'changed').hexdigest()
+    assert cache.stats() == {'hits': 1, 'misses': 2, 'hit_rate': 1 / 3}
+
+def test_concurrent_lookups_are_all_counted(tmp_path):
+    cache = FingerprintCache(str(tmp_path / 'fingerprints.sqlite3'))
+    paths = [old_file(tmp_path / f"{i}.txt", str(i).encode()) for i in range(8)]
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        list(pool.map(cache.sha1, paths))
+        list(pool.map(cache.sha1, paths * 50))
+    stats = cache.stats()
+    assert (stats['hits'], stats['misses']) == (400, 8)
@@ -0,0 +1,95 @@
+import time
+import pytest
+from backend.settings import jobs
+from backend.settings.jobs import SQLiteJobQueue, LEASE_EXPIRED_ERROR, retry_delay
+
+@pytest.fixture
+def queue(tmp_path):
+    return SQLiteJobQueue(str(tmp_path / 'jobs.sqlite3'))
+
+def job_row(queue, job_id):
+    return queue.connection.execute(
+        "SELECT state, attempts, lease_owner, last_error, run_after FROM ingest_jobs WHERE job_id = ?",
+        (job_id,)).fetchone()
+
+def expire_lease(queue, job_id):
+    queue.connection.execute("UPDATE ingest_jobs SET lease_expires = ? WHERE job_id = ?", (time.time() - 1, job_id))
+
+def test_enqueue_is_unique_per_sha1(queue):
+    assert queue.enqueue('/a.pdf', 'sha')
+    assert not queue.enqueue('/b.pdf', 'sha')
+    assert queue.counts() == {'queued': 1}
+
+def test_claim_leases_a_job_once(queue):
+    queue.enqueue('/a.pdf', 'sha')
+    job = queue.claim('w1', lease_seconds=60)
+    assert (job.file_path, job.file_sha1, job.attempts) == ('/a.pdf', 'sha', 1)
+    assert queue.claim('w2', lease_seconds=60) is None
+    assert queue.renew(job, 'w1')
+    assert not queue.renew(job, 'w2')
+
+def test_complete(queue):
+    queue.enqueue('/a.pdf', 'sha')
+    job = queue.claim('w1')
+    queue.complete(job, 'w1', 'doc')
+    assert queue.counts() == {'done': 1}
+    assert queue.claim('w1') is None
+
+def test_fail_backs_off_then_dies(queue):
+    queue.enqueue('/a.pdf', 'sha', max_attempts=2)
+    job = queue.claim('w1')
+    before = time.time()
+    queue.fail(job, 'w1', 'boom')
+    state, attempts, owner, error, run_after = job_row(queue, job.job_id)
+    assert (state, attempts, owner, error) == ('queued', 1, None, 'boom')
+    assert run_after >= before + retry_delay(1)
+    assert queue.claim('w1') is None
+
+    queue.connection.execute("UPDATE ingest_jobs SET run_after = 0")
+    job = queue.claim('w1')
+    assert job.attempts == 2
+    queue.fail(job, 'w1', 'boom again')
+    assert job_row(queue, job.job_id)[0] == 'dead'
+    queue.connection.execute("UPDATE ingest_jobs SET run_after = 0")
+    assert queue.claim('w1') is None
+
+def test_fail_ignores_lost_lease(queue):
+    queue.enqueue('/a.pdf', 'sha')
+    job = queue.claim('w1')
+    expire_lease(queue, job.job_id)
+    assert queue.claim('w2').attempts == 2
+    queue.fail(job, 'w1', 'late')
+    assert job_row(queue, job.job_id)[:3] == ('running', 2, 'w2')
+
+def test_expired_lease_is_claimed_again(queue):
+    queue.enqueue('/a.pdf', 'sha', max_attempts=3)
+    job = queue.claim('w1')
+    expire_lease(queue, job.job_id)
+    again = queue.claim('w2')
+    assert (again.job_id, again.attempts) == (job.job_id, 2)
+
+def test_expired_lease_on_last_attempt_is_dead(queue):
+    # A file that kills its worker never reaches fail(); it must not be leased forever
+    queue.enqueue('/poison.pdf', 'sha', max_attempts=2)
+    for attempt in (1, 2):
+        job = queue.claim('w1')
+        assert job.attempts == attempt
+        expire_lease(queue, job.job_id)
+    assert queue.claim('w1') is None
+    state, attempts, owner, error, _ = job_row(queue, job.job_id)
+    assert (state, attempts, owner, error) == ('dead', 2, None, LEASE_EXPIRED_ERROR)
+
+def test_retry_delay_is_capped():
+    assert retry_delay(1) == jobs.RETRY_BASE_SECONDS
+    assert retry_delay(2) == 2 * jobs.RETRY_BASE_SECONDS
+    assert retry_delay(100) == jobs.RETRY_MAX_SECONDS
+
+def test_run_job_refuses_a_job_out_of_attempts(queue, monkeypatch):
+    from backend.dendron import worker
+    queue.enqueue('/a.pdf', 'sha', max_attempts=1)
+    job = queue.claim('w1')
+    job.attempts = 2
+    monkeypatch.setattr(worker, 'Heartbeat', None)  # Never reached
+    worker.run_job(queue, job, 'w1')
+    state, _, _, error, _ = job_row(queue, job.job_id)
+    assert state == 'dead' and error.startswith('Out of attempts')
@@ -0,0 +1,171 @@
+import os
+import uuid
+import numpy as np
+import pytest
+from backend.settings import local_store
+from backend.settings.local_store import LocalDocStore
+
+DIMENSION = 8
+
+@pytest.fixture(autouse=True)
+def small_segments(monkeypatch):
+    # Ten vectors per segment, so a few documents span several segments
+    monkeypatch.setattr(local_store, 'SEGMENT_BYTES', 10 * 4 * DIMENSION)
+
+@pytest.fixture
+def store(tmp_path):
+    store = LocalDocStore(str(tmp_path), DIMENSION, compact_interval=0)
+    yield store
+    store.close_all()
+
+def vectors(count, seed):
+    return np.random.default_rng(seed).standard_normal((count, DIMENSION)).astype(np.float32)
+
+def store_documents(store, count=5, rows=7, prefix='f'):
+    documents = []
+    for i in range(count):
+        embeddings = vectors(rows, i)
+        doc_id = store.store_document({'file_name': f"{prefix}{i}", 'file_sha1': f"sha-{prefix}{i}", 'file_path': f"/{prefix}{i}",
+                                       'content': f"content {i}"},
+                                      embeddings, texts=[f"chunk {i}.{j}" for j in range(rows)])
+        documents.append((doc_id, embeddings))
+    return documents
+
+def segments(store):
+    return store.connection.execute("SELECT segment, rows, sealed FROM segments ORDER BY segment").fetchall()
+
+def segment_files(path):
+    return sorted(name for name in os.listdir(path) if name.endswith('.f32'))
+
+def test_append_rolls_over_full_segments(store):
+    store_documents(store)
+    assert segments(store) == [(1, 10, 1), (2, 10, 1), (3, 10, 1), (4, 5, 0)]
+    for segment, rows, _ in segments(store):
+        assert os.path.getsize(store._segment_path(segment)) == rows * 4 * DIMENSION
+
+def test_store_and_read_back(store):
+    documents = store_documents(store)
+    doc_id, embeddings = documents[2]
+    indexes, matrix = store.retrieve_embeddings(doc_id, with_indexes=True)
+    assert list(indexes) == list(range(7))
+    np.testing.assert_array_equal(matrix, embeddings)
+    assert store.retrieve_doc_id('sha-f2') == doc_id
+    assert store.find_duplicates(['sha-f1', 'missing']) == {'sha-f1': documents[1][0]}
+    assert store.is_document_complete(doc_id)
+    assert store.retrieve_content(doc_id, 2, 5) == 'ntent'
+    assert ''.join(store.iter_content(doc_id, 3)) == 'content 2'
+    assert store.retrieve_chunk_texts([(doc_id, 4)]) == {(doc_id, 4): 'chunk 2.4'}
+
+def test_similarity_search_finds_the_chunk(store):
+    documents = store_documents(store)
+    doc_id, embeddings = documents[3]
+    found_doc, index, snippet, score = store.similarity_search(embeddings[5], 0.5, 3)[0]
+    assert (found_doc, index, snippet) == (doc_id, 5, 'chunk 3.5')
+    assert score == pytest.approx(1.0)
+
+def test_deleted_vectors_are_not_found(store):
+    documents = store_documents(store)
+    doc_id, embeddings = documents[0]
+    store.delete_document(doc_id)
+    assert all(match[0] != doc_id for match in store.similarity_search(embeddings[0], -1.0, 50))
+    assert len(store.retrieve_embeddings(doc_id)) == 0
+    assert store.retrieve_doc_id('sha-f0') is None
+
+def test_recover_discards_uncommitted_rows(tmp_path):
+    store = LocalDocStore(str(tmp_path), DIMENSION, compact_interval=0)
+    documents = store_documents(store)
+    active = segments(store)[-1]
+    store.close_all()
+    # A writer that died after appending but before committing
+    with open(os.path.join(tmp_path, f"segment-{active[0]:08d}.f32"), 'ab') as f:
+        f.write(vectors(3, 99).tobytes())
+    open(os.path.join(tmp_path, 'segment-00000099.f32'), 'wb').close()
+
+    store = LocalDocStore(str(tmp_path), DIMENSION, compact_interval=0)
+    try:
+        assert os.path.getsize(store._segment_path(active[0])) == active[1] * 4 * DIMENSION
+        assert 'segment-00000099.f32' not in segment_files(tmp_path)
+        for doc_id, embeddings in documents:
+            np.testing.assert_array_equal(store.retrieve_embeddings(doc_id), embeddings)
+        # The next append lands right after the committed rows
+        doc_id, embeddings = store_documents(store, count=1, rows=2, prefix='g')[0]
+        np.testing.assert_array_equal(store.retrieve_embeddings(doc_id), embeddings)
+    finally:
+        store.close_all()
+
+def test_store_refuses_another_dimension(store):
+    with pytest.raises(ValueError):
+        LocalDocStore(store.path, DIMENSION * 2, compact_interval=0)
+
+def test_compact_moves_live_rows_and_retires_files(store):
+    documents = store_documents(store)
+    for doc_id, _ in documents[:2]:
+        store.delete_document(doc_id)
+    assert store.compact() == 2
+    assert [segment for segment, _, _ in segments(store)] == [3, 4, 5]
+    # The files stay for readers that listed them until the grace period is over
+    assert 'segment-00000001.f32' in segment_files(store.path)
+    store._remove_retired(grace=0)
+    assert segment_files(store.path) == ['segment-00000003.f32', 'segment-00000004.f32', 'segment-00000005.f32']
+    for doc_id, embeddings in documents[2:]:
+        np.testing.assert_array_equal(store.retrieve_embeddings(doc_id), embeddings)
+        assert store.similarity_search(embeddings[6], 0.9, 1)[0][:2] == (doc_id, 6)
+
+def test_readers_survive_compaction_by_another_store(store):
+    documents = store_documents(store)
+    doc_id, embeddings = documents[1]
+    # Map every segment, then compact them away from under this reader
+    store.similarity_search(embeddings[0], 0.5, 1)
+    store.delete_document(documents[0][0])
+    other = LocalDocStore(store.path, DIMENSION, compact_interval=0)
+    try:
+        assert other.compact() == 1
+    finally:
+        other.close_all()
+    np.testing.assert_array_equal(store.retrieve_embeddings(doc_id), embeddings)
+    assert store.similarity_search(embeddings[1], 0.9, 1)[0][:2] == (doc_id, 1)
+
+def test_minhashes(store):
+    doc_id = store.add_document({'file_name': 'n', 'file_sha1': 'shaN'})
+    assert isinstance(doc_id, uuid.UUID)
+    store.add_minhash(doc_id, b'\x01\x02', [1, 2, 3])
+    assert store.retrieve_minhashes(0) == [(1, doc_id, b'\x01\x02')]
+    assert store.retrieve_minhashes(1) == []
+    assert store.retrieve_chunk_hashes(doc_id) == [1, 2, 3]
+
+def test_segments_listed_before_a_compaction_can_still_be_mapped(store):
+    documents = store_documents(store)
+    store.delete_document(documents[0][0])
+    reader = LocalDocStore(store.path, DIMENSION, compact_interval=0)
+    try:
+        with reader._transaction(immediate=False) as conn:
+            # Start the reader's snapshot, then compact segment 1 away in another store
+            assert conn.execute("SELECT count(*) FROM segments").fetchone()[0] == 4
+            assert store.compact() == 1
+            listed = {segment.segment for segment in reader._load_segments(conn)}
+        assert 1 in listed
+        assert len(reader.similarity_search(documents[1][1][0], 0.9, 1)) == 1
+    finally:
+        reader.close_all()
+
+def test_compact_skips_segments_another_store_compacted_first(store, monkeypatch):
+    documents = store_documents(store)
+    store.delete_document(documents[0][0])
+    other = LocalDocStore(store.path, DIMENSION, compact_interval=0)
+    transaction = other._transaction
+    raced = []
+
+    def racing_transaction(*args, **kwargs):
+        # The other store has listed the sealed segments; compact them here first
+        if not raced:
+            raced.append(store.compact())
+        return transaction(*args, **kwargs)
+
+    monkeypatch.setattr(other, '_transaction', racing_transaction)
+    try:
+        assert other.compact() == 0
+    finally:
+        other.close_all()
+    assert raced == [1]
+    for doc_id, embeddings in documents[1:]:
+        np.testing.assert_array_equal(store.retrieve_embeddings(doc_id), embeddings)
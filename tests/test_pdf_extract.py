@@ -0,0 +1,78 @@
+import sqlite3
+import pytest
+
+pytest.importorskip('pdfplumber')
+pytest.importorskip('pdf2image')
+pytest.importorskip('pytesseract')
+
+from backend.dendron import pdf_extract
+from backend.dendron.pdf_extract import (MIN_SHARD_PAGES, adaptive_dpi, extract_pdf_text, needs_ocr,
+                                         page_runs, page_shards)
+from backend.settings.ocr_cache import OCRCache
+
+def test_shards_cover_every_page_in_order():
+    shards = page_shards(100, workers=2)
+    assert shards[0][0] == 0 and shards[-1][1] == 100
+    assert all(stop == start for (_, stop), (start, _) in zip(shards, shards[1:]))
+
+def test_short_documents_use_minimum_shard_size():
+    assert page_shards(MIN_SHARD_PAGES, workers=4) == [(0, MIN_SHARD_PAGES)]
+    assert page_shards(10, workers=1, shard_pages=4) == [(0, 4), (4, 8), (8, 10)]
+    assert page_shards(0, workers=2) == []
+
+def test_page_runs_split_on_gaps_and_length():
+    assert page_runs([5, 0, 1, 2, 7, 6], max_run=2) == [[0, 1], [2], [5, 6], [7]]
+    assert page_runs([]) == []
+
+def test_sparse_pages_need_ocr():
+    assert needs_ocr(' \n\t ', min_chars=1)
+    assert needs_ocr('abc', min_chars=4)
+    assert not needs_ocr('a b c d', min_chars=4)
+
+def test_dpi_is_kept_within_pixel_budget():
+    # A4 at 300 dpi is about 8.7 million pixels
+    assert adaptive_dpi(595, 842, dpi=300, max_pixels=9_000_000) == 300
+    assert adaptive_dpi(595, 842, dpi=300, max_pixels=None) == 300
+    # A0 is sixteen times larger
+    dpi = adaptive_dpi(2384, 3370, dpi=300, max_pixels=9_000_000)
+    assert dpi < 300
+    assert (2384 / 72 * dpi) * (3370 / 72 * dpi) <= 9_000_000
+
+@pytest.fixture
+def scanned_pdf(monkeypatch):
+    """A two-page PDF whose second page has no text layer; OCR reads 'scanned text'."""
+    ocr_calls = []
+
+    def fake_ocr_pages(source, pages, **kwargs):
+        ocr_calls.append(list(pages))
+        return {index: 'scanned text' for index in pages}
+
+    monkeypatch.setattr(pdf_extract, 'extract_page_texts', lambda source, workers=None: ['native text ' * 10, ''])
+    monkeypatch.setattr(pdf_extract, 'ocr_pages', fake_ocr_pages)
+    return ocr_calls
+
+def test_failing_cache_write_keeps_the_ocr_text(monkeypatch, tmp_path, scanned_pdf):
+    cache = OCRCache(str(tmp_path / 'ocr.sqlite3'), 1 << 20)
+
+    def put_many(entries):
+        raise sqlite3.OperationalError('database is locked')
+
+    monkeypatch.setattr(cache.cache, 'put_many', put_many)
+    monkeypatch.setattr(pdf_extract, 'get_ocr_cache', lambda: cache)
+    texts = extract_pdf_text('doc.pdf', file_sha1='abc', ocr_min_chars=4)
+    assert texts[1] == 'scanned text'
+    assert scanned_pdf == [[1]]
+
+def test_unavailable_cache_runs_ocr_uncached(monkeypatch, scanned_pdf):
+    def get_ocr_cache():
+        raise sqlite3.OperationalError('unable to open database file')
+
+    monkeypatch.setattr(pdf_extract, 'get_ocr_cache', get_ocr_cache)
+    assert extract_pdf_text('doc.pdf', file_sha1='abc', ocr_min_chars=4)[1] == 'scanned text'
+
+def test_cached_pages_skip_ocr(monkeypatch, tmp_path, scanned_pdf):
+    cache = OCRCache(str(tmp_path / 'ocr.sqlite3'), 1 << 20)
+    monkeypatch.setattr(pdf_extract, 'get_ocr_cache', lambda: cache)
+    extract_pdf_text('doc.pdf', file_sha1='abc', ocr_min_chars=4)
+    assert extract_pdf_text('doc.pdf', file_sha1='abc', ocr_min_chars=4)[1] == 'scanned text'
+    assert scanned_pdf == [[1], []]
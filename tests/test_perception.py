@@ -0,0 +1,81 @@
+import os
+import queue
+import pytest
+
+pytest.importorskip('watchdog')
+
+from backend.neuron.perception import Debouncer
+
+def write(path, data):
+    with open(path, 'wb') as f:
+        f.write(data)
+
+def test_file_is_released_once_settled(tmp_path):
+    path = str(tmp_path / 'a.pdf')
+    write(path, b'partial')
+    ready = queue.Queue()
+    debouncer = Debouncer(ready, settle_seconds=0)
+    debouncer.touch(path)
+    debouncer.touch(path)
+    # The first poll only records the size and mtime
+    debouncer.poll()
+    assert ready.empty()
+    debouncer.poll()
+    assert ready.get_nowait() == path
+    debouncer.poll()
+    assert ready.empty()
+
+def test_file_still_being_written_is_held(tmp_path):
+    path = str(tmp_path / 'a.pdf')
+    write(path, b'partial')
+    ready = queue.Queue()
+    debouncer = Debouncer(ready, settle_seconds=0)
+    debouncer.touch(path)
+    debouncer.poll()
+    write(path, b'partial and more')
+    debouncer.poll()
+    assert ready.empty()
+    debouncer.poll()
+    assert ready.get_nowait() == path
+
+def test_settle_time_is_respected(tmp_path):
+    path = str(tmp_path / 'a.pdf')
+    write(path, b'done')
+    ready = queue.Queue()
+    debouncer = Debouncer(ready, settle_seconds=60)
+    debouncer.touch(path)
+    debouncer.poll()
+    debouncer.poll()
+    assert ready.empty()
+
+def test_deleted_file_is_dropped(tmp_path):
+    path = str(tmp_path / 'a.pdf')
+    write(path, b'x')
+    ready = queue.Queue()
+    debouncer = Debouncer(ready, settle_seconds=0)
+    debouncer.touch(path)
+    os.remove(path)
+    debouncer.poll()
+    write(path, b'x')
+    debouncer.poll()
+    assert ready.empty()
+
+def test_full_queue_holds_settled_files(tmp_path):
+    paths = [str(tmp_path / f"{name}.pdf") for name in 'abc']
+    for path in paths:
+        write(path, b'x')
+    ready = queue.Queue(maxsize=1)
+    debouncer = Debouncer(ready, settle_seconds=0)
+    for path in paths:
+        debouncer.touch(path)
+    debouncer.poll()
+    debouncer.poll()
+    released = [ready.get_nowait()]
+    # Held, not dropped, until the queue has room again
+    debouncer.poll()
+    released.append(ready.get_nowait())
+    debouncer.poll()
+    released.append(ready.get_nowait())
+    assert sorted(released) == paths
+    debouncer.poll()
+    assert ready.empty()
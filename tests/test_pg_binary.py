@@ -0,0 +1,64 @@
+import struct
+import uuid
+import numpy as np
+from backend.settings.pg_binary import vectors_copy_buffer, vector_binary_layout
+
+SIGNATURE = b'PGCOPY\n\xff\r\n\x00'
+
+def read_rows(data: bytes):
+    """Decode a binary COPY stream into lists of raw field values."""
+    assert data[:11] == SIGNATURE
+    position = 11 + 4 + 4
+    rows = []
+    while True:
+        fields, = struct.unpack_from('>h', data, position)
+        position += 2
+        if fields == -1:
+            assert position == len(data)
+            return rows
+        row = []
+        for _ in range(fields):
+            size, = struct.unpack_from('>i', data, position)
+            position += 4
+            row.append(data[position:position + size])
+            position += size
+        rows.append(row)
+
+def decode_vector(value: bytes):
+    dim, unused = struct.unpack_from('>hh', value)
+    assert unused == 0 and len(value) == 4 + 4 * dim
+    return np.frombuffer(value[4:], dtype='>f4')
+
+def test_rows_without_text():
+    doc_id = uuid.uuid4()
+    vector_ids = [uuid.uuid4() for _ in range(3)]
+    embeddings = np.random.default_rng(0).standard_normal((3, 5)).astype(np.float32)
+    rows = read_rows(vectors_copy_buffer(doc_id, vector_ids, [4, 7, 9], embeddings).getvalue())
+    assert len(rows) == 3
+    for row, vector_id, index, embedding in zip(rows, vector_ids, [4, 7, 9], embeddings):
+        assert len(row) == 4
+        assert uuid.UUID(bytes=row[0]) == vector_id
+        assert uuid.UUID(bytes=row[1]) == doc_id
+        assert struct.unpack('>i', row[2])[0] == index
+        np.testing.assert_array_equal(decode_vector(row[3]), embedding)
+
+def test_rows_with_text():
+    doc_id = uuid.uuid4()
+    vector_ids = [uuid.uuid4() for _ in range(2)]
+    texts = ['héllo', 'nul\x00byte']
+    rows = read_rows(vectors_copy_buffer(doc_id, vector_ids, [0, 1], [[1.0, 2.0], [3.0, 4.0]], texts).getvalue())
+    assert [len(row) for row in rows] == [5, 5]
+    # Postgres text cannot hold NUL characters
+    assert [row[4].decode('utf-8') for row in rows] == ['héllo', 'nulbyte']
+    np.testing.assert_array_equal(decode_vector(rows[1][3]), [3.0, 4.0])
+
+def test_empty_buffer_is_header_and_trailer():
+    data = vectors_copy_buffer(uuid.uuid4(), [], [], np.empty((0, 3), dtype=np.float32)).getvalue()
+    assert read_rows(data) == []
+
+def test_vector_binary_layout_decodes_vector_send_output():
+    values = np.array([[0.5, -1.0, 2.0], [3.0, 4.0, 5.0]], dtype=np.float32)
+    sent = b''.join(struct.pack('>hh', 3, 0) + row.astype('>f4').tobytes() for row in values)
+    decoded = np.frombuffer(sent, dtype=vector_binary_layout(3))
+    np.testing.assert_array_equal(decoded['values'], values)
+    assert list(decoded['dim']) == [3, 3]
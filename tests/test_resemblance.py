@@ -0,0 +1,61 @@
+import numpy as np
+from backend.neuron import resemblance
+from backend.neuron.resemblance import (LSHIndex, NearDuplicateIndex, NUM_PERM, band_keys, chunk_hashes,
+                                        jaccard, minhash, shingle_hashes)
+
+TEXT = ' '.join(f"word{i}" for i in range(400))
+
+def test_minhash_of_identical_texts_match():
+    signature = minhash(TEXT)
+    assert signature.dtype == np.uint32 and len(signature) == NUM_PERM
+    assert jaccard(signature, minhash(TEXT.upper())) == 1.0
+
+def test_minhash_estimates_similarity():
+    # Changes word2, word20-word29 and word200-word299, over a quarter of the words
+    edited = TEXT.replace('word2', 'changed')
+    assert 0.4 < jaccard(minhash(TEXT), minhash(edited)) < 0.8
+    assert jaccard(minhash(TEXT), minhash(' '.join(f"other{i}" for i in range(400)))) < 0.1
+
+def test_minhash_of_wordless_text_is_none():
+    assert minhash('  \n ') is None
+    assert len(shingle_hashes('')) == 0
+
+def test_band_keys_differ_between_bands():
+    signature = np.zeros(NUM_PERM, dtype=np.uint32)
+    assert len(set(band_keys(signature))) == resemblance.LSH_BANDS
+
+def test_chunk_hashes_ignore_whitespace():
+    assert chunk_hashes(['a  b\n c']) == chunk_hashes([' a b c '])
+
+def test_lsh_index_finds_and_forgets_near_duplicates():
+    index = LSHIndex()
+    index.add('original', minhash(TEXT))
+    index.add('other', minhash(' '.join(f"other{i}" for i in range(400))))
+    doc_id, similarity = index.query(minhash(TEXT.replace('word7', 'x')), 0.8)
+    assert doc_id == 'original' and similarity > 0.8
+    index.remove('original')
+    assert index.query(minhash(TEXT), 0.8) is None
+    assert len(index) == 1
+    assert all('original' not in bucket for bucket in index.buckets.values())
+
+class FakeMemory:
+    def __init__(self):
+        self.rows = []
+        self.stored = set()
+
+    def retrieve_minhashes(self, after_seq=0):
+        return [row for row in self.rows if row[0] > after_seq]
+
+    def is_document_complete(self, doc_id):
+        return doc_id in self.stored
+
+def test_near_duplicate_index_drops_documents_deleted_elsewhere():
+    memory = FakeMemory()
+    memory.rows.append((1, 'a', minhash(TEXT).tobytes()))
+    memory.stored.add('a')
+    index = NearDuplicateIndex(memory, refresh_seconds=0)
+    assert index.query(minhash(TEXT), 0.8)[0] == 'a'
+
+    memory.stored.clear()
+    assert index.query(minhash(TEXT), 0.8) is None
+    assert len(index.index) == 0
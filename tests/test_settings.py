@@ -0,0 +1,13 @@
+import pytest
+from backend.settings.settings import Setting
+
+@pytest.mark.parametrize('model, dimension', [('openai', 1536), ('local', 384), ('hashing', 1536)])
+def test_embedding_dim_defaults_to_the_backend(monkeypatch, model, dimension):
+    monkeypatch.setenv('EMBEDDING_MODEL', model)
+    monkeypatch.delenv('EMBEDDING_DIM', raising=False)
+    assert Setting().embedding_dim == dimension
+
+def test_embedding_dim_setting_wins(monkeypatch):
+    monkeypatch.setenv('EMBEDDING_MODEL', 'local')
+    monkeypatch.setenv('EMBEDDING_DIM', '768')
+    assert Setting().embedding_dim == 768